@@ -8,6 +8,7 @@ from flask_socketio import SocketIO, emit
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import atexit
 import json
 import time
 import threading
@@ -21,9 +22,16 @@ from data.coordinates import MONITORING_LOCATIONS, GPS_CHECKPOINTS, RFID_GATES
 from models.detector import AravalliMiningDetector
 from models.change_detector import AravalliChangeDetector
 from utils.notification import NotificationManager
+from utils.serialization import frame_data, frame_response, json_response, requested_format
+from utils.pagination import page_frame, parse_limit
+from utils.export import CHUNK_ROWS, EXPORT_FORMATS, encode_stream, export_stream, parquet_available, time_bounds
+from utils.http_cache import cached_route, init_http_cache
+from utils.alert_store import AlertStore
+from utils.history_store import MAX_PAGE_SIZE, HistoryStore
 
 app = Flask(__name__)
 app.config.from_object(Config)
+init_http_cache(app)
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
 # Initialize components
@@ -35,10 +43,22 @@ notification_manager = NotificationManager()
 print("✅ All components initialized!")
 
 # Global variables
-active_alerts = []
+alert_store = AlertStore(Config.ALERT_RETENTION)
+history_store = HistoryStore(Config.HISTORY_DB_PATH, Config.HISTORY_BATCH_SIZE, Config.HISTORY_FLUSH_INTERVAL)
+# Commit whatever the writer still has queued when the process exits
+atexit.register(history_store.close)
+# Alerts survive restarts: warm the in-memory store from the persisted history
+alert_store.restore(history_store.latest_alerts(Config.ALERT_RETENTION))
 notification_queue = queue.Queue()
 monitoring_active = True
 
+def add_alert(alert, prefix='alert'):
+    """Store an alert under the next sequence number (used by since/cursor polling) and persist it;
+    returns the stored copy, which carries the generated 'id' and 'seq'"""
+    alert = alert_store.add(alert, prefix)
+    history_store.record_alert(alert)
+    return alert
+
 # ===================== PAGE ROUTES =====================
 
 @app.route('/')
@@ -88,10 +108,19 @@ def sensors():
 
 @app.route('/alerts')
 def alerts():
-    """Active alerts page"""
-    global active_alerts
+    """Alerts page: the newest 20 alerts from history, ?cursor= pages back in time"""
+    try:
+        alerts, older_cursor, _ = history_store.alerts(
+            limit=20,
+            cursor=request.args.get('cursor'),
+            location_id=request.args.get('location_id') or None,
+            severity=request.args.get('severity') or None
+        )
+    except ValueError:
+        alerts, older_cursor = [], None
     return render_template('alerts.html', 
-                         alerts=active_alerts[-20:],
+                         alerts=alerts[::-1],
+                         older_cursor=older_cursor,
                          locations=MONITORING_LOCATIONS)
 
 @app.route('/documentation')
@@ -101,7 +130,14 @@ def documentation():
 
 # ===================== API ROUTES =====================
 
+def data_version():
+    return data_loader.version
+
+# Reference data only changes with the loader's data, so it is cached per data version
+reference_cache = cached_route(data_version, max_age=Config.REFERENCE_CACHE_MAX_AGE)
+
 @app.route('/api/locations')
+@reference_cache
 def get_locations():
     return jsonify({'success': True, 'locations': MONITORING_LOCATIONS})
 
@@ -110,31 +146,35 @@ def get_location(location_id):
     location = next((l for l in MONITORING_LOCATIONS if l['id'] == location_id), None)
     if not location:
         return jsonify({'success': False, 'error': 'Location not found'}), 404
+    try:
+        fmt = requested_format()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
     ndvi_data = data_loader.ndvi_time_series[
         data_loader.ndvi_time_series['location_id'] == location_id
-    ].tail(30).to_dict('records')
+    ].tail(30)
     
     nightlight_data = data_loader.nightlight_data[
         data_loader.nightlight_data['location_id'] == location_id
-    ].tail(30).to_dict('records')
+    ].tail(30)
     
     acoustic_data = data_loader.acoustic_detections[
         data_loader.acoustic_detections['location_id'] == location_id
-    ].tail(20).to_dict('records') if len(data_loader.acoustic_detections) > 0 else []
+    ].tail(20) if len(data_loader.acoustic_detections) > 0 else pd.DataFrame()
     
     camera_data = data_loader.camera_feeds[
         data_loader.camera_feeds['location_id'] == location_id
-    ].tail(10).to_dict('records') if len(data_loader.camera_feeds) > 0 else []
+    ].tail(10) if len(data_loader.camera_feeds) > 0 else pd.DataFrame()
     
-    return jsonify({
+    return json_response({
         'success': True,
         'location': location,
         'data': {
-            'ndvi': ndvi_data,
-            'nightlight': nightlight_data,
-            'acoustic': acoustic_data,
-            'camera': camera_data
+            'ndvi': frame_data(ndvi_data, fmt),
+            'nightlight': frame_data(nightlight_data, fmt),
+            'acoustic': frame_data(acoustic_data, fmt),
+            'camera': frame_data(camera_data, fmt)
         }
     })
 
@@ -144,7 +184,7 @@ def get_ndvi(location_id):
     ndvi_data = data_loader.ndvi_time_series[
         data_loader.ndvi_time_series['location_id'] == location_id
     ].tail(days)
-    return jsonify({'success': True, 'data': ndvi_data.to_dict('records')})
+    return frame_response(ndvi_data)
 
 @app.route('/api/nightlight/<location_id>')
 def get_nightlight(location_id):
@@ -152,46 +192,171 @@ def get_nightlight(location_id):
     nightlight_data = data_loader.nightlight_data[
         data_loader.nightlight_data['location_id'] == location_id
     ].tail(days)
-    return jsonify({'success': True, 'data': nightlight_data.to_dict('records')})
+    return frame_response(nightlight_data)
+
+def paged_frame_response(frame, default_limit, time_col='timestamp'):
+    """Latest ?limit= rows, or the rows after ?cursor= / ?since=seq:<n>|<ISO timestamp>|epoch:<s>"""
+    try:
+        limit = parse_limit(request.args.get('limit'), default_limit)
+        page, next_cursor, has_more = page_frame(
+            frame, limit, request.args.get('cursor'), request.args.get('since'), time_col
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return frame_response(page, next_cursor=next_cursor, has_more=has_more)
 
 @app.route('/api/acoustic/<location_id>')
 def get_acoustic(location_id):
-    limit = int(request.args.get('limit', 50))
     if location_id == 'all':
-        acoustic_data = data_loader.acoustic_detections.tail(limit)
+        acoustic_data = data_loader.acoustic_detections
     else:
         acoustic_data = data_loader.acoustic_detections[
             data_loader.acoustic_detections['location_id'] == location_id
-        ].tail(limit)
-    return jsonify({'success': True, 'data': acoustic_data.to_dict('records')})
+        ]
+    return paged_frame_response(acoustic_data, 50)
+
+@app.route('/api/timeseries', methods=['GET', 'POST'])
+def get_time_series():
+    """
+    Several metrics for several locations in one response.
+    GET ?locations=raj_001,raj_002&metrics=ndvi,nightlight&days=30&start=&end=&fields=&format=
+    or POST the same fields as JSON (lists allowed). Missing locations/metrics/fields mean all.
+    """
+    params = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    if not hasattr(params, 'get'):
+        return jsonify({'success': False, 'error': 'Expected a JSON object'}), 400
+
+    def as_list(name):
+        value = params.get(name)
+        if isinstance(value, str):
+            value = [v.strip() for v in value.split(',') if v.strip()]
+        if value and not (isinstance(value, list) and all(isinstance(v, str) for v in value)):
+            raise ValueError(f"'{name}' must be a list of strings or a comma-separated string")
+        return list(value) if value else None
+
+    try:
+        fmt = params.get('format', 'records')
+        if fmt not in ('records', 'columns'):
+            raise ValueError(f"Unknown format '{fmt}'")
+        days = int(params.get('days', 30))
+        location_ids = as_list('locations')
+        known = {l['id'] for l in MONITORING_LOCATIONS}
+        unknown = [loc for loc in location_ids or [] if loc not in known]
+        if unknown:
+            raise ValueError(f"Unknown locations: {', '.join(unknown)}")
+        series = data_loader.get_time_series(
+            location_ids, as_list('metrics'), days, params.get('start'), params.get('end'), as_list('fields')
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    location_ids = location_ids or [l['id'] for l in MONITORING_LOCATIONS]
+    return json_response({
+        'success': True,
+        'format': fmt,
+        'metrics': list(series),
+        'series': {
+            loc: {metric: frame_data(series[metric][loc], fmt) for metric in series}
+            for loc in location_ids
+        }
+    })
 
 @app.route('/api/camera/<location_id>')
 def get_camera(location_id):
     limit = int(request.args.get('limit', 20))
     if len(data_loader.camera_feeds) == 0:
-        return jsonify({'success': True, 'data': []})
+        return frame_response(pd.DataFrame())
     camera_data = data_loader.camera_feeds[
         data_loader.camera_feeds['location_id'] == location_id
     ].tail(limit)
-    return jsonify({'success': True, 'data': camera_data.to_dict('records')})
+    return frame_response(camera_data)
 
 @app.route('/api/gps_tracks')
 def get_gps_tracks():
-    limit = int(request.args.get('limit', 100))
     vehicle_id = request.args.get('vehicle_id')
     if vehicle_id:
         gps_data = data_loader.gps_tracks[
             data_loader.gps_tracks['vehicle_id'] == vehicle_id
-        ].tail(limit)
+        ]
     else:
-        gps_data = data_loader.gps_tracks.tail(limit)
-    return jsonify({'success': True, 'data': gps_data.to_dict('records')})
+        gps_data = data_loader.gps_tracks
+    return paged_frame_response(gps_data, 100)
+
+# Exported alert columns and their Parquet types (alerts carry optional keys, so no inference)
+ALERT_SCHEMA = {
+    'id': 'string', 'seq': 'int64', 'location_id': 'string', 'location_name': 'string',
+    'severity': 'string', 'type': 'string', 'message': 'string', 'timestamp': 'string',
+    'confidence': 'double', 'acknowledged': 'bool', 'acknowledged_at': 'string', 'is_simulated': 'bool'
+}
+ALERT_COLUMNS = list(ALERT_SCHEMA)
+# dataset -> (loader frame, time column); alerts are exported from history_store
+EXPORT_DATASETS = {
+    'acoustic': ('acoustic_detections', 'timestamp'),
+    'ndvi': ('ndvi_time_series', 'date'),
+    'nightlight': ('nightlight_data', 'date'),
+    'gps': ('gps_tracks', 'timestamp'),
+    'alerts': (None, 'timestamp')
+}
+
+def alert_export_stream(fmt, location_ids=None, start=None, end=None):
+    """The full persisted alert history (not just the in-memory ring), streamed in keyset pages"""
+    lo, hi = time_bounds(start, end)
+    if any(bound is not None and bound.tzinfo is not None for bound in (lo, hi)):
+        raise ValueError("Alert timestamps are naive local time; give start/end without a UTC offset")
+    # Include alerts still queued for the history writer
+    history_store.flush()
+    pages = history_store.iter_alerts(
+        location_ids, lo.isoformat() if lo is not None else None,
+        hi.isoformat() if hi is not None else None, page_size=CHUNK_ROWS
+    )
+    chunks = (pd.DataFrame(page, columns=ALERT_COLUMNS) for page in pages)
+    return encode_stream(chunks, fmt, pd.DataFrame(columns=ALERT_COLUMNS), ALERT_SCHEMA)
+
+@app.route('/api/export/<dataset>')
+def export_dataset(dataset):
+    """
+    Stream a full dataset as ?format=csv|ndjson|parquet, optionally filtered by
+    ?locations=a,b (or ?vehicles= for gps) and ?start= / ?end= (inclusive).
+    """
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({'success': False, 'error': f"Unknown dataset '{dataset}'"}), 404
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': f"Unknown format '{fmt}'"}), 400
+    if fmt == 'parquet' and not parquet_available():
+        return jsonify({'success': False, 'error': 'Parquet export needs pyarrow installed'}), 501
+
+    attr, time_col = EXPORT_DATASETS[dataset]
+    columns = getattr(data_loader, attr).columns if attr else ALERT_COLUMNS
+    filters = {}
+    for param, column in (('locations', 'location_id'), ('vehicles', 'vehicle_id')):
+        values = [v for v in request.args.get(param, '').split(',') if v]
+        if values:
+            if column not in columns:
+                return jsonify({'success': False, 'error': f"'{param}' does not apply to {dataset}"}), 400
+            filters[column] = values
+    try:
+        if attr:
+            stream = export_stream(getattr(data_loader, attr), fmt, filters,
+                                   request.args.get('start'), request.args.get('end'), time_col)
+        else:
+            stream = alert_export_stream(fmt, filters.get('location_id'),
+                                         request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f"auralite_{dataset}_{datetime.now():%Y%m%d_%H%M%S}.{extension}"
+    return Response(stream, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 @app.route('/api/mining_sites')
+@reference_cache
 def get_mining_sites():
     return jsonify({'success': True, 'sites': data_loader.mining_sites})
 
 @app.route('/api/checkpoints')
+@reference_cache
 def get_checkpoints():
     return jsonify({
         'success': True,
@@ -237,10 +402,10 @@ def detect_mining():
         gps_data=nearby_gps
     )
     result['location'] = location
+    history_store.record_detection(result)
     
     if result['severity'] in ['HIGH', 'CRITICAL']:
         alert = {
-            'id': f"alert_{datetime.now().timestamp()}",
             'location_id': location_id,
             'location_name': location['name'] if location else 'Unknown',
             'severity': result['severity'],
@@ -248,7 +413,7 @@ def detect_mining():
             'timestamp': datetime.now().isoformat(),
             'confidence': result['overall_confidence']
         }
-        active_alerts.append(alert)
+        alert = add_alert(alert)
         notification_queue.put(alert)
         socketio.emit('new_alert', alert)
     
@@ -287,6 +452,7 @@ def detect_all():
             camera_data=camera_data,
             gps_data=nearby_gps
         )
+        history_store.record_detection(result)
         results.append({'location': location, 'result': result})
     
     return jsonify({
@@ -302,24 +468,93 @@ def get_stats():
 
 @app.route('/api/active_alerts')
 def get_active_alerts():
-    global active_alerts
+    """
+    Cursor-paged alert feed; ?location_id=, ?severity= and ?acknowledged=true|false
+    instead return the newest `limit` matching alerts from the store's indexes.
+    """
+    try:
+        limit = parse_limit(request.args.get('limit'), 50)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    filters = {key: request.args.get(key) for key in ('location_id', 'severity', 'acknowledged')
+               if request.args.get(key)}
+    if filters:
+        if 'acknowledged' in filters:
+            filters['acknowledged'] = filters['acknowledged'].lower() in ('1', 'true', 'yes')
+        return jsonify({
+            'success': True,
+            'alerts': alert_store.query(limit=limit, **filters),
+            'count': len(alert_store)
+        })
+    try:
+        alerts, next_cursor, has_more = alert_store.page(
+            limit, request.args.get('cursor'), request.args.get('since')
+        )
+        # Pollers also learn which already-delivered alerts were acknowledged since ?ack_cursor=
+        acknowledged, ack_cursor = alert_store.acknowledged_after(int(request.args.get('ack_cursor', 0)))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     return jsonify({
         'success': True,
-        'alerts': active_alerts[-50:],
-        'count': len(active_alerts)
+        'alerts': alerts,
+        'count': len(alert_store),
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'acknowledged': acknowledged,
+        'ack_cursor': ack_cursor
     })
 
 @app.route('/api/acknowledge_alert/<alert_id>', methods=['POST'])
 def acknowledge_alert(alert_id):
-    global active_alerts
-    for alert in active_alerts:
-        if alert['id'] == alert_id:
-            alert['acknowledged'] = True
-            alert['acknowledged_at'] = datetime.now().isoformat()
-            return jsonify({'success': True, 'message': 'Alert acknowledged'})
-    return jsonify({'success': False, 'error': 'Alert not found'}), 404
+    alert = alert_store.acknowledge(alert_id)
+    if alert is not None:
+        history_store.record_acknowledgement(alert_id, alert['acknowledged_at'])
+    elif history_store.get_alert(alert_id) is not None:
+        # Evicted from memory but still in the history
+        history_store.record_acknowledgement(alert_id)
+    else:
+        return jsonify({'success': False, 'error': 'Alert not found'}), 404
+    return jsonify({'success': True, 'message': 'Alert acknowledged'})
+
+def _history_query():
+    """Shared ?limit, ?cursor, ?location_id, ?severity, ?start, ?end arguments of the history APIs"""
+    start, end = time_bounds(request.args.get('start'), request.args.get('end'))
+    limit = request.args.get('limit', '50')
+    if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be an integer between 1 and {MAX_PAGE_SIZE}")
+    return {
+        'limit': int(limit),
+        'cursor': request.args.get('cursor'),
+        'location_id': request.args.get('location_id') or None,
+        'severity': request.args.get('severity') or None,
+        'start': start.isoformat() if start is not None else None,
+        'end': end.isoformat() if end is not None else None
+    }
+
+@app.route('/api/alerts/history')
+def get_alert_history():
+    """Persisted alerts newest first; next_cursor pages back through older alerts"""
+    try:
+        query = _history_query()
+        acknowledged = request.args.get('acknowledged')
+        if acknowledged:
+            query['acknowledged'] = acknowledged.lower() in ('1', 'true', 'yes')
+        alerts, next_cursor, has_more = history_store.alerts(**query)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'alerts': alerts, 'next_cursor': next_cursor, 'has_more': has_more})
+
+@app.route('/api/detections/history')
+def get_detection_history():
+    """Persisted detect_from_all_sources results newest first, paged like /api/alerts/history"""
+    try:
+        detections, next_cursor, has_more = history_store.detections(**_history_query())
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'detections': detections, 'next_cursor': next_cursor, 'has_more': has_more})
 
 @app.route('/api/aravalli_risk_map')
+@reference_cache
 def get_risk_map():
     risk_zones = []
     for loc in MONITORING_LOCATIONS:
@@ -349,7 +584,6 @@ def simulate_detection():
     severity = random.choice(['HIGH', 'CRITICAL']) if random.random() > 0.3 else 'MEDIUM'
     
     alert = {
-        'id': f"sim_{datetime.now().timestamp()}",
         'location_id': location['id'],
         'location_name': location['name'],
         'severity': severity,
@@ -359,7 +593,7 @@ def simulate_detection():
         'confidence': round(random.uniform(0.75, 0.98), 2),
         'is_simulated': True
     }
-    active_alerts.append(alert)
+    alert = add_alert(alert, 'sim')
     socketio.emit('new_alert', alert)
     return jsonify({'success': True, 'alert': alert})
 
@@ -392,7 +626,6 @@ def monitoring_thread():
                     if random.random() > 0.85:
                         severity = random.choice(['MEDIUM', 'HIGH', 'CRITICAL'])
                         alert = {
-                            'id': f"bg_{datetime.now().timestamp()}",
                             'location_id': location['id'],
                             'location_name': location['name'],
                             'severity': severity,
@@ -401,7 +634,7 @@ def monitoring_thread():
                             'timestamp': datetime.now().isoformat(),
                             'confidence': round(random.uniform(0.7, 0.95), 2)
                         }
-                        active_alerts.append(alert)
+                        alert = add_alert(alert, 'bg')
                         socketio.emit('new_alert', alert)
             time.sleep(15)
         except Exception as e:
@@ -28,6 +28,54 @@ class Config:
     ACOUSTIC_CONFIDENCE_THRESHOLD = 0.75
     CHANGE_DETECTION_SENSITIVITY = 0.2
     
+    # Acoustic sensor uploads
+    NOISE_PROFILE_DIR = os.environ.get('AURALITE_NOISE_PROFILE_DIR', 'data/processed/noise_profiles')
+    FEATURE_STORE_DIR = os.environ.get('AURALITE_FEATURE_STORE_DIR', 'data/processed/audio_features')
+    ACOUSTIC_CHUNK_SECONDS = 10
+    ACOUSTIC_MAX_CHUNK_SECONDS = 300
+    UPLOAD_READ_SIZE = 64 * 1024
+    # Upper bound on ?k= for similar-sound searches
+    SIMILAR_MAX_K = 100
+    
+    # Rolling window for the fusion features, in days
+    FEATURE_WINDOW_DAYS = 30
+    # Days per sequence fed to the temporal (LSTM) model
+    SEQUENCE_WINDOW_DAYS = 30
+    
+    # Detection request micro-batching
+    DETECT_MAX_BATCH_SIZE = int(os.environ.get('AURALITE_DETECT_MAX_BATCH_SIZE', 32))
+    DETECT_MAX_WAIT_MS = float(os.environ.get('AURALITE_DETECT_MAX_WAIT_MS', 5))
+    # Largest /api/detect/batch request accepted (413 above this)
+    DETECT_BATCH_MAX_ITEMS = int(os.environ.get('AURALITE_DETECT_BATCH_MAX_ITEMS', 1000))
+    
+    MODEL_DIR = os.environ.get('AURALITE_MODEL_DIR', 'models/ensemble/')
+    # 'numpy' (flat forest + frozen fusion net), 'keras', or 'rf' (forest only, no TensorFlow)
+    MODEL_BACKEND = os.environ.get('AURALITE_MODEL_BACKEND', 'numpy')
+    # Seconds between checks of MODEL_DIR/CURRENT for a new version; 0 disables the watcher
+    MODEL_WATCH_INTERVAL = float(os.environ.get('AURALITE_MODEL_WATCH_INTERVAL', 0))
+    # Serving-time anomaly baselines: saved every N seconds (0 disables) and on shutdown
+    ANOMALY_STATE_PATH = os.environ.get('AURALITE_ANOMALY_STATE_PATH', os.path.join(MODEL_DIR, 'anomaly_state.npz'))
+    ANOMALY_STATE_SAVE_INTERVAL = float(os.environ.get('AURALITE_ANOMALY_STATE_SAVE_INTERVAL', 60))
+    # Model inference pool: 'thread' or 'process'
+    INFERENCE_EXECUTOR = os.environ.get('AURALITE_INFERENCE_EXECUTOR', 'thread')
+    INFERENCE_WORKERS = int(os.environ.get('AURALITE_INFERENCE_WORKERS', 2))
+    INFERENCE_MAX_QUEUE = int(os.environ.get('AURALITE_INFERENCE_MAX_QUEUE', 64))
+    # Detection result cache; 0 entries disables it. Buckets: 'feature=width,...' overrides
+    PREDICTION_CACHE_SIZE = int(os.environ.get('AURALITE_PREDICTION_CACHE_SIZE', 4096))
+    PREDICTION_CACHE_TTL_S = float(os.environ.get('AURALITE_PREDICTION_CACHE_TTL_S', 300))
+    PREDICTION_CACHE_BUCKETS = os.environ.get('AURALITE_PREDICTION_CACHE_BUCKETS', '')
+    
+    # HTTP caching: max-age of reference-data routes, smallest body worth compressing
+    REFERENCE_CACHE_MAX_AGE = int(os.environ.get('AURALITE_REFERENCE_CACHE_MAX_AGE', 300))
+    COMPRESS_MIN_BYTES = int(os.environ.get('AURALITE_COMPRESS_MIN_BYTES', 1024))
+    
+    # In-memory alert store: newest alerts kept before the oldest are evicted
+    ALERT_RETENTION = int(os.environ.get('AURALITE_ALERT_RETENTION', 10000))
+    # Durable alert/detection history (SQLite, WAL) written in batches by a background thread
+    HISTORY_DB_PATH = os.environ.get('AURALITE_HISTORY_DB', os.path.join('data', 'auralite_history.db'))
+    HISTORY_BATCH_SIZE = int(os.environ.get('AURALITE_HISTORY_BATCH_SIZE', 500))
+    HISTORY_FLUSH_INTERVAL = float(os.environ.get('AURALITE_HISTORY_FLUSH_INTERVAL', 0.5))
+    
     # Notification settings
     NOTIFICATION_REFRESH_INTERVAL = 5
     ENABLE_SOUND_ALERTS = True
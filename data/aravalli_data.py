@@ -8,12 +8,23 @@ import pandas as pd
 from datetime import datetime, timedelta
 import random
 from .coordinates import MONITORING_LOCATIONS, GPS_CHECKPOINTS
+from utils.export import time_bounds
 
 class AravalliDataLoader:
     """Load Aravalli-specific monitoring data"""
     
+    # Frame and time column behind each metric of get_time_series
+    SERIES = {
+        'ndvi': ('ndvi_time_series', 'date'),
+        'nightlight': ('nightlight_data', 'date'),
+        'acoustic': ('acoustic_detections', 'timestamp'),
+        'camera': ('camera_feeds', 'timestamp')
+    }
+    
     def __init__(self):
         self.locations = MONITORING_LOCATIONS
+        # Changes whenever the frames are regenerated; used for HTTP cache validators
+        self.version = datetime.now().strftime('%Y%m%d%H%M%S%f')
         self.ndvi_time_series = self._generate_ndvi_data()
         self.nightlight_data = self._generate_nightlight_data()
         self.acoustic_detections = self._generate_acoustic_data()
@@ -289,6 +300,53 @@ class AravalliDataLoader:
         ]
         return sites
     
+    def get_time_series(self, location_ids=None, metrics=None, days=30, start=None, end=None, fields=None):
+        """
+        {metric: {location_id: frame}} for many locations at once. Each metric is
+        one filter plus one grouped pass; days keeps the latest rows per location
+        and start/end (inclusive) bound the time column. fields, when given,
+        keeps only those columns of each metric's frames.
+        """
+        if not location_ids:
+            location_ids = [l['id'] for l in self.locations]
+        metrics = metrics or list(self.SERIES)
+        unknown = [m for m in metrics if m not in self.SERIES]
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+        if fields:
+            available = {c for m in metrics for c in getattr(self, self.SERIES[m][0]).columns}
+            unknown = [f for f in fields if f not in available]
+            if unknown:
+                raise ValueError(f"Unknown fields for {', '.join(metrics)}: {', '.join(unknown)}")
+        
+        # Inclusive bounds; a bare end date covers that whole day
+        lo, hi = time_bounds(start, end)
+        result = {}
+        for metric in metrics:
+            attr, time_col = self.SERIES[metric]
+            frame = getattr(self, attr)
+            columns = [c for c in frame.columns if c in fields] if fields else list(frame.columns)
+            if len(frame) == 0:
+                result[metric] = {loc: frame[columns] for loc in location_ids}
+                continue
+            subset = frame[frame['location_id'].isin(location_ids)]
+            if lo is not None or hi is not None:
+                stamps = pd.to_datetime(subset[time_col])
+                keep = pd.Series(True, index=subset.index)
+                if lo is not None:
+                    keep &= stamps >= lo
+                if hi is not None:
+                    keep &= stamps <= hi
+                subset = subset[keep]
+            grouped = subset.groupby('location_id', sort=False)
+            if days:
+                subset = grouped.tail(days)
+                grouped = subset.groupby('location_id', sort=False)
+            groups = {loc: group[columns] for loc, group in grouped}
+            empty = subset.iloc[:0][columns]
+            result[metric] = {loc: groups.get(loc, empty) for loc in location_ids}
+        return result
+    
     def get_aravalli_stats(self):
         """Get Aravalli-specific statistics"""
         total_active_mines = sum(1 for l in self.locations if l['mining_activity'] == 'active')
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Inference benchmark for EnhancedMiningDetector.
+Measures single-row predict and predict_batch latency percentiles and
+throughput for batch sizes 1..4096, cold-load time and resident memory of a
+fresh serving worker, writes them as JSON and optionally fails when a
+release threshold is exceeded.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config
+from src.ml_models.fusion_model import EnhancedMiningDetector, FEATURE_ORDER, current_model_version
+from src.data_processing.synthetic_data import generate_synthetic_training_data
+
+DEFAULT_BATCH_SIZES = [2 ** k for k in range(13)]  # 1 .. 4096
+DEFAULT_THRESHOLDS = os.path.join(ROOT, 'scripts', 'benchmark_thresholds.json')
+
+# Runs in a fresh interpreter: what one serving worker pays to start
+COLD_LOAD = """
+import json, resource, sys, time
+
+def peak_rss_mb():
+    # ru_maxrss survives fork/exec from a large parent; VmHWM is per address space
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(l.split()[1]) for l in f if l.startswith('VmHWM')) / 1024.0
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+started = time.perf_counter()
+from src.ml_models.fusion_model import EnhancedMiningDetector, FEATURE_ORDER
+imported = time.perf_counter()
+detector = EnhancedMiningDetector()
+detector.load_models(sys.argv[1], backend=sys.argv[2])
+loaded = time.perf_counter()
+detector.predict(dict.fromkeys(FEATURE_ORDER, 0.0))
+first = time.perf_counter()
+print(json.dumps({
+    'import_s': imported - started, 'load_s': loaded - imported,
+    'first_predict_ms': (first - loaded) * 1000.0, 'cold_load_s': first - started,
+    'rss_mb': peak_rss_mb()
+}))
+"""
+
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'p99_ms': round(float(np.percentile(samples, 99)), 4),
+        'mean_ms': round(float(samples.mean()), 4)
+    }
+
+
+def time_calls(fn, min_repeats, min_seconds):
+    """Latencies of repeated fn() calls, after one warm-up call"""
+    fn()
+    latencies = []
+    deadline = time.perf_counter() + min_seconds
+    while len(latencies) < min_repeats or time.perf_counter() < deadline:
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    return latencies
+
+
+def prepare_models(model_dir, train, n_samples, epochs):
+    """Use the saved models in model_dir, or train on synthetic data into a temporary root"""
+    if not train and current_model_version(model_dir) is not None:
+        return model_dir
+    target = tempfile.mkdtemp(prefix='auralite-bench-')
+    print(f"🧠 Training on {n_samples} synthetic rows into {target}...")
+    detector = EnhancedMiningDetector()
+    detector.train(generate_synthetic_training_data(n_samples, seed=42), epochs=epochs)
+    detector.save_models(target)
+    return target
+
+
+def cold_load(model_dir, backend):
+    out = subprocess.run(
+        [sys.executable, '-c', COLD_LOAD, model_dir, backend],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return {k: round(v, 4) for k, v in json.loads(out.stdout.strip().splitlines()[-1]).items()}
+
+
+def run_benchmark(model_dir, backend='numpy', batch_sizes=DEFAULT_BATCH_SIZES, min_repeats=20, min_seconds=0.5):
+    detector = EnhancedMiningDetector()
+    detector.load_models(model_dir, backend=backend)
+    rows = generate_synthetic_training_data(max(batch_sizes), seed=7)[FEATURE_ORDER]
+    X = rows.to_numpy()
+    single = rows.iloc[0].to_dict()
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'model_version': current_model_version(model_dir),
+        'backend': backend,
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'predict': percentiles(time_calls(lambda: detector.predict(single), min_repeats, min_seconds)),
+        'batch': {}
+    }
+    for size in batch_sizes:
+        batch = X[:size]
+        latencies = time_calls(lambda: detector.predict_batch(batch), min_repeats, min_seconds)
+        stats = percentiles(latencies)
+        stats['rows_per_s'] = round(size / (np.mean(latencies) / 1000.0), 1)
+        results['batch'][str(size)] = stats
+        print(f"  batch {size:5d}: p50 {stats['p50_ms']:9.3f} ms  p99 {stats['p99_ms']:9.3f} ms  "
+              f"{stats['rows_per_s']:12.1f} rows/s")
+    results['worker'] = cold_load(model_dir, backend)
+    return results
+
+
+def check_thresholds(results, thresholds):
+    """List of human-readable regressions; empty when every threshold holds"""
+    failures = []
+
+    def over(name, value, limit):
+        if limit is not None and value > limit:
+            failures.append(f"{name} = {value} exceeds {limit}")
+
+    over('predict p99_ms', results['predict']['p99_ms'], thresholds.get('predict_p99_ms'))
+    for size, limit in thresholds.get('batch_p99_ms', {}).items():
+        if size in results['batch']:
+            over(f'batch {size} p99_ms', results['batch'][size]['p99_ms'], limit)
+    for size, floor in thresholds.get('batch_min_rows_per_s', {}).items():
+        if size in results['batch'] and results['batch'][size]['rows_per_s'] < floor:
+            failures.append(f"batch {size} rows_per_s = {results['batch'][size]['rows_per_s']} below {floor}")
+    over('worker cold_load_s', results['worker']['cold_load_s'], thresholds.get('cold_load_s'))
+    over('worker rss_mb', results['worker']['rss_mb'], thresholds.get('worker_rss_mb'))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', default=Config.MODEL_DIR)
+    parser.add_argument('--backend', default=Config.MODEL_BACKEND, choices=['numpy', 'keras', 'rf'])
+    parser.add_argument('--train', action='store_true', help='train on synthetic data even if models exist')
+    parser.add_argument('--samples', type=int, default=1000)
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-sizes', default=','.join(map(str, DEFAULT_BATCH_SIZES)))
+    parser.add_argument('--min-repeats', type=int, default=20)
+    parser.add_argument('--min-seconds', type=float, default=0.5)
+    parser.add_argument('--output', default='logs/benchmark_inference.json')
+    parser.add_argument('--thresholds', default=DEFAULT_THRESHOLDS)
+    parser.add_argument('--check', action='store_true', help='exit non-zero when a threshold is exceeded')
+    args = parser.parse_args()
+
+    model_dir = prepare_models(args.model_dir, args.train, args.samples, args.epochs)
+    print(f"⏱️  Benchmarking {args.backend} backend from {model_dir}...")
+    results = run_benchmark(
+        model_dir, args.backend, [int(s) for s in args.batch_sizes.split(',')],
+        args.min_repeats, args.min_seconds
+    )
+
+    with open(args.thresholds) as f:
+        thresholds = json.load(f).get(args.backend, {})
+    results['thresholds'] = thresholds
+    results['regressions'] = check_thresholds(results, thresholds)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"  predict p99 {results['predict']['p99_ms']} ms, cold load {results['worker']['cold_load_s']} s, "
+          f"worker RSS {results['worker']['rss_mb']} MB -> {args.output}")
+
+    for failure in results['regressions']:
+        print(f"  ❌ {failure}")
+    if args.check and results['regressions']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
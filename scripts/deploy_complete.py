@@ -25,38 +25,35 @@ def setup_environment():
 def train_initial_model():
     print("\n🧠 Training Initial Enhanced Model...")
     from src.ml_models.fusion_model import EnhancedMiningDetector
-    import numpy as np
+    from src.data_processing.synthetic_data import generate_synthetic_training_data
     
     detector = EnhancedMiningDetector()
     
     # Generate synthetic training data
-    n_samples = 1000
-    synthetic_data = []
-    for i in range(n_samples):
-        is_mining = 1 if np.random.random() > 0.7 else 0
-        record = {
-            'ndvi_mean': np.random.normal(0.3, 0.1) if is_mining else np.random.normal(0.6, 0.1),
-            'ndvi_trend': np.random.normal(-0.1, 0.05) if is_mining else np.random.normal(0, 0.02),
-            'ndvi_volatility': np.random.exponential(0.1),
-            'ndvi_min': 0.2, 'ndvi_max': 0.8,
-            'nightlight_mean': np.random.exponential(20) if is_mining else np.random.exponential(5),
-            'nightlight_trend': np.random.normal(2, 1) if is_mining else np.random.normal(0, 0.5),
-            'nightlight_peak': 30, 'nightlight_volatility': 5,
-            'acoustic_activity': np.random.poisson(10) if is_mining else np.random.poisson(2),
-            'drilling_freq': np.random.normal(150, 50) if is_mining else 0,
-            'excavator_freq': np.random.normal(100, 30) if is_mining else 0,
-            'max_confidence': 0.9,
-            'is_mining': is_mining,
-            'severity': np.random.randint(0, 3) if is_mining else 0,
-            'equipment_type': np.random.randint(1, 5) if is_mining else 0
-        }
-        synthetic_data.append(record)
+    synthetic_data = generate_synthetic_training_data(n_samples=1000)
     
     detector.train(synthetic_data, epochs=20)
+    train_temporal_model(detector)
     detector.save_models()
     print("  ✅ Models trained and saved to models/ensemble/")
     return True
 
+def train_temporal_model(detector, epochs=5):
+    """Fit the LSTM behind /api/detect/temporal on daily windows of the loader's fusion features"""
+    from config import Config
+    from data.aravalli_data import AravalliDataLoader
+    from src.data_processing.feature_builder import build_from_loader, label_from_locations
+    from src.data_processing.sequences import SequenceDataset
+
+    loader = AravalliDataLoader()
+    table = build_from_loader(loader, window_days=Config.FEATURE_WINDOW_DAYS)
+    # to_frame() is location-major, so the day labels fold back into (n_locations, n_days)
+    labels = label_from_locations(table.to_frame(), loader.locations)['is_mining'].to_numpy()
+    labels = labels.reshape(len(table.locations), len(table.dates))
+    dataset = SequenceDataset.from_table(table, labels=labels, window=Config.SEQUENCE_WINDOW_DAYS)
+    detector.train_temporal(dataset, epochs=epochs)
+    print(f"  ✅ Temporal model trained on {len(dataset)} windows")
+
 def create_docker_prod():
     print("\n🐳 Creating Docker Configuration...")
     dockerfile_content = """
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Nightly incremental model refresh.
+Loads the active model version, updates it on the most recent days of
+labelled features only and publishes the result as a new version.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from src.ml_models.fusion_model import EnhancedMiningDetector, current_model_version, resolve_model_path
+from src.data_processing.feature_builder import build_from_loader, label_from_locations
+
+
+def recent_training_frame(days):
+    from data.aravalli_data import AravalliDataLoader
+    loader = AravalliDataLoader()
+    table = build_from_loader(loader, window_days=Config.FEATURE_WINDOW_DAYS)
+    frame = label_from_locations(table.to_frame(), loader.locations)
+    return frame[frame['date'] > table.dates[-1] - pd.Timedelta(days=days)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--model-dir', default=Config.MODEL_DIR)
+    parser.add_argument('--days', type=int, default=1, help='days of new data to train on')
+    parser.add_argument('--new-trees', type=int, default=50)
+    parser.add_argument('--max-trees', type=int, default=400)
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--keep-versions', type=int, default=5,
+                        help='Versions to keep after publishing (0 keeps all)')
+    args = parser.parse_args()
+
+    started = time.time()
+    print(f"🔄 Refreshing model version {current_model_version(args.model_dir)}...")
+    detector = EnhancedMiningDetector()
+    # Incremental updates need the trainable sklearn/Keras artifacts
+    detector.load_models(resolve_model_path(args.model_dir), backend='keras')
+
+    frame = recent_training_frame(args.days)
+    detector.train(frame, incremental=True, new_trees=args.new_trees,
+                   max_trees=args.max_trees, epochs=args.epochs)
+    version = detector.save_models(args.model_dir, keep_versions=args.keep_versions)
+    print(f"  ✅ Published {version} in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Micro-batching for concurrent detection requests.
+Feature rows from concurrent callers are queued and flushed to the batched
+model path when the batch is full or the oldest row has waited max_wait_ms.
+"""
+
+import time
+import asyncio
+from collections import deque
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+
+class MicroBatcher:
+    """Coalesce single-row predictions into predict_batch calls"""
+
+    def __init__(self, predict_batch, max_batch_size=32, max_wait_ms=5.0, executor=None, metrics_window=1000):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        # InferenceExecutor to run batches on; defaults to starlette's thread pool
+        self.executor = executor
+
+        self._queue = None
+        self._loop = None
+        self._worker = None
+        self._dispatching = set()
+
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self._batch_sizes = deque(maxlen=metrics_window)
+        self._queue_waits_ms = deque(maxlen=metrics_window)
+
+    def _ensure_worker(self):
+        # Bind to the running loop; a new loop (e.g. a new test client) gets a fresh queue
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, features):
+        """Queue one feature row and wait for its own prediction"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((features, future, time.perf_counter()))
+        self.requests += 1
+        return await future
+
+    async def _collect(self):
+        """Wait for a first row, then gather more until full or the deadline passes"""
+        batch = [await self._queue.get()]
+        deadline = batch[0][2] + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # Still take whatever is already queued without waiting
+                if self._queue.empty():
+                    break
+                batch.append(self._queue.get_nowait())
+                continue
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self._queue_waits_ms.append((started - enqueued) * 1000.0)
+            self._batch_sizes.append(len(batch))
+            self.batches += 1
+            # Dispatch without waiting so several batches can use a multi-worker executor
+            task = self._loop.create_task(self._dispatch(batch))
+            self._dispatching.add(task)
+            task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, batch):
+        rows = [row for row, _, _ in batch]
+        try:
+            if self.executor is not None:
+                results = await self.executor.run(self.predict_batch, rows)
+            else:
+                results = await run_in_threadpool(self.predict_batch, rows)
+        except Exception as e:
+            self.errors += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def metrics(self):
+        sizes = np.array(self._batch_sizes) if self._batch_sizes else np.zeros(1)
+        waits = np.array(self._queue_waits_ms) if self._queue_waits_ms else np.zeros(1)
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'errors': self.errors,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_ms,
+            'batch_size_mean': round(float(sizes.mean()), 2),
+            'batch_size_max': int(sizes.max()),
+            'queue_wait_ms_p50': round(float(np.percentile(waits, 50)), 3),
+            'queue_wait_ms_p99': round(float(np.percentile(waits, 99)), 3)
+        }
@@ -0,0 +1,148 @@
+"""
+Bounded executor for model inference.
+Keeps sklearn/network calls off the event loop and rejects work once the
+in-flight limit is reached instead of letting latency grow without bound.
+"""
+
+import time
+import asyncio
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+
+
+class InferenceQueueFull(Exception):
+    """Too many inference jobs in flight; the caller should retry later (429)"""
+
+
+class InferenceUnavailable(Exception):
+    """The inference pool cannot take work, e.g. its worker processes died (503)"""
+
+
+# Model registry owned by a process-pool worker
+_worker_registry = None
+
+
+def load_worker_detector(model_path, backend='numpy'):
+    """Process-pool initializer: load the saved ensemble once per worker"""
+    global _worker_registry
+    from src.ml_models.registry import ModelRegistry
+    _worker_registry = ModelRegistry(model_path, backend=backend)
+    _worker_registry.reload()
+
+
+def predict_in_worker(rows):
+    # Workers follow the CURRENT pointer themselves, so a reload reaches every process
+    _worker_registry.refresh_if_stale()
+    # Anomaly streams are owned (and persisted) by the API process, which scores every row
+    return _worker_registry.current.predict_batch(rows, score_anomalies=False)
+
+
+def predict_temporal_in_worker(windows):
+    _worker_registry.refresh_if_stale()
+    return _worker_registry.current.predict_temporal(windows)
+
+
+class InferenceExecutor:
+    """
+    Thread or process pool with admission control. At most
+    max_workers + max_queue jobs are accepted at once.
+    """
+
+    def __init__(self, kind='thread', max_workers=2, max_queue=64, initializer=None, initargs=(),
+                 metrics_window=1000):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown inference executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.initializer = initializer
+        self.initargs = initargs
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._latencies_ms = deque(maxlen=metrics_window)
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == 'process':
+                # spawn keeps workers clear of TensorFlow/thread state in the parent
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=self.initializer, initargs=self.initargs
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='inference',
+                    initializer=self.initializer, initargs=self.initargs
+                )
+        return self._executor
+
+    def _admit(self):
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise InferenceQueueFull(f"{self.in_flight} inference jobs in flight")
+            self.in_flight += 1
+            self.submitted += 1
+            return self._get_executor()
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool; raises InferenceQueueFull or InferenceUnavailable"""
+        executor = self._admit()
+        started = time.perf_counter()
+        try:
+            try:
+                future = asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            except RuntimeError as e:
+                # submit() on a pool that was shut down underneath us
+                raise InferenceUnavailable(str(e)) from e
+            result = await future
+        except BrokenProcessPool as e:
+            self.failed += 1
+            with self._lock:
+                # Drop the broken pool; the next admitted job starts a fresh one
+                if self._executor is executor:
+                    self._executor = None
+            raise InferenceUnavailable(str(e)) from e
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        self.completed += 1
+        self._latencies_ms.append((time.perf_counter() - started) * 1000.0)
+        return result
+
+    def metrics(self):
+        latencies = np.array(self._latencies_ms) if self._latencies_ms else np.zeros(1)
+        return {
+            'kind': self.kind,
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'in_flight': self.in_flight,
+            'queued': max(0, self.in_flight - self.max_workers),
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'latency_ms_p50': round(float(np.percentile(latencies, 50)), 3),
+            'latency_ms_p99': round(float(np.percentile(latencies, 99)), 3)
+        }
+
+    def shutdown(self, wait=True):
+        """Release the pool; a later run() starts a new one"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
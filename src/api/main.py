@@ -1,5 +1,6 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 import pandas as pd
@@ -7,10 +8,25 @@ import numpy as np
 from datetime import datetime, timedelta
 import uvicorn
 import os
+import threading
+import anyio
+from starlette.concurrency import run_in_threadpool
 
+from config import Config
+from data.coordinates import MONITORING_LOCATIONS
 from src.data_processing.satellite_data import EnhancedSatelliteDataCollector
 from src.data_processing.acoustic_sensor import AdvancedAcousticDetector
-from src.ml_models.fusion_model import EnhancedMiningDetector
+from src.data_processing.audio_stream import ChunkTooShort, ForwardStream, process_audio_stream
+from src.data_processing.feature_store import AcousticFeatureStore, validate_kind, validate_sensor_id
+from src.data_processing.feature_builder import build_from_loader
+from src.data_processing.sequences import latest_windows
+from src.api.batching import MicroBatcher
+from src.api.prediction_cache import PredictionCache, parse_buckets
+from src.api.inference import (
+    InferenceExecutor, InferenceQueueFull, InferenceUnavailable,
+    load_worker_detector, predict_in_worker, predict_temporal_in_worker
+)
+from src.ml_models.registry import ModelRegistry
 
 app = FastAPI(title="Auralite API v2.0", description="Enhanced Illegal Mining Detection System")
 
@@ -25,21 +41,156 @@ app.add_middleware(
 
 # Initialize components
 satellite_collector = EnhancedSatelliteDataCollector()
-detector = EnhancedMiningDetector()
+# Active model version; swapped atomically on reload
+model_registry = ModelRegistry(Config.MODEL_DIR, backend=Config.MODEL_BACKEND, state_path=Config.ANOMALY_STATE_PATH)
+
+# One acoustic detector per sensor so noise profiles carry across uploads
+acoustic_detectors = {}
+acoustic_detectors_lock = threading.Lock()
+# One lock per sensor: its detector's noise profile (and profile file) take one chunk at a time
+sensor_locks = {}
+feature_store = AcousticFeatureStore(Config.FEATURE_STORE_DIR)
+
+def check_sensor_input(sensor_id, kind='mfcc'):
+    """400 for sensor ids or feature kinds that cannot safely name files in the stores"""
+    try:
+        validate_sensor_id(sensor_id)
+        validate_kind(kind)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def get_sensor_lock(sensor_id):
+    with acoustic_detectors_lock:
+        return sensor_locks.setdefault(sensor_id, threading.Lock())
+
+def get_acoustic_detector(sensor_id, sampling_rate):
+    with acoustic_detectors_lock:
+        acoustic = acoustic_detectors.get(sensor_id)
+        if acoustic is None or acoustic.sampling_rate != sampling_rate:
+            acoustic = AdvancedAcousticDetector(
+                sensor_id=sensor_id,
+                sampling_rate=sampling_rate,
+                noise_profile_dir=Config.NOISE_PROFILE_DIR
+            )
+            acoustic.feature_store = feature_store
+            acoustic_detectors[sensor_id] = acoustic
+        return acoustic
+
+# Model calls run on a bounded pool so the event loop stays free. The pool only
+# runs RF/NN; anomaly scores come from score_anomalies below in every mode, so
+# one set of per-location streams (this process's, persisted by the registry)
+# sees every request, whether it hits the cache or which worker served it.
+def predict_rows(rows):
+    # One registry read per batch, so a batch never straddles two model versions
+    return model_registry.current.predict_batch(rows, score_anomalies=False)
+
+def score_anomalies(rows, results):
+    """Add each row's online anomaly score (updating its location's stream) to its result"""
+    scores = model_registry.current.anomaly_scores(rows)
+    for result, score in zip(results, scores):
+        result['anomaly_score'] = float(score)
+
+def predict_temporal_rows(windows):
+    return model_registry.current.predict_temporal(windows)
+
+if Config.INFERENCE_EXECUTOR == 'process':
+    inference_executor = InferenceExecutor(
+        'process', Config.INFERENCE_WORKERS, Config.INFERENCE_MAX_QUEUE,
+        initializer=load_worker_detector, initargs=(Config.MODEL_DIR, Config.MODEL_BACKEND)
+    )
+    predict_fn = predict_in_worker
+    temporal_fn = predict_temporal_in_worker
+else:
+    inference_executor = InferenceExecutor('thread', Config.INFERENCE_WORKERS, Config.INFERENCE_MAX_QUEUE)
+    predict_fn = predict_rows
+    temporal_fn = predict_temporal_rows
+
+# Concurrent /api/detect calls share one model pass
+detect_batcher = MicroBatcher(
+    predict_fn,
+    max_batch_size=Config.DETECT_MAX_BATCH_SIZE,
+    max_wait_ms=Config.DETECT_MAX_WAIT_MS,
+    executor=inference_executor
+)
+
+# Repeat detections of near-identical feature vectors skip the model entirely
+prediction_cache = None
+if Config.PREDICTION_CACHE_SIZE > 0:
+    prediction_cache = PredictionCache(
+        Config.PREDICTION_CACHE_SIZE, Config.PREDICTION_CACHE_TTL_S,
+        parse_buckets(Config.PREDICTION_CACHE_BUCKETS)
+    )
+    model_registry.subscribe(prediction_cache.clear)
 
 # Load models if they exist
 try:
-    detector.load_models()
+    model_registry.reload()
     print("Models loaded successfully.")
-except:
+except Exception:
     print("No trained models found. Please run training script.")
 
+# Fusion features for every monitoring location, built on first use from the loader frames
+feature_table = None
+feature_table_lock = threading.Lock()
+
+def get_feature_table():
+    global feature_table
+    with feature_table_lock:
+        if feature_table is None:
+            from data.aravalli_data import AravalliDataLoader
+            feature_table = build_from_loader(AravalliDataLoader(), window_days=Config.FEATURE_WINDOW_DAYS)
+        return feature_table
+
+def nearest_monitoring_location(lat, lon, radius_km):
+    """Id of the closest monitoring location within radius_km, or None"""
+    coords = np.radians([[loc['lat'], loc['lon']] for loc in MONITORING_LOCATIONS])
+    lat, lon = np.radians(lat), np.radians(lon)
+    # Equirectangular distance is plenty at these scales
+    dx = (coords[:, 1] - lon) * np.cos((coords[:, 0] + lat) / 2)
+    dy = coords[:, 0] - lat
+    distance_km = 6371.0 * np.hypot(dx, dy)
+    best = int(np.argmin(distance_km))
+    return MONITORING_LOCATIONS[best]['id'] if distance_km[best] <= radius_km else None
+
+def features_for_location(location, table):
+    """(feature dict, location_id) from the latest window, or (None, None) when no site with data is in range"""
+    location_id = nearest_monitoring_location(location.lat, location.lon, location.radius)
+    if location_id is None or location_id not in table:
+        return None, None
+    return table.latest(location_id), location_id
+
+def out_of_range_detail(location):
+    return f"No monitoring location within {location.radius} km of ({location.lat}, {location.lon})."
+
 # Data models
 class Location(BaseModel):
     lat: float
     lon: float
     radius: float = 5.0
 
+class BandSummary(BaseModel):
+    snr_db_mean: float
+    snr_db_p95: float
+    active_seconds: float
+    peak_freq_hz: float
+
+class EdgeEvent(BaseModel):
+    equipment: str
+    confidence: float
+    timestamp: Optional[str] = None
+
+class FeaturePayload(BaseModel):
+    """Compact payload produced by AdvancedAcousticDetector in edge mode"""
+    sensor_id: str
+    location: Optional[str] = None
+    timestamp: str
+    duration_seconds: float
+    sampling_rate: int
+    feature_type: str = 'mfcc'
+    features: str = Field(..., description="base64 little-endian float16 feature vector")
+    bands: Dict[str, BandSummary]
+    events: List[EdgeEvent] = []
+
 class DetectionRequest(BaseModel):
     location: Location
     start_date: Optional[str] = None
@@ -47,44 +198,244 @@ class DetectionRequest(BaseModel):
     use_acoustic: bool = True
     use_satellite: bool = True
 
+class BatchDetectionItem(BaseModel):
+    location: Location
+    features: Optional[Dict[str, float]] = None
+
+class BatchDetectionRequest(BaseModel):
+    items: List[BatchDetectionItem]
+
+@app.exception_handler(InferenceQueueFull)
+async def inference_queue_full(request: Request, exc: InferenceQueueFull):
+    return JSONResponse(status_code=429, content={"detail": "Inference queue is full, retry shortly."},
+                        headers={"Retry-After": "1"})
+
+@app.exception_handler(InferenceUnavailable)
+async def inference_unavailable(request: Request, exc: InferenceUnavailable):
+    return JSONResponse(status_code=503, content={"detail": f"Inference unavailable: {exc}"})
+
+@app.on_event("startup")
+def start_model_watcher():
+    if Config.MODEL_WATCH_INTERVAL > 0:
+        model_registry.start_watching(Config.MODEL_WATCH_INTERVAL)
+    if Config.ANOMALY_STATE_SAVE_INTERVAL > 0:
+        model_registry.start_persisting(Config.ANOMALY_STATE_SAVE_INTERVAL)
+
+@app.on_event("shutdown")
+def shutdown_inference():
+    model_registry.stop_watching()
+    model_registry.stop_persisting()
+    inference_executor.shutdown(wait=False)
+
 @app.get("/")
 async def root():
     return {"message": "Auralite API v2.0 Active", "timestamp": datetime.now().isoformat()}
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "model_trained": detector.is_trained}
+    return {"status": "healthy", "model_trained": model_registry.current.is_trained,
+            "model_version": model_registry.version}
 
 @app.post("/api/detect")
 async def detect(request: DetectionRequest):
-    if not detector.is_trained:
+    if not model_registry.current.is_trained:
         raise HTTPException(status_code=400, detail="Model not trained.")
     
-    # In a real scenario, this would trigger data collection
-    # For demo/test, we'll use a placeholder logic or dummy data
-    # Here we simulate the feature extraction
-    dummy_features = {
-        'ndvi_mean': 0.35, 'ndvi_trend': -0.05, 'ndvi_volatility': 0.1,
-        'ndvi_min': 0.2, 'ndvi_max': 0.5,
-        'nightlight_mean': 15.0, 'nightlight_trend': 2.0,
-        'nightlight_peak': 25.0, 'nightlight_volatility': 4.0,
-        'acoustic_activity': 5, 'drilling_freq': 120.0,
-        'excavator_freq': 80.0, 'max_confidence': 0.85
-    }
-    
-    result = detector.predict(dummy_features)
-    result['location'] = request.location.dict()
+    table = await run_in_threadpool(get_feature_table)
+    features, location_id = features_for_location(request.location, table)
+    if features is None:
+        raise HTTPException(status_code=404, detail=out_of_range_detail(request.location))
+    # location_id routes the row to its location's online anomaly stream
+    row = {**features, 'location_id': location_id}
+    version = model_registry.version
+    result = prediction_cache.get(version, features) if prediction_cache else None
+    if result is None:
+        result = await detect_batcher.submit(row)
+        if prediction_cache:
+            prediction_cache.put(version, features, result)
+    # Hit or miss, the row updates its location's anomaly stream here
+    score_anomalies([row], [result])
+    result['location'] = request.location.model_dump()
+    result['location_id'] = location_id
     result['timestamp'] = datetime.now().isoformat()
     
     return result
 
+@app.post("/api/detect/batch")
+async def detect_batch(request: BatchDetectionRequest):
+    """
+    Score many locations with a single model pass. Items without features
+    outside every monitoring radius come back with scored: false.
+    """
+    if not model_registry.current.is_trained:
+        raise HTTPException(status_code=400, detail="Model not trained.")
+    if not request.items:
+        return {"count": 0, "results": []}
+    if len(request.items) > Config.DETECT_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413,
+                            detail=f"At most {Config.DETECT_BATCH_MAX_ITEMS} items per batch request.")
+
+    table = await run_in_threadpool(get_feature_table)
+    rows, location_ids, scorable = [], [], []
+    for i, item in enumerate(request.items):
+        if item.features is not None:
+            rows.append(item.features)
+            location_ids.append(None)
+        else:
+            features, location_id = features_for_location(item.location, table)
+            location_ids.append(location_id)
+            if features is None:
+                continue
+            rows.append({**features, 'location_id': location_id})
+        scorable.append(i)
+    version = model_registry.version
+    scored = [prediction_cache.get(version, row) if prediction_cache else None for row in rows]
+    misses = [j for j, result in enumerate(scored) if result is None]
+    if misses:
+        predictions = await inference_executor.run(predict_fn, [rows[j] for j in misses])
+        for j, result in zip(misses, predictions):
+            scored[j] = result
+            if prediction_cache:
+                prediction_cache.put(version, rows[j], result)
+    score_anomalies(rows, scored)
+
+    results = [{'scored': False, 'detail': out_of_range_detail(item.location)} for item in request.items]
+    for i, result in zip(scorable, scored):
+        results[i] = {'scored': True, **result}
+    timestamp = datetime.now().isoformat()
+    for item, location_id, result in zip(request.items, location_ids, results):
+        result['location'] = item.location.model_dump()
+        result['location_id'] = location_id
+        result['timestamp'] = timestamp
+
+    return {"count": len(results), "results": results}
+
+@app.get("/api/detect/temporal")
+async def detect_temporal():
+    """Score only the newest sequence window of every monitoring location with the LSTM"""
+    if not model_registry.current.is_trained:
+        raise HTTPException(status_code=400, detail="Model not trained.")
+    table = await run_in_threadpool(get_feature_table)
+    try:
+        windows = latest_windows(table.values, Config.SEQUENCE_WINDOW_DAYS)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=f"Not enough history for a temporal window: {e}")
+    scores = await inference_executor.run(temporal_fn, windows)
+    if scores is None:
+        raise HTTPException(status_code=404, detail="No temporal model trained.")
+
+    return {
+        "window_days": Config.SEQUENCE_WINDOW_DAYS,
+        "window_end": table.dates[-1].strftime('%Y-%m-%d'),
+        "results": [
+            {"location_id": location_id, "probability": float(p), "is_mining": bool(p > 0.5)}
+            for location_id, p in zip(table.locations, scores)
+        ]
+    }
+
+@app.get("/api/models")
+async def model_info():
+    return {"version": model_registry.version, "backend": model_registry.backend,
+            "loaded_at": model_registry.loaded_at, "watching": Config.MODEL_WATCH_INTERVAL > 0}
+
+@app.post("/api/models/reload")
+async def reload_models(force: bool = False):
+    """Load the version MODEL_DIR/CURRENT points at and swap it in; in-flight requests finish on the old one"""
+    try:
+        return await run_in_threadpool(model_registry.reload, force)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/api/metrics")
+async def metrics():
+    return {"batching": detect_batcher.metrics(), "inference": inference_executor.metrics(),
+            "cache": prediction_cache.metrics() if prediction_cache else None}
+
 @app.post("/api/sensor/data")
-async def sensor_data(sensor_id: str, file: UploadFile = File(...)):
-    # Save and process sensor data
-    content = await file.read()
-    # In production: detector_acoustic = AdvancedAcousticDetector(sensor_id)
-    # result = detector_acoustic.process_chunk(audio_bytes)
-    return {"message": "Data received", "size": len(content)}
+async def sensor_data(sensor_id: str, request: Request,
+                      chunk_seconds: float = Query(Config.ACOUSTIC_CHUNK_SECONDS, gt=0,
+                                                   le=Config.ACOUSTIC_MAX_CHUNK_SECONDS)):
+    """
+    Stream a WAV/FLAC recording through the acoustic pipeline.
+    The body is decoded as it arrives, so memory stays bounded for any length.
+    """
+    check_sensor_input(sensor_id)
+    if request.headers.get('content-type', '').startswith('multipart/form-data'):
+        # Legacy form uploads: starlette has already spooled the part, decode it incrementally
+        form = await request.form()
+        upload = form.get('file')
+        if upload is None:
+            raise HTTPException(status_code=400, detail="Missing 'file' form field.")
+        read_chunk = lambda: upload.file.read(Config.UPLOAD_READ_SIZE)
+        length = None
+    else:
+        body = request.stream()
+
+        async def next_chunk():
+            try:
+                return await body.__anext__()
+            except StopAsyncIteration:
+                return b''
+
+        # Called from the decoding thread; hops back to the event loop for each network read
+        read_chunk = lambda: anyio.from_thread.run(next_chunk)
+        length = int(request.headers['content-length']) if 'content-length' in request.headers else None
+
+    stream = ForwardStream(read_chunk, length=length)
+    try:
+        result = await run_in_threadpool(
+            process_audio_stream, stream,
+            lambda sampling_rate: get_acoustic_detector(sensor_id, sampling_rate),
+            chunk_seconds, lock=get_sensor_lock(sensor_id)
+        )
+    except ChunkTooShort as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+    return {"message": "Data received", "sensor_id": sensor_id, "size": stream.bytes_received, **result}
+
+@app.post("/api/sensor/features")
+async def sensor_features(payload: FeaturePayload):
+    """Ingest an edge feature payload and run detection on it directly, no audio decode"""
+    check_sensor_input(payload.sensor_id, payload.feature_type)
+    acoustic = get_acoustic_detector(payload.sensor_id, payload.sampling_rate)
+    try:
+        result = acoustic.detect_from_payload(payload.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid feature vector: {e}")
+
+    return {
+        "message": "Features received",
+        "sensor_id": payload.sensor_id,
+        "feature_type": payload.feature_type,
+        "feature_dim": int(len(result['features'])),
+        "equipment": result['equipment']
+    }
+
+def find_similar(sensor_id, at, k, kind, start, end):
+    """Reference row nearest to `at` and its k nearest neighbours (a memmap scan; run off the event loop)"""
+    index = feature_store.nearest_in_time(sensor_id, at, kind)
+    query = feature_store.vectors(sensor_id, kind)[index]
+    matches = feature_store.search(sensor_id, query, k=k, kind=kind, start=start, end=end, exclude=index)
+    return {"index": index, "timestamp": feature_store.timestamp_of(sensor_id, index, kind)}, matches
+
+@app.get("/api/sensor/{sensor_id}/similar")
+async def similar_sounds(sensor_id: str, at: str, k: int = Query(10, ge=1, le=Config.SIMILAR_MAX_K),
+                         kind: str = 'mfcc', start: Optional[str] = None, end: Optional[str] = None):
+    """When else did the sound recorded at `at` occur on this sensor?"""
+    check_sensor_input(sensor_id, kind)
+    for name, value in (('at', at), ('start', start), ('end', end)):
+        try:
+            if value is not None:
+                datetime.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"'{name}' must be an ISO 8601 timestamp, got {value!r}")
+    try:
+        reference, matches = await run_in_threadpool(find_similar, sensor_id, at, k, kind, start, end)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"sensor_id": sensor_id, "reference": reference, "matches": matches}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,111 @@
+"""
+LRU/TTL cache for detection results.
+Location statistics drift slowly, so repeated detections usually score the
+same feature vector to within sensor noise. Rows are keyed by model version
+and their features snapped to per-feature buckets; a hit skips the model.
+Per-location, stateful outputs (the online anomaly score) are never cached.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from src.ml_models.fusion_model import FEATURE_ORDER
+
+# Bucket widths in feature units: finer than the models can resolve in practice
+DEFAULT_BUCKETS = {
+    'ndvi_mean': 0.005, 'ndvi_trend': 0.005, 'ndvi_volatility': 0.005, 'ndvi_min': 0.005, 'ndvi_max': 0.005,
+    'nightlight_mean': 0.5, 'nightlight_trend': 0.5, 'nightlight_peak': 0.5, 'nightlight_volatility': 0.5,
+    'acoustic_activity': 1.0, 'drilling_freq': 5.0, 'excavator_freq': 5.0, 'max_confidence': 0.01
+}
+
+# Result keys that depend on the caller's location stream rather than the features alone
+STATEFUL_KEYS = ('anomaly_score',)
+
+
+def _check_widths(buckets):
+    for name, width in buckets.items():
+        if not width > 0:
+            raise ValueError(f"Cache bucket width for {name} must be positive, got {width}")
+    return buckets
+
+
+def parse_buckets(spec):
+    """'ndvi_mean=0.01,drilling_freq=10' -> DEFAULT_BUCKETS with those widths overridden"""
+    buckets = dict(DEFAULT_BUCKETS)
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        name, _, width = item.partition('=')
+        if name not in buckets:
+            raise ValueError(f"Unknown feature in cache buckets: {name}")
+        buckets[name] = float(width)
+    return _check_widths(buckets)
+
+
+class PredictionCache:
+    """Thread-safe LRU of prediction dicts with a per-entry time to live"""
+
+    def __init__(self, max_entries=4096, ttl_s=300.0, buckets=None):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.buckets = _check_widths(dict(DEFAULT_BUCKETS if buckets is None else buckets))
+        self._widths = np.array([self.buckets[name] for name in FEATURE_ORDER], dtype=np.float64)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, version, features):
+        x = np.array([features.get(name, 0) for name in FEATURE_ORDER], dtype=np.float64)
+        return version, np.rint(x / self._widths).astype(np.int64).tobytes()
+
+    def get(self, version, features):
+        """Cached result (a fresh copy, without STATEFUL_KEYS) or None"""
+        key = self.key(version, features)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, version, features, result):
+        key = self.key(version, features)
+        with self._lock:
+            entry = {k: v for k, v in result.items() if k not in STATEFUL_KEYS}
+            self._entries[key] = (time.monotonic() + self.ttl_s, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, *_):
+        """Drop every entry, e.g. when a new model version is installed"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_s': self.ttl_s,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
@@ -0,0 +1,185 @@
+"""
+Batched multi-sensor acoustic inference on a process pool.
+Chunks are sharded by sensor, so each sensor's noise profile still sees its
+chunks in order; equal-length chunks are then stacked for MFCC extraction
+and band detection.
+"""
+
+import os
+import threading
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from src.data_processing.acoustic_sensor import AdvancedAcousticDetector
+
+# One detector per worker process, reused for every shard it receives
+_worker_detector = None
+
+
+def _get_worker_detector(sampling_rate):
+    global _worker_detector
+    if _worker_detector is None or _worker_detector.sampling_rate != sampling_rate:
+        _worker_detector = AdvancedAcousticDetector(
+            sensor_id="batch_worker", sampling_rate=sampling_rate, noise_profile_dir=None
+        )
+    return _worker_detector
+
+
+def process_shard(shard, sampling_rate, use_deep_audio=False):
+    """
+    Worker entry point.
+
+    shard is a list of (sensor_id, location, [chunks], noise_profile). Returns
+    ([(sensor_id, result), ...] in submission order, {sensor_id: noise_profile}).
+    """
+    detector = _get_worker_detector(sampling_rate)
+    owners, denoised, profiles = [], [], {}
+
+    for sensor_id, location, chunks, profile in shard:
+        detector.noise_profile = profile
+        for chunk in chunks:
+            denoised.append(detector.denoise_audio(chunk))
+            owners.append((sensor_id, location))
+        profiles[sensor_id] = detector.noise_profile
+
+    features = [None] * len(denoised)
+    equipment = [None] * len(denoised)
+
+    by_length = defaultdict(list)
+    for i, chunk in enumerate(denoised):
+        by_length[len(chunk)].append(i)
+
+    for length, indices in by_length.items():
+        batch = np.stack([denoised[i] for i in indices])
+        duration = length / sampling_rate
+        if use_deep_audio:
+            batch_features = [detector.extract_deep_features(row) for row in batch]
+        else:
+            batch_features = detector.extract_mfcc_features(batch)
+        batch_equipment = detector.detect_equipment_batch(batch, duration)
+        for j, i in enumerate(indices):
+            features[i] = batch_features[j]
+            equipment[i] = batch_equipment[j]
+
+    results = []
+    for i, (sensor_id, location) in enumerate(owners):
+        results.append((sensor_id, {
+            'sensor_id': sensor_id,
+            'location': location,
+            'features': features[i],
+            'equipment': equipment[i],
+            'status': 'success'
+        }))
+    return results, profiles
+
+
+class AcousticBatchService:
+    """Collect audio chunks from many sensors and process them in batches on a worker pool"""
+
+    def __init__(self, sampling_rate=44100, max_workers=None, use_deep_audio=False,
+                 noise_profile_dir='data/processed/noise_profiles'):
+        self.sampling_rate = sampling_rate
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.use_deep_audio = use_deep_audio
+        self.noise_profile_dir = noise_profile_dir
+
+        # Parent-side detectors own the persistent per-sensor noise profiles
+        self.detectors = {}
+        self._pending = defaultdict(list)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @classmethod
+    def from_locations(cls, locations, **kwargs):
+        """Build a service with one sensor per location that has an acoustic sensor installed"""
+        service = cls(**kwargs)
+        for loc in locations:
+            if loc.get('acoustic_sensor', False):
+                service.register_sensor(loc['id'], location=loc.get('name', 'unknown'))
+        return service
+
+    def register_sensor(self, sensor_id, location="unknown"):
+        if sensor_id not in self.detectors:
+            self.detectors[sensor_id] = AdvancedAcousticDetector(
+                sensor_id=sensor_id,
+                location=location,
+                sampling_rate=self.sampling_rate,
+                noise_profile_dir=self.noise_profile_dir
+            )
+        return self.detectors[sensor_id]
+
+    def submit(self, sensor_id, audio_chunk):
+        """Queue a chunk for the next flush"""
+        self.register_sensor(sensor_id)
+        with self._lock:
+            self._pending[sensor_id].append(np.asarray(audio_chunk, dtype=np.float32))
+
+    def pending_count(self):
+        with self._lock:
+            return sum(len(chunks) for chunks in self._pending.values())
+
+    def flush(self):
+        """Process every queued chunk; returns {sensor_id: [result, ...]} in submission order"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(list)
+        if not pending:
+            return {}
+
+        shards = self._make_shards(pending)
+        if len(shards) == 1:
+            outputs = [process_shard(shards[0], self.sampling_rate, self.use_deep_audio)]
+        else:
+            executor = self._get_executor()
+            futures = [
+                executor.submit(process_shard, shard, self.sampling_rate, self.use_deep_audio)
+                for shard in shards
+            ]
+            outputs = [f.result() for f in futures]
+
+        results = defaultdict(list)
+        for shard_results, profiles in outputs:
+            for sensor_id, result in shard_results:
+                results[sensor_id].append(result)
+            for sensor_id, profile in profiles.items():
+                self.detectors[sensor_id].adopt_noise_profile(profile, updates=len(pending[sensor_id]))
+        return dict(results)
+
+    def process(self, chunks_by_sensor):
+        """Convenience wrapper: submit {sensor_id: chunk or [chunks]} and flush"""
+        for sensor_id, chunks in chunks_by_sensor.items():
+            if isinstance(chunks, np.ndarray) and chunks.ndim == 1:
+                chunks = [chunks]
+            for chunk in chunks:
+                self.submit(sensor_id, chunk)
+        return self.flush()
+
+    def _make_shards(self, pending):
+        """Greedily balance sensors across workers by total sample count"""
+        n_shards = max(1, min(self.max_workers, len(pending)))
+        shards = [[] for _ in range(n_shards)]
+        loads = [0] * n_shards
+        by_size = sorted(pending.items(), key=lambda item: -sum(len(c) for c in item[1]))
+        for sensor_id, chunks in by_size:
+            target = int(np.argmin(loads))
+            detector = self.detectors[sensor_id]
+            shards[target].append((sensor_id, detector.location, chunks, detector.noise_profile))
+            loads[target] += sum(len(c) for c in chunks)
+        return [shard for shard in shards if shard]
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn keeps workers clear of any TensorFlow/thread state in the parent
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def shutdown(self):
+        for detector in self.detectors.values():
+            detector.save_noise_profile()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -1,16 +1,98 @@
 import numpy as np
-import librosa
 import soundfile as sf
-from scipy import signal
+from scipy import signal, ndimage
 import pickle
 import os
+import base64
 from datetime import datetime
 import threading
 import queue
-import noisereduce as nr
+
+from src.data_processing.feature_store import validate_sensor_id
+
+
+def encode_vector(vector):
+    """Pack a feature vector as base64 little-endian float16 for edge uploads"""
+    return base64.b64encode(np.asarray(vector, dtype='<f2').tobytes()).decode('ascii')
+
+
+def decode_vector(encoded):
+    return np.frombuffer(base64.b64decode(encoded), dtype='<f2').astype(np.float32)
+
+
+class NoiseProfile:
+    """
+    Running estimate of a sensor's background noise spectrum.
+
+    The profile is only fed with quiet STFT frames and moves slowly, so a
+    passing excavator does not get absorbed into the noise floor.
+    """
+
+    def __init__(self, n_fft=2048, sampling_rate=44100, alpha=0.02):
+        self.n_fft = n_fft
+        self.sampling_rate = sampling_rate
+        self.alpha = alpha
+        self.mean = None
+        self.var = None
+        self.frames_seen = 0
+
+    @property
+    def is_ready(self):
+        return self.mean is not None
+
+    @property
+    def energy(self):
+        """Expected energy of a single noise frame"""
+        return float(np.sum(self.mean ** 2 + self.var))
+
+    def update(self, magnitudes):
+        """Blend quiet frames (bins x frames magnitude array) into the profile"""
+        n_frames = magnitudes.shape[1]
+        frame_mean = magnitudes.mean(axis=1)
+        frame_var = magnitudes.var(axis=1)
+        if self.mean is None:
+            self.mean, self.var = frame_mean, frame_var
+        else:
+            # One EMA step per frame, applied in closed form for the whole block
+            weight = 1.0 - (1.0 - self.alpha) ** n_frames
+            self.mean = (1.0 - weight) * self.mean + weight * frame_mean
+            self.var = (1.0 - weight) * self.var + weight * frame_var
+        self.frames_seen += n_frames
+
+    def threshold(self, n_std):
+        """Per-bin magnitude above which energy is treated as signal"""
+        return self.mean + n_std * np.sqrt(self.var)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, mean=self.mean, var=self.var, frames_seen=self.frames_seen,
+                     n_fft=self.n_fft, sampling_rate=self.sampling_rate, alpha=self.alpha)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, n_fft=2048, sampling_rate=44100):
+        """Load a saved profile, or start a fresh one if it is missing or incompatible"""
+        profile = cls(n_fft=n_fft, sampling_rate=sampling_rate)
+        if not os.path.exists(path):
+            return profile
+        with np.load(path) as data:
+            if int(data['n_fft']) != n_fft or int(data['sampling_rate']) != sampling_rate:
+                return profile
+            profile.mean = data['mean']
+            profile.var = data['var']
+            profile.frames_seen = int(data['frames_seen'])
+            profile.alpha = float(data['alpha'])
+        return profile
+
 
 class AdvancedAcousticDetector:
-    def __init__(self, sensor_id="sensor_01", location="unknown", sampling_rate=44100):
+    # YAMNet is loaded once per process and shared by every sensor
+    _yamnet = None
+
+    def __init__(self, sensor_id="sensor_01", location="unknown", sampling_rate=44100,
+                 noise_profile_dir='data/processed/noise_profiles', edge_mode=False):
         """
         Initialize advanced acoustic sensor for mining activity detection
         """
@@ -20,6 +102,29 @@ class AdvancedAcousticDetector:
         self.audio_queue = queue.Queue()
         self.is_recording = False
         self.use_deep_audio = True
+
+        # Edge mode: process_chunk returns a compact upload payload (or None when quiet)
+        self.edge_mode = edge_mode
+        self.edge_gate_db = 6.0
+
+        # Optional AcousticFeatureStore; when set, every computed feature vector is kept
+        self.feature_store = None
+
+        # Spectral gate settings, applied against a learned per-sensor noise profile
+        self.stft_size = 2048
+        self.noise_gate_std = 1.5
+        self.noise_prop_decrease = 0.8
+        self.quiet_frame_ratio = 2.0
+        self.profile_save_interval = 10
+        # noise_profile_dir=None keeps the profile in memory only (e.g. inside batch workers)
+        self.noise_profile_path = (
+            os.path.join(noise_profile_dir, f'{validate_sensor_id(sensor_id)}.npz') if noise_profile_dir else None
+        )
+        if self.noise_profile_path:
+            self.noise_profile = NoiseProfile.load(self.noise_profile_path, self.stft_size, sampling_rate)
+        else:
+            self.noise_profile = NoiseProfile(self.stft_size, sampling_rate)
+        self._profile_updates_since_save = 0
         
         # Frequency ranges for mining equipment
         self.equipment_freq_ranges = {
@@ -31,12 +136,53 @@ class AdvancedAcousticDetector:
         
     def denoise_audio(self, audio):
         """Remove environmental noise using spectral gating"""
-        reduced_noise = nr.reduce_noise(
-            y=audio, 
-            sr=self.sampling_rate,
-            prop_decrease=0.8
-        )
-        return reduced_noise
+        return self._denoise_with_spectrum(audio)[0]
+
+    def _denoise_with_spectrum(self, audio):
+        """Spectral gate that also hands back the STFT magnitude it computed"""
+        audio = np.asarray(audio, dtype=np.float32)
+        noverlap = self.stft_size * 3 // 4
+        _, _, stft = signal.stft(audio, fs=self.sampling_rate, nperseg=self.stft_size, noverlap=noverlap)
+        magnitude = np.abs(stft)
+        self._update_noise_profile(magnitude)
+
+        threshold = self.noise_profile.threshold(self.noise_gate_std)
+        gain = np.where(magnitude > threshold[:, None], 1.0, 1.0 - self.noise_prop_decrease)
+        # Light smoothing across time and frequency avoids musical-noise artefacts
+        gain = ndimage.uniform_filter(gain, size=(3, 5), mode='nearest')
+
+        _, reduced_noise = signal.istft(stft * gain, fs=self.sampling_rate,
+                                        nperseg=self.stft_size, noverlap=noverlap)
+        return reduced_noise[:len(audio)].astype(np.float32), magnitude
+
+    def _update_noise_profile(self, magnitude):
+        """Feed the quiet frames of a chunk into this sensor's noise profile"""
+        frame_energy = np.sum(magnitude ** 2, axis=0)
+        if self.noise_profile.is_ready:
+            quiet = frame_energy <= self.quiet_frame_ratio * self.noise_profile.energy
+        else:
+            # Bootstrap from the quietest fifth of the first chunk we see
+            quiet = frame_energy <= np.percentile(frame_energy, 20)
+        if not np.any(quiet):
+            return
+
+        self.noise_profile.update(magnitude[:, quiet])
+        self._profile_updates_since_save += 1
+        if self._profile_updates_since_save >= self.profile_save_interval:
+            self.save_noise_profile()
+
+    def save_noise_profile(self):
+        """Persist the learned noise profile so it survives restarts"""
+        if self.noise_profile.is_ready and self.noise_profile_path:
+            self.noise_profile.save(self.noise_profile_path)
+        self._profile_updates_since_save = 0
+
+    def adopt_noise_profile(self, profile, updates=1):
+        """Take over a profile that was updated elsewhere (e.g. by a batch worker)"""
+        self.noise_profile = profile
+        self._profile_updates_since_save += updates
+        if self._profile_updates_since_save >= self.profile_save_interval:
+            self.save_noise_profile()
 
     def extract_deep_features(self, audio):
         """Use pretrained YAMNet model for feature extraction"""
@@ -44,56 +190,160 @@ class AdvancedAcousticDetector:
             import tensorflow_hub as hub
             # Note: In a real environment, this would load from a local cache or URL
             # For this implementation, we assume hub is available or handle the absence
-            yamnet = hub.load('https://tfhub.dev/google/yamnet/1')
-            scores, embeddings, spectrogram = yamnet(audio)
+            if AdvancedAcousticDetector._yamnet is None:
+                AdvancedAcousticDetector._yamnet = hub.load('https://tfhub.dev/google/yamnet/1')
+            scores, embeddings, spectrogram = AdvancedAcousticDetector._yamnet(audio)
             return embeddings.numpy()
         except Exception as e:
             print(f"Deep feature extraction failed: {e}. Falling back to MFCC.")
             return self.extract_mfcc_features(audio)
 
     def extract_mfcc_features(self, audio_data):
-        """Extract standard acoustic features as fallback"""
+        """Extract standard acoustic features as fallback (works on a single chunk or a stack)"""
+        import librosa  # deferred: librosa pulls in numba and takes seconds to import
         mfccs = librosa.feature.mfcc(y=audio_data, sr=self.sampling_rate, n_mfcc=13)
-        return np.mean(mfccs, axis=1)
+        return np.mean(mfccs, axis=-1)
 
     def detect_equipment(self, audio_data, duration):
         """Detect equipment bands in spectrogram"""
-        detections = []
-        # Spectral analysis
-        frequencies, times, Sxx = signal.spectrogram(audio_data, fs=self.sampling_rate)
-        
+        return self.detect_equipment_batch(np.asarray(audio_data)[np.newaxis, :], duration)[0]
+
+    def detect_equipment_batch(self, audio_batch, duration):
+        """Detect equipment bands for a stack of equal-length chunks (n_chunks x n_samples)"""
+        detections = [[] for _ in range(len(audio_batch))]
+        # Spectral analysis, one spectrogram per row
+        frequencies, times, Sxx = signal.spectrogram(audio_batch, fs=self.sampling_rate, axis=-1)
+
         for equipment, (low_freq, high_freq) in self.equipment_freq_ranges.items():
             freq_mask = (frequencies >= low_freq) & (frequencies <= high_freq)
             if np.any(freq_mask):
-                band_energy = np.sum(Sxx[freq_mask, :], axis=0)
-                threshold = np.mean(band_energy) + 2 * np.std(band_energy)
-                
-                # Check for sustained activity
-                samples_per_second = len(band_energy) / duration
+                band_energy = np.sum(Sxx[:, freq_mask, :], axis=1)
+                threshold = np.mean(band_energy, axis=1) + 2 * np.std(band_energy, axis=1)
+
+                # Check for sustained activity: any run of min_samples frames above threshold
+                n_frames = band_energy.shape[1]
+                samples_per_second = n_frames / duration
                 min_samples = int(5 * samples_per_second)
-                
-                sustained = False
-                for i in range(len(band_energy) - min_samples):
-                    if np.all(band_energy[i:i+min_samples] > threshold):
-                        sustained = True
-                        break
-                
-                if sustained:
-                    detections.append({
+                if n_frames - min_samples <= 0:
+                    continue
+                above = np.cumsum(band_energy > threshold[:, np.newaxis], axis=1)
+                above = np.concatenate([np.zeros((len(above), 1), dtype=above.dtype), above], axis=1)
+                window_hits = above[:, min_samples:n_frames] - above[:, :n_frames - min_samples]
+                sustained = np.any(window_hits == min_samples, axis=1)
+                confidence = np.mean(band_energy, axis=1) / np.max(band_energy, axis=1)
+
+                for row in np.flatnonzero(sustained):
+                    detections[row].append({
                         'equipment': equipment,
-                        'confidence': float(np.mean(band_energy) / np.max(band_energy)),
+                        'confidence': float(confidence[row]),
                         'timestamp': datetime.now().isoformat()
                     })
         return detections
 
     def process_chunk(self, audio_chunk, duration=10):
         """Full processing pipeline for an audio chunk"""
+        if self.edge_mode:
+            return self.build_edge_payload(audio_chunk, duration)
+
         denoised = self.denoise_audio(audio_chunk)
         features = self.extract_deep_features(denoised)
         equipment = self.detect_equipment(denoised, duration)
+        if self.feature_store is not None:
+            vector, kind = self.pool_features(features)
+            self.feature_store.append(self.sensor_id, vector, kind=kind)
         
         return {
             'features': features,
             'equipment': equipment,
             'status': 'success'
         }
+
+    def band_energy_summary(self, magnitude):
+        """Per-equipment band SNR against the learned noise profile, from an STFT magnitude"""
+        frequencies = np.arange(magnitude.shape[0]) * self.sampling_rate / self.stft_size
+        frame_seconds = (self.stft_size - self.stft_size * 3 // 4) / self.sampling_rate
+        noise_power = self.noise_profile.mean ** 2 + self.noise_profile.var
+
+        summary = {}
+        for equipment, (low_freq, high_freq) in self.equipment_freq_ranges.items():
+            band = (frequencies >= low_freq) & (frequencies <= high_freq)
+            if not np.any(band):
+                continue
+            band_power = np.sum(magnitude[band, :] ** 2, axis=0)
+            snr_db = 10 * np.log10(np.maximum(band_power, 1e-12) / max(np.sum(noise_power[band]), 1e-12))
+            summary[equipment] = {
+                'snr_db_mean': round(float(np.mean(snr_db)), 2),
+                'snr_db_p95': round(float(np.percentile(snr_db, 95)), 2),
+                'active_seconds': round(float(np.sum(snr_db >= self.edge_gate_db) * frame_seconds), 2),
+                'peak_freq_hz': round(float(frequencies[band][np.argmax(magnitude[band, :].mean(axis=1))]), 1)
+            }
+        return summary
+
+    def build_edge_payload(self, audio_chunk, duration=10):
+        """
+        Edge-side processing: gate on band energy and return a compact payload
+        (feature vector, band summaries, candidate events), or None when no
+        equipment band rises above the noise floor and nothing needs uploading.
+        """
+        denoised, magnitude = self._denoise_with_spectrum(audio_chunk)
+        bands = self.band_energy_summary(magnitude)
+        if not bands or max(b['snr_db_p95'] for b in bands.values()) < self.edge_gate_db:
+            return None
+
+        features = self.extract_deep_features(denoised) if self.use_deep_audio else self.extract_mfcc_features(denoised)
+        features, kind = self.pool_features(features)
+
+        return {
+            'sensor_id': self.sensor_id,
+            'location': self.location,
+            'timestamp': datetime.now().isoformat(),
+            'duration_seconds': float(duration),
+            'sampling_rate': self.sampling_rate,
+            'feature_type': kind,
+            'features': encode_vector(features),
+            'bands': bands,
+            'events': [
+                {'equipment': e['equipment'], 'confidence': round(e['confidence'], 3), 'timestamp': e['timestamp']}
+                for e in self.detect_equipment(denoised, duration)
+            ]
+        }
+
+    @staticmethod
+    def pool_features(features):
+        """One vector per chunk (per-frame YAMNet embeddings are mean-pooled) and its kind"""
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim > 1:
+            features = features.mean(axis=0)
+        return features, ('mfcc' if len(features) == 13 else 'yamnet')
+
+    def detect_from_payload(self, payload):
+        """Server-side detection from an edge payload, without any audio decoding"""
+        features = decode_vector(payload['features'])
+        if self.feature_store is not None:
+            self.feature_store.append(self.sensor_id, features, payload.get('timestamp'),
+                                      kind=payload.get('feature_type', 'mfcc'))
+        detections = []
+        seen = set()
+        for event in payload.get('events', []):
+            if event['equipment'] in self.equipment_freq_ranges:
+                detections.append(dict(event, source='edge_event'))
+                seen.add(event['equipment'])
+
+        for equipment, band in payload.get('bands', {}).items():
+            if equipment in seen or equipment not in self.equipment_freq_ranges:
+                continue
+            # Same five-second sustained-activity rule as detect_equipment
+            if band['active_seconds'] >= 5 and band['snr_db_p95'] >= self.edge_gate_db:
+                detections.append({
+                    'equipment': equipment,
+                    # Share of band energy not explained by the noise floor
+                    'confidence': round(1 - 10 ** (-band['snr_db_p95'] / 10), 3),
+                    'timestamp': payload.get('timestamp', datetime.now().isoformat()),
+                    'source': 'band_summary'
+                })
+
+        return {
+            'features': features,
+            'equipment': detections,
+            'status': 'success'
+        }
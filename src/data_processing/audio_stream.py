@@ -0,0 +1,298 @@
+"""
+Streaming audio decoding for sensor uploads.
+WAV frames are decoded straight out of the network buffer with np.frombuffer;
+FLAC goes through libsndfile reading from the same forward-only stream.
+Memory stays bounded by the read window plus one analysis chunk.
+"""
+
+import io
+import struct
+from contextlib import nullcontext
+import numpy as np
+import soundfile as sf
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Reported to libsndfile when the upload has no Content-Length
+UNKNOWN_LENGTH = 1 << 62
+
+
+class ChunkTooShort(ValueError):
+    """The requested analysis chunk holds fewer samples than one STFT frame"""
+
+
+class ForwardStream(io.RawIOBase):
+    """
+    Read-only file object over a chunk source (a callable returning bytes,
+    b'' at EOF). Keeps only a small window of already-read bytes so decoders
+    can seek back a little (libsndfile does when probing headers).
+    """
+
+    def __init__(self, read_chunk, length=None, window=1 << 16):
+        self._read_chunk = read_chunk
+        self._window = window
+        self._buffer = bytearray()
+        self._buffer_start = 0
+        self._pos = 0
+        self._eof = False
+        self.length = length
+        self.bytes_received = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            target = offset
+        elif whence == io.SEEK_CUR:
+            target = self._pos + offset
+        else:
+            target = (self.length if self.length is not None else UNKNOWN_LENGTH) + offset
+        if target < self._buffer_start:
+            raise OSError(f"Cannot seek back to {target}; stream window starts at {self._buffer_start}")
+        self._pos = target
+        return self._pos
+
+    def _fill(self, end):
+        """Pull chunks until the buffer covers [pos, end) or the source is exhausted"""
+        while not self._eof and self._buffer_start + len(self._buffer) < end:
+            chunk = self._read_chunk()
+            if not chunk:
+                self._eof = True
+                break
+            self._buffer += chunk
+            self.bytes_received += len(chunk)
+            self._trim()
+
+    def _trim(self):
+        drop = min(self._pos - self._window - self._buffer_start, len(self._buffer))
+        if drop > 0:
+            del self._buffer[:drop]
+            self._buffer_start += drop
+
+    def readinto(self, b):
+        view = memoryview(b).cast('B')
+        self._fill(self._pos + len(view))
+        start = self._pos - self._buffer_start
+        n = max(0, min(len(view), len(self._buffer) - start))
+        view[:n] = self._buffer[start:start + n]
+        self._pos += n
+        self._trim()
+        return n
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self.readall()
+        buf = bytearray(size)
+        n = self.readinto(buf)
+        return bytes(buf[:n])
+
+    def read_exactly(self, size):
+        data = self.read(size)
+        if len(data) != size:
+            raise ValueError("Unexpected end of audio stream")
+        return data
+
+
+class WavStreamDecoder:
+    """Incremental RIFF/WAVE decoder yielding mono float32 blocks"""
+
+    def __init__(self, stream, block_frames=16384):
+        self.stream = stream
+        self.block_frames = block_frames
+        self._parse_header()
+
+    def _parse_header(self):
+        riff, _, wave = struct.unpack('<4sI4s', self.stream.read_exactly(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise ValueError("Not a RIFF/WAVE stream")
+
+        fmt = None
+        while True:
+            chunk_id, chunk_size = struct.unpack('<4sI', self.stream.read_exactly(8))
+            if chunk_id == b'fmt ':
+                fmt = self.stream.read_exactly(chunk_size + (chunk_size & 1))
+            elif chunk_id == b'data':
+                # Streaming writers often leave the size as 0 or 0xFFFFFFFF: read to EOF
+                self.data_bytes = None if chunk_size in (0, 0xFFFFFFFF) else chunk_size
+                break
+            else:
+                self.stream.read_exactly(chunk_size + (chunk_size & 1))
+        if fmt is None:
+            raise ValueError("WAVE stream has no fmt chunk before data")
+
+        format_tag, self.channels, self.sampling_rate, _, self.block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+        if not (self.channels and self.sampling_rate and self.block_align):
+            raise ValueError("WAVE header has zero channels, sampling rate or block alignment")
+        if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            format_tag = struct.unpack('<H', fmt[24:26])[0]
+        self.sample_width = bits // 8
+
+        if format_tag == WAVE_FORMAT_PCM and self.sample_width in (1, 2, 3, 4):
+            self._dtype = {1: np.uint8, 2: np.dtype('<i2'), 3: np.uint8, 4: np.dtype('<i4')}[self.sample_width]
+        elif format_tag == WAVE_FORMAT_IEEE_FLOAT and self.sample_width in (4, 8):
+            self._dtype = np.dtype('<f4') if self.sample_width == 4 else np.dtype('<f8')
+        else:
+            raise ValueError(f"Unsupported WAVE encoding (format {format_tag}, {bits} bits)")
+        self._format_tag = format_tag
+
+    def _to_float(self, raw):
+        """Convert a memoryview of whole frames to mono float32 without an intermediate bytes copy"""
+        if self.sample_width == 3:
+            b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            samples = ((b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)) << 8 >> 8).astype(np.float32) / 8388608.0
+        else:
+            samples = np.frombuffer(raw, dtype=self._dtype)
+            if self._format_tag == WAVE_FORMAT_IEEE_FLOAT:
+                samples = samples.astype(np.float32, copy=False)
+            elif self.sample_width == 1:
+                samples = (samples.astype(np.float32) - 128.0) / 128.0
+            else:
+                samples = samples.astype(np.float32) / float(1 << (8 * self.sample_width - 1))
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        return samples
+
+    def blocks(self):
+        buf = bytearray(self.block_frames * self.block_align)
+        view = memoryview(buf)
+        remaining = self.data_bytes
+        pending = 0
+        while remaining is None or remaining > 0:
+            want = len(buf) - pending
+            if remaining is not None:
+                want = min(want, remaining)
+            n = self.stream.readinto(view[pending:pending + want])
+            if n == 0:
+                break
+            if remaining is not None:
+                remaining -= n
+            pending += n
+            whole = pending - pending % self.block_align
+            if whole:
+                yield self._to_float(view[:whole])
+                # Carry any partial frame to the front of the buffer
+                tail = pending - whole
+                view[:tail] = view[whole:pending]
+                pending = tail
+
+
+class SequentialSoundFile(sf.SoundFile):
+    """
+    SoundFile that reports itself non-seekable. soundfile re-seeks after every
+    read on seekable files, which makes libFLAC rescan from the header; our
+    reads are strictly sequential, so the bookkeeping seeks are skipped.
+    """
+
+    def seekable(self):
+        return False
+
+
+class SoundFileStreamDecoder:
+    """FLAC (or anything else libsndfile reads) from a forward-only stream"""
+
+    def __init__(self, stream, block_frames=16384):
+        self.block_frames = block_frames
+        self._file = SequentialSoundFile(stream)
+        self.sampling_rate = self._file.samplerate
+        self.channels = self._file.channels
+
+    def blocks(self):
+        out = np.empty((self.block_frames, self.channels), dtype=np.float32)
+        try:
+            while True:
+                n = self._file.read(self.block_frames, dtype='float32', always_2d=True, out=out)
+                if len(n) == 0:
+                    break
+                yield n.mean(axis=1) if self.channels > 1 else n[:, 0]
+        finally:
+            self._file.close()
+
+
+def open_audio_stream(stream, block_frames=16384):
+    """Pick a decoder by peeking at the container magic"""
+    magic = stream.read(4)
+    stream.seek(0)
+    if magic == b'RIFF':
+        return WavStreamDecoder(stream, block_frames)
+    if magic == b'fLaC':
+        return SoundFileStreamDecoder(stream, block_frames)
+    raise ValueError("Unsupported audio container; send WAV or FLAC")
+
+
+class ChunkAccumulator:
+    """Collect decoded blocks into fixed-length analysis chunks in one preallocated buffer"""
+
+    def __init__(self, chunk_samples):
+        self.buffer = np.empty(chunk_samples, dtype=np.float32)
+        self.filled = 0
+
+    def add(self, samples):
+        """Yield each full chunk (a view that is only valid until the next yield)"""
+        offset = 0
+        while offset < len(samples):
+            n = min(len(self.buffer) - self.filled, len(samples) - offset)
+            self.buffer[self.filled:self.filled + n] = samples[offset:offset + n]
+            self.filled += n
+            offset += n
+            if self.filled == len(self.buffer):
+                self.filled = 0
+                yield self.buffer
+
+    def remainder(self):
+        return self.buffer[:self.filled]
+
+
+def process_audio_stream(stream, get_detector, chunk_seconds=10.0, min_tail_seconds=1.0, lock=None):
+    """
+    Decode an upload incrementally and run process_chunk on each full chunk.
+    get_detector(sampling_rate) returns the AdvancedAcousticDetector to use;
+    chunks are analysed while holding `lock` (the sensor's, when shared).
+    Returns a JSON-friendly summary; feature vectors are not echoed back.
+    Raises ChunkTooShort if a chunk would not fill one STFT frame.
+    """
+    decoder = open_audio_stream(stream)
+    sampling_rate = decoder.sampling_rate
+    acoustic_detector = get_detector(sampling_rate)
+    chunk_samples = int(chunk_seconds * sampling_rate)
+    if chunk_samples < acoustic_detector.stft_size:
+        raise ChunkTooShort(
+            f"chunk_seconds={chunk_seconds} gives {chunk_samples} samples at {sampling_rate} Hz; "
+            f"at least {acoustic_detector.stft_size} are needed"
+        )
+    accumulator = ChunkAccumulator(chunk_samples)
+    chunks = []
+    decoded_samples = 0
+
+    def run(chunk, offset):
+        with lock or nullcontext():
+            result = acoustic_detector.process_chunk(chunk, duration=len(chunk) / sampling_rate)
+        chunks.append({
+            'offset_seconds': round(offset / sampling_rate, 3),
+            'duration_seconds': round(len(chunk) / sampling_rate, 3),
+            'equipment': result['equipment']
+        })
+
+    for block in decoder.blocks():
+        for chunk in accumulator.add(block):
+            run(chunk, len(chunks) * len(accumulator.buffer))
+        decoded_samples += len(block)
+
+    tail = accumulator.remainder()
+    if len(tail) >= max(min_tail_seconds * sampling_rate, acoustic_detector.stft_size):
+        run(tail, len(chunks) * len(accumulator.buffer))
+
+    return {
+        'sampling_rate': sampling_rate,
+        'duration_seconds': round(decoded_samples / sampling_rate, 3),
+        'chunks_processed': len(chunks),
+        'chunks': chunks
+    }
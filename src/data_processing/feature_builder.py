@@ -0,0 +1,159 @@
+"""
+Columnar builder for the 13 fusion features.
+NDVI, nightlight and acoustic frames are pivoted onto one daily
+(date x location) grid and every statistic is a single rolling pass over
+all locations at once. The result is a float32 cube shared by training and
+inference.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.ml_models.fusion_model import FEATURE_ORDER
+
+SEVERITY_BY_RISK = {'low': 0, 'medium': 1, 'high': 2, 'critical': 2}
+
+
+def _daily_grid(frame, time_col, days, locations, values):
+    """Aggregate per (day, location) and unstack to one wide frame per statistic"""
+    day = pd.to_datetime(frame[time_col]).dt.normalize()
+    daily = frame.assign(day=day).groupby(['day', 'location_id']).agg(**values)
+    wide = daily.unstack('location_id')
+    return {name: wide[name].reindex(index=days, columns=locations) for name in values}
+
+
+def _rolling_trend(wide, window, window_days):
+    """Least-squares slope over each window, scaled to change per window"""
+    t = np.arange(len(wide), dtype=np.float64)[:, np.newaxis]
+    observed = wide.notna().to_numpy()
+    y = np.where(observed, wide.to_numpy(dtype=np.float64), 0.0)
+    tt = np.where(observed, t, 0.0)
+
+    def rsum(a):
+        return pd.DataFrame(a, index=wide.index).rolling(window, min_periods=1).sum().to_numpy()
+
+    n, st, sy, sty, stt = rsum(observed.astype(np.float64)), rsum(tt), rsum(y), rsum(tt * y), rsum(tt * tt)
+    denom = n * stt - st * st
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(denom > 1e-9, (n * sty - st * sy) / denom, 0.0)
+    return slope * window_days
+
+
+class FusionFeatureTable:
+    """Features for every location and day: values has shape (n_locations, n_days, 13)"""
+
+    def __init__(self, locations, dates, values, window_days):
+        self.locations = list(locations)
+        self.dates = pd.DatetimeIndex(dates)
+        self.values = values
+        self.window_days = window_days
+        self._index = {loc: i for i, loc in enumerate(self.locations)}
+
+    def matrix(self):
+        """(n_locations * n_days, 13) float32 view, location-major"""
+        return self.values.reshape(-1, len(FEATURE_ORDER))
+
+    def to_frame(self):
+        frame = pd.DataFrame(self.matrix(), columns=FEATURE_ORDER)
+        frame.insert(0, 'date', np.tile(self.dates.values, len(self.locations)))
+        frame.insert(0, 'location_id', np.repeat(self.locations, len(self.dates)))
+        return frame
+
+    def latest(self, location_id):
+        """Feature dict for the most recent day of one location"""
+        return dict(zip(FEATURE_ORDER, self.values[self._index[location_id], -1].tolist()))
+
+    def latest_matrix(self, location_ids=None):
+        ids = self.locations if location_ids is None else location_ids
+        return self.values[[self._index[loc] for loc in ids], -1]
+
+    def __contains__(self, location_id):
+        return location_id in self._index
+
+
+def build_fusion_features(ndvi, nightlight, acoustic, locations=None, window_days=30, start=None, end=None):
+    """
+    Compute all 13 fusion features for every location and every day.
+
+    ndvi: location_id, date, ndvi_value
+    nightlight: location_id, date, intensity
+    acoustic: location_id, timestamp, detection_type, confidence, frequency_hz
+    """
+    if locations is None:
+        locations = sorted(set(ndvi['location_id']) | set(nightlight['location_id']) |
+                           set(acoustic['location_id'] if len(acoustic) else []))
+    stamps = [pd.to_datetime(f[c]) for f, c in ((ndvi, 'date'), (nightlight, 'date'), (acoustic, 'timestamp')) if len(f)]
+    start = pd.Timestamp(start) if start is not None else min(s.min() for s in stamps).normalize()
+    end = pd.Timestamp(end) if end is not None else max(s.max() for s in stamps).normalize()
+    days = pd.date_range(start, end, freq='D')
+    window = f'{window_days}D'
+
+    ndvi_wide = _daily_grid(ndvi, 'date', days, locations, {'value': ('ndvi_value', 'mean')})['value']
+    light_wide = _daily_grid(nightlight, 'date', days, locations, {'value': ('intensity', 'mean')})['value']
+
+    if len(acoustic):
+        kinds = acoustic['detection_type']
+        acoustic = acoustic.assign(
+            is_drill=(kinds == 'drill').astype(np.float64),
+            is_excavator=(kinds == 'excavator').astype(np.float64),
+            drill_hz=acoustic['frequency_hz'].where(kinds == 'drill', 0.0),
+            excavator_hz=acoustic['frequency_hz'].where(kinds == 'excavator', 0.0)
+        )
+        sound = _daily_grid(acoustic, 'timestamp', days, locations, {
+            'count': ('confidence', 'size'), 'max_confidence': ('confidence', 'max'),
+            'drill_n': ('is_drill', 'sum'), 'drill_hz': ('drill_hz', 'sum'),
+            'excavator_n': ('is_excavator', 'sum'), 'excavator_hz': ('excavator_hz', 'sum')
+        })
+    else:
+        empty = pd.DataFrame(np.nan, index=days, columns=locations)
+        sound = {name: empty for name in ('count', 'max_confidence', 'drill_n', 'drill_hz', 'excavator_n', 'excavator_hz')}
+
+    ndvi_roll = ndvi_wide.rolling(window, min_periods=1)
+    light_roll = light_wide.rolling(window, min_periods=1)
+    sums = {name: sound[name].rolling(window, min_periods=1).sum().to_numpy()
+            for name in ('count', 'drill_n', 'drill_hz', 'excavator_n', 'excavator_hz')}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drilling_freq = np.where(sums['drill_n'] > 0, sums['drill_hz'] / sums['drill_n'], 0.0)
+        excavator_freq = np.where(sums['excavator_n'] > 0, sums['excavator_hz'] / sums['excavator_n'], 0.0)
+
+    columns = {
+        'ndvi_mean': ndvi_roll.mean().to_numpy(),
+        'ndvi_trend': _rolling_trend(ndvi_wide, window, window_days),
+        'ndvi_volatility': ndvi_roll.std().to_numpy(),
+        'ndvi_min': ndvi_roll.min().to_numpy(),
+        'ndvi_max': ndvi_roll.max().to_numpy(),
+        'nightlight_mean': light_roll.mean().to_numpy(),
+        'nightlight_trend': _rolling_trend(light_wide, window, window_days),
+        'nightlight_peak': light_roll.max().to_numpy(),
+        'nightlight_volatility': light_roll.std().to_numpy(),
+        'acoustic_activity': sums['count'],
+        'drilling_freq': drilling_freq,
+        'excavator_freq': excavator_freq,
+        'max_confidence': sound['max_confidence'].rolling(window, min_periods=1).max().to_numpy()
+    }
+
+    # (days, locations, features) -> (locations, days, features), contiguous per location
+    cube = np.stack([columns[name] for name in FEATURE_ORDER], axis=-1).transpose(1, 0, 2)
+    values = np.ascontiguousarray(np.nan_to_num(cube, nan=0.0), dtype=np.float32)
+    return FusionFeatureTable(locations, days, values, window_days)
+
+
+def build_from_loader(loader, window_days=30, end=None):
+    """Feature table for an AravalliDataLoader (or anything with the same frames)"""
+    return build_fusion_features(
+        loader.ndvi_time_series, loader.nightlight_data, loader.acoustic_detections,
+        locations=[loc['id'] for loc in loader.locations], window_days=window_days, end=end
+    )
+
+
+def label_from_locations(frame, locations):
+    """Attach training labels from each location's recorded mining status and risk level"""
+    by_id = {loc['id']: loc for loc in locations}
+    active = frame['location_id'].map(lambda i: by_id[i]['mining_activity'] == 'active')
+    risk = frame['location_id'].map(lambda i: SEVERITY_BY_RISK.get(by_id[i]['risk_level'], 0))
+    return frame.assign(
+        is_mining=active.astype(int),
+        severity=np.where(active, risk, 0),
+        equipment_type=0
+    )
@@ -0,0 +1,267 @@
+"""
+Append-only, memory-mapped store of per-sensor acoustic feature vectors.
+Each sensor/feature kind keeps fixed-width float32 rows plus int64 epoch-ms
+timestamps, so months of history can be searched without recomputing features.
+"""
+
+import os
+import re
+import json
+import threading
+from datetime import datetime
+import numpy as np
+
+
+FEATURE_KINDS = ('mfcc', 'yamnet')
+# Sensor ids become directory and file names, so no separators or dots
+SENSOR_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+
+
+def validate_sensor_id(sensor_id):
+    if not isinstance(sensor_id, str) or not SENSOR_ID_PATTERN.fullmatch(sensor_id):
+        raise ValueError(f"Invalid sensor id {sensor_id!r}; use letters, digits, '_' or '-'")
+    return sensor_id
+
+
+def validate_kind(kind):
+    if kind not in FEATURE_KINDS:
+        raise ValueError(f"Unknown feature kind {kind!r}, expected one of {', '.join(FEATURE_KINDS)}")
+    return kind
+
+
+def _to_epoch_ms(timestamp):
+    if timestamp is None:
+        timestamp = datetime.now()
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if isinstance(timestamp, datetime):
+        return int(round(timestamp.timestamp() * 1000))
+    return int(timestamp)
+
+
+def _from_epoch_ms(ms):
+    return datetime.fromtimestamp(ms / 1000).isoformat()
+
+
+class AcousticFeatureStore:
+    """
+    Per-sensor append-only feature vectors with time indexing and
+    nearest-neighbour search. One writer process per root directory.
+    """
+
+    def __init__(self, root='data/processed/audio_features', search_chunk_rows=65536):
+        self.root = root
+        self.search_chunk_rows = search_chunk_rows
+        self._lock = threading.Lock()
+        self._meta = {}
+
+    # ---------- layout ----------
+
+    def _dir(self, sensor_id, kind):
+        return os.path.join(self.root, validate_sensor_id(sensor_id), validate_kind(kind))
+
+    def _path(self, sensor_id, kind, name):
+        return os.path.join(self._dir(sensor_id, kind), name)
+
+    def _load_meta(self, sensor_id, kind):
+        key = (sensor_id, kind)
+        if key not in self._meta:
+            path = self._path(sensor_id, kind, 'meta.json')
+            if os.path.exists(path):
+                with open(path) as f:
+                    self._meta[key] = json.load(f)
+            else:
+                self._meta[key] = None
+        return self._meta[key]
+
+    def _save_meta(self, sensor_id, kind, meta):
+        os.makedirs(self._dir(sensor_id, kind), exist_ok=True)
+        path = self._path(sensor_id, kind, 'meta.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(f'{path}.tmp', path)
+        self._meta[(sensor_id, kind)] = meta
+
+    # ---------- writes ----------
+
+    def append(self, sensor_id, vector, timestamp=None, kind='mfcc'):
+        """Append one vector; returns its row index"""
+        return self.append_many(sensor_id, np.asarray(vector)[np.newaxis, :], [timestamp], kind)[0]
+
+    def append_many(self, sensor_id, vectors, timestamps, kind='mfcc'):
+        vectors = np.ascontiguousarray(vectors, dtype='<f4')
+        stamps = np.array([_to_epoch_ms(t) for t in timestamps], dtype='<i8')
+        if len(stamps) != len(vectors):
+            raise ValueError("Need one timestamp per vector")
+
+        with self._lock:
+            meta = self._load_meta(sensor_id, kind)
+            if meta is None:
+                meta = {'dim': int(vectors.shape[1]), 'rows': 0, 'last_ms': None, 'time_sorted': True}
+            elif vectors.shape[1] != meta['dim']:
+                raise ValueError(f"{kind} vectors for {sensor_id} are {meta['dim']}-d, got {vectors.shape[1]}-d")
+
+            if (meta['last_ms'] is not None and stamps[0] < meta['last_ms']) or np.any(np.diff(stamps) < 0):
+                meta['time_sorted'] = False
+
+            os.makedirs(self._dir(sensor_id, kind), exist_ok=True)
+            with open(self._path(sensor_id, kind, 'vectors.f32'), 'ab') as f:
+                f.write(vectors.tobytes())
+            with open(self._path(sensor_id, kind, 'timestamps.i64'), 'ab') as f:
+                f.write(stamps.tobytes())
+
+            # Keep the IVF index current for rows added after it was built
+            centroids_path = self._path(sensor_id, kind, 'ivf_centroids.npy')
+            if os.path.exists(centroids_path):
+                assign = self._nearest_centroid(np.load(centroids_path), vectors)
+                with open(self._path(sensor_id, kind, 'ivf_assign.i32'), 'ab') as f:
+                    f.write(assign.astype('<i4').tobytes())
+
+            first = meta['rows']
+            meta['rows'] += len(vectors)
+            meta['last_ms'] = int(max(stamps.max(), meta['last_ms'] or stamps.max()))
+            self._save_meta(sensor_id, kind, meta)
+        return list(range(first, first + len(vectors)))
+
+    # ---------- reads ----------
+
+    def _memmap(self, sensor_id, kind, name, dtype, width=None):
+        meta = self._load_meta(sensor_id, kind)
+        rows = meta['rows'] if meta else 0
+        if rows == 0:
+            return np.empty((0, width) if width else (0,), dtype=dtype)
+        shape = (rows, width) if width else (rows,)
+        return np.memmap(self._path(sensor_id, kind, name), dtype=dtype, mode='r', shape=shape)
+
+    def vectors(self, sensor_id, kind='mfcc'):
+        meta = self._load_meta(sensor_id, kind)
+        return self._memmap(sensor_id, kind, 'vectors.f32', '<f4', meta['dim'] if meta else 1)
+
+    def timestamps(self, sensor_id, kind='mfcc'):
+        return self._memmap(sensor_id, kind, 'timestamps.i64', '<i8')
+
+    def count(self, sensor_id, kind='mfcc'):
+        meta = self._load_meta(sensor_id, kind)
+        return meta['rows'] if meta else 0
+
+    def timestamp_of(self, sensor_id, index, kind='mfcc'):
+        return _from_epoch_ms(int(self.timestamps(sensor_id, kind)[index]))
+
+    def rows_between(self, sensor_id, start=None, end=None, kind='mfcc'):
+        """Row indices whose timestamps fall in [start, end]"""
+        stamps = self.timestamps(sensor_id, kind)
+        lo = _to_epoch_ms(start) if start is not None else None
+        hi = _to_epoch_ms(end) if end is not None else None
+        meta = self._load_meta(sensor_id, kind)
+        if meta is None or meta['time_sorted']:
+            first = np.searchsorted(stamps, lo, side='left') if lo is not None else 0
+            last = np.searchsorted(stamps, hi, side='right') if hi is not None else len(stamps)
+            return np.arange(first, last)
+        mask = np.ones(len(stamps), dtype=bool)
+        if lo is not None:
+            mask &= stamps >= lo
+        if hi is not None:
+            mask &= stamps <= hi
+        return np.flatnonzero(mask)
+
+    def nearest_in_time(self, sensor_id, timestamp, kind='mfcc'):
+        """Row index recorded closest to the given time"""
+        stamps = self.timestamps(sensor_id, kind)
+        if len(stamps) == 0:
+            raise KeyError(f"No {kind} features stored for {sensor_id}")
+        return int(np.argmin(np.abs(stamps - _to_epoch_ms(timestamp))))
+
+    # ---------- search ----------
+
+    @staticmethod
+    def _distances(rows, query, metric):
+        rows = np.asarray(rows, dtype=np.float32)
+        if metric == 'cosine':
+            norms = np.linalg.norm(rows, axis=1) * np.linalg.norm(query)
+            return 1.0 - (rows @ query) / np.maximum(norms, 1e-12)
+        return np.sum((rows - query) ** 2, axis=1)
+
+    def search(self, sensor_id, query, k=10, kind='mfcc', start=None, end=None,
+               metric='cosine', nprobe=8, exclude=None):
+        """
+        k nearest stored vectors to `query`. Uses the IVF index when one has
+        been built (probing `nprobe` lists), otherwise a chunked brute-force scan.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        vectors = self.vectors(sensor_id, kind)
+        stamps = self.timestamps(sensor_id, kind)
+        if len(vectors) == 0:
+            return []
+
+        candidates = None
+        if start is not None or end is not None:
+            candidates = self.rows_between(sensor_id, start, end, kind)
+
+        centroids_path = self._path(sensor_id, kind, 'ivf_centroids.npy')
+        if nprobe and os.path.exists(centroids_path):
+            centroids = np.load(centroids_path)
+            lists = np.argsort(self._distances(centroids, query, metric))[:nprobe]
+            assign = self._memmap(sensor_id, kind, 'ivf_assign.i32', '<i4')
+            probed = np.flatnonzero(np.isin(assign, lists))
+            candidates = probed if candidates is None else np.intersect1d(candidates, probed)
+
+        best_idx = np.empty(0, dtype=np.int64)
+        best_dist = np.empty(0, dtype=np.float32)
+        total = len(vectors) if candidates is None else len(candidates)
+        for offset in range(0, total, self.search_chunk_rows):
+            if candidates is None:
+                idx = np.arange(offset, min(offset + self.search_chunk_rows, total))
+                rows = vectors[offset:offset + self.search_chunk_rows]
+            else:
+                idx = candidates[offset:offset + self.search_chunk_rows]
+                rows = vectors[idx]
+            dist = self._distances(rows, query, metric)
+            if exclude is not None:
+                dist = np.where(idx == exclude, np.inf, dist)
+            best_idx = np.concatenate([best_idx, idx])
+            best_dist = np.concatenate([best_dist, dist])
+            if len(best_idx) > k:
+                keep = np.argpartition(best_dist, k)[:k]
+                best_idx, best_dist = best_idx[keep], best_dist[keep]
+
+        order = np.argsort(best_dist)[:k]
+        return [
+            {'index': int(best_idx[i]), 'timestamp': _from_epoch_ms(int(stamps[best_idx[i]])),
+             'distance': float(best_dist[i])}
+            for i in order if np.isfinite(best_dist[i])
+        ]
+
+    # ---------- IVF index ----------
+
+    @staticmethod
+    def _nearest_centroid(centroids, rows):
+        rows = np.asarray(rows, dtype=np.float32)
+        d = (np.sum(rows ** 2, axis=1)[:, None] - 2 * rows @ centroids.T + np.sum(centroids ** 2, axis=1)[None, :])
+        return np.argmin(d, axis=1)
+
+    def build_ivf(self, sensor_id, kind='mfcc', n_lists=64, sample_size=50000, iterations=15, seed=42):
+        """Train k-means coarse centroids on a sample and assign every stored row to a list"""
+        with self._lock:
+            vectors = self.vectors(sensor_id, kind)
+            if len(vectors) == 0:
+                raise KeyError(f"No {kind} features stored for {sensor_id}")
+            rng = np.random.default_rng(seed)
+            n_lists = min(n_lists, len(vectors))
+            sample_idx = np.sort(rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False))
+            sample = np.asarray(vectors[sample_idx], dtype=np.float32)
+
+            centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                labels = self._nearest_centroid(centroids, sample)
+                for c in range(n_lists):
+                    members = sample[labels == c]
+                    if len(members):
+                        centroids[c] = members.mean(axis=0)
+
+            assign = np.concatenate([
+                self._nearest_centroid(centroids, vectors[i:i + self.search_chunk_rows])
+                for i in range(0, len(vectors), self.search_chunk_rows)
+            ]).astype('<i4')
+            assign.tofile(self._path(sensor_id, kind, 'ivf_assign.i32'))
+            np.save(self._path(sensor_id, kind, 'ivf_centroids.npy'), centroids)
+        return n_lists
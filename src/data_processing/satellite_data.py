@@ -1,46 +1,64 @@
-import ee
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-import rasterio
-from rasterio.transform import from_bounds
-import geopandas as gpd
-from sentinelhub import (
-    SentinelHubRequest, BBox, CRS, MimeType,
-    DataCollection, SHConfig
-)
+
+# Earth Engine, sentinelhub and geopandas are imported on first use: together
+# they add seconds to API startup and most requests never touch them.
 
 class EnhancedSatelliteDataCollector:
     def __init__(self, project_area_file=None):
         """
         Initialize satellite data collection for specified area with enhancements
         """
-        # Initialize Google Earth Engine
-        try:
-            ee.Initialize()
-        except Exception:
-            # In some environments, auth might be needed
-            print("Earth Engine not initialized. Run 'earthengine authenticate' if needed.")
-        
-        # Sentinel Hub configuration
-        self.config = SHConfig()
-        self.config.sh_client_id = 'YOUR_CLIENT_ID'
-        self.config.sh_client_secret = 'YOUR_CLIENT_SECRET'
+        self._ee_ready = None
+        self._config = None
+        self._aoi = None
+        self.project_area_file = project_area_file
         
         # Enhancement configurations
         self.cloud_threshold = 0.2
         self.use_data_fusion = True
         
-        # Define project area
-        if project_area_file:
-            self.aoi = gpd.read_file(project_area_file)
-        else:
-            # Default area
-            self.aoi_bounds = [-65.5, -3.5, -64.5, -2.5]  # minx, miny, maxx, maxy
-            self.aoi = self._create_bbox(self.aoi_bounds)
+        # Default area
+        self.aoi_bounds = [-65.5, -3.5, -64.5, -2.5]  # minx, miny, maxx, maxy
+
+    def _earth_engine(self):
+        """Import and initialize Google Earth Engine once"""
+        import ee
+        if self._ee_ready is None:
+            try:
+                ee.Initialize()
+                self._ee_ready = True
+            except Exception:
+                # In some environments, auth might be needed
+                print("Earth Engine not initialized. Run 'earthengine authenticate' if needed.")
+                self._ee_ready = False
+        return ee
+
+    @property
+    def config(self):
+        """Sentinel Hub configuration"""
+        if self._config is None:
+            from sentinelhub import SHConfig
+            self._config = SHConfig()
+            self._config.sh_client_id = 'YOUR_CLIENT_ID'
+            self._config.sh_client_secret = 'YOUR_CLIENT_SECRET'
+        return self._config
+
+    @property
+    def aoi(self):
+        """Project area, built on first access"""
+        if self._aoi is None:
+            if self.project_area_file:
+                import geopandas as gpd
+                self._aoi = gpd.read_file(self.project_area_file)
+            else:
+                self._aoi = self._create_bbox(self.aoi_bounds)
+        return self._aoi
         
     def _create_bbox(self, bounds):
         """Create bounding box from bounds"""
+        from sentinelhub import BBox, CRS
         return BBox(bbox=bounds, crs=CRS.WGS84)
     
     def apply_cloud_masking(self, image):
@@ -54,6 +72,8 @@ class EnhancedSatelliteDataCollector:
         """
         Collect NDVI data from Sentinel-2 with potential cloud masking
         """
+        from sentinelhub import SentinelHubRequest, MimeType, DataCollection
+        
         dates = pd.date_range(start_date, end_date, freq=f'{interval_days}D')
         ndvi_time_series = []
         
@@ -120,6 +140,7 @@ class EnhancedSatelliteDataCollector:
         """
         Collect VIIRS nightlight data using Earth Engine
         """
+        ee = self._earth_engine()
         viirs = ee.ImageCollection('NOAA/VIIRS/DNB/MONTHLY_V1/VCMSLCFG') \
                   .filterDate(start_date, end_date) \
                   .filterBounds(ee.Geometry.Rectangle(list(self.aoi.bounds)))
@@ -0,0 +1,69 @@
+"""
+Sliding-window sequences for the temporal (LSTM) model.
+Windows are strided views over the contiguous per-location feature cube from
+feature_builder, so (N, 30, 13) sequences cost no extra memory until a batch
+is gathered for training or scoring.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def location_windows(values, window=30):
+    """
+    (n_locations, n_days, n_features) -> read-only view of shape
+    (n_locations, n_days - window + 1, window, n_features)
+    """
+    if values.shape[1] < window:
+        raise ValueError(f"Need at least {window} days per location, got {values.shape[1]}")
+    # sliding_window_view appends the window axis last; move it before the features
+    return sliding_window_view(values, window, axis=1).transpose(0, 1, 3, 2)
+
+
+def latest_windows(values, window=30):
+    """Newest window per location, (n_locations, window, n_features), still a view"""
+    if values.shape[1] < window:
+        raise ValueError(f"Need at least {window} days per location, got {values.shape[1]}")
+    return values[:, -window:, :]
+
+
+class SequenceDataset:
+    """
+    Every (location, end day) window of a feature cube, with an optional
+    per-day label array of shape (n_locations, n_days).
+    """
+
+    def __init__(self, values, labels=None, window=30, stride=1):
+        self.values = values
+        self.window = window
+        self.windows = location_windows(values, window)
+        n_locations, n_windows = self.windows.shape[:2]
+        # Window w ends on day w + window - 1
+        self.locations_idx, self.window_idx = [
+            a.ravel() for a in np.meshgrid(np.arange(n_locations), np.arange(0, n_windows, stride), indexing='ij')
+        ]
+        self.labels = None if labels is None else np.asarray(labels)[:, window - 1:]
+
+    @classmethod
+    def from_table(cls, table, labels=None, window=30, stride=1):
+        return cls(table.values, labels=labels, window=window, stride=stride)
+
+    def __len__(self):
+        return len(self.window_idx)
+
+    def gather(self, rows):
+        """Copy just the requested windows into a contiguous (len(rows), window, n_features) batch"""
+        X = np.ascontiguousarray(self.windows[self.locations_idx[rows], self.window_idx[rows]])
+        y = None if self.labels is None else self.labels[self.locations_idx[rows], self.window_idx[rows]]
+        return X, y
+
+    def batches(self, batch_size=256, shuffle=True, seed=None):
+        """Yield (X, y) batches; only one batch is materialised at a time"""
+        order = np.arange(len(self))
+        if shuffle:
+            np.random.default_rng(seed).shuffle(order)
+        for start in range(0, len(order), batch_size):
+            yield self.gather(order[start:start + batch_size])
+
+    def latest(self):
+        return latest_windows(self.values, self.window)
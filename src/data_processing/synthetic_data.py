@@ -0,0 +1,33 @@
+"""
+Synthetic labelled fusion-feature rows for bootstrapping and benchmarking
+the detector when no field data is available.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def generate_synthetic_training_data(n_samples=1000, seed=None, mining_rate=0.3):
+    """DataFrame of the 13 fusion features plus is_mining, severity and equipment_type"""
+    rng = np.random.default_rng(seed)
+    mining = rng.random(n_samples) < mining_rate
+
+    def pick(if_mining, otherwise):
+        return np.where(mining, if_mining, otherwise)
+
+    return pd.DataFrame({
+        'ndvi_mean': pick(rng.normal(0.3, 0.1, n_samples), rng.normal(0.6, 0.1, n_samples)),
+        'ndvi_trend': pick(rng.normal(-0.1, 0.05, n_samples), rng.normal(0, 0.02, n_samples)),
+        'ndvi_volatility': rng.exponential(0.1, n_samples),
+        'ndvi_min': 0.2, 'ndvi_max': 0.8,
+        'nightlight_mean': pick(rng.exponential(20, n_samples), rng.exponential(5, n_samples)),
+        'nightlight_trend': pick(rng.normal(2, 1, n_samples), rng.normal(0, 0.5, n_samples)),
+        'nightlight_peak': 30.0, 'nightlight_volatility': 5.0,
+        'acoustic_activity': pick(rng.poisson(10, n_samples), rng.poisson(2, n_samples)),
+        'drilling_freq': pick(rng.normal(150, 50, n_samples), 0.0),
+        'excavator_freq': pick(rng.normal(100, 30, n_samples), 0.0),
+        'max_confidence': 0.9,
+        'is_mining': mining.astype(int),
+        'severity': pick(rng.integers(0, 3, n_samples), 0),
+        'equipment_type': pick(rng.integers(1, 5, n_samples), 0)
+    })
@@ -0,0 +1,104 @@
+"""
+Array-backed random-forest evaluator.
+All trees of a fitted RandomForestClassifier are flattened into contiguous node
+arrays saved as .npy files, so serving processes can memory-map one shared copy
+and score a batch by walking every tree one level at a time.
+"""
+
+import os
+import json
+import numpy as np
+
+ARRAYS = ['feature', 'threshold', 'left', 'right', 'value', 'roots']
+
+
+class FlatForest:
+    """Drop-in replacement for RandomForestClassifier.predict_proba / predict"""
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+        self.max_depth = int(max_depth)
+        self.n_estimators = len(roots)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """Flatten a fitted single-output RandomForestClassifier"""
+        n_classes = int(forest.n_classes_)
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            ids = np.arange(tree.node_count, dtype=np.int32) + offset
+            is_leaf = tree.children_left < 0
+            # Leaves point at themselves so extra traversal steps are no-ops
+            lefts.append(np.where(is_leaf, ids, tree.children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, ids, tree.children_right + offset).astype(np.int32))
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(tree.threshold.astype(np.float64))
+            # scikit-learn < 1.4 stores weighted class counts per node, >= 1.4 class
+            # fractions; predict_proba averages fractions, so normalise either way
+            value = tree.value[:, 0, :n_classes].astype(np.float64)
+            values.append(value / value.sum(axis=1, keepdims=True))
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += tree.node_count
+
+        return cls(
+            np.concatenate(features), np.concatenate(thresholds),
+            np.concatenate(lefts), np.concatenate(rights),
+            np.ascontiguousarray(np.concatenate(values)), np.array(roots, dtype=np.int32),
+            forest.classes_, max_depth
+        )
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'classes': self.classes_.tolist(), 'max_depth': self.max_depth}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Memory-maps the node arrays by default so workers share the page cache"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = [np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAYS]
+        return cls(*arrays, classes=meta['classes'], max_depth=meta['max_depth'])
+
+    def apply(self, X):
+        """Leaf node index of every sample in every tree, shape (n_trees, n_samples)"""
+        # sklearn evaluates trees on float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        n_samples = len(X)
+        nodes = np.repeat(np.asarray(self.roots), n_samples)
+        rows = np.tile(np.arange(n_samples), self.n_estimators)
+        # Only (tree, sample) pairs still at an internal node move each level
+        active = np.arange(len(nodes))
+        for _ in range(self.max_depth):
+            current = nodes[active]
+            go_left = X[rows[active], self.feature[current]] <= self.threshold[current]
+            nxt = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = nxt
+            active = active[self.left[nxt] != nxt]
+            if len(active) == 0:
+                break
+        return nodes.reshape(self.n_estimators, n_samples)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[1], self.value.shape[1]), dtype=np.float64)
+        # Accumulate tree by tree, in order, exactly as sklearn does
+        for tree_leaves in leaves:
+            proba += self.value[tree_leaves]
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
@@ -1,15 +1,26 @@
+import os
+import shutil
+from datetime import datetime
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import IsolationForest, RandomForestClassifier
+from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
-import tensorflow as tf
-from tensorflow import keras
-from tensorflow.keras import layers, Model, Sequential
 import joblib
 import warnings
+
+from src.ml_models.numpy_fusion import NumpyFusionModel
+from src.ml_models.flat_forest import FlatForest
+from src.ml_models.online_anomaly import OnlineAnomalyScorer
 warnings.filterwarnings('ignore')
 
+# Column order of the 13 fusion features, shared by training and inference
+FEATURE_ORDER = [
+    'ndvi_mean', 'ndvi_trend', 'ndvi_volatility', 'ndvi_min', 'ndvi_max',
+    'nightlight_mean', 'nightlight_trend', 'nightlight_peak', 'nightlight_volatility',
+    'acoustic_activity', 'drilling_freq', 'excavator_freq', 'max_confidence'
+]
+
 class EnhancedMiningDetector:
     def __init__(self):
         """
@@ -19,15 +30,19 @@ class EnhancedMiningDetector:
         self.is_trained = False
         
         # Classical models as ensemble components
-        self.isolation_forest = IsolationForest(contamination=0.1, random_state=42)
+        self.anomaly_scorer = OnlineAnomalyScorer(n_features=len(FEATURE_ORDER))
+        # n_jobs stays 1 on the stored estimator; only fitting fans out (see _fit_forest)
         self.rf_classifier = RandomForestClassifier(n_estimators=200, random_state=42)
         
         # Neural components
         self.temporal_model = None
+        self.temporal_path = None
         self.fusion_model = None
         
     def build_lstm_model(self, input_shape=(30, 13)):
         """LSTM for temporal pattern detection (30-day window)"""
+        # TensorFlow is imported on first use so serving never pays for it
+        from tensorflow.keras import layers, Sequential
         model = Sequential([
             layers.LSTM(128, return_sequences=True, input_shape=input_shape),
             layers.Dropout(0.3),
@@ -40,6 +55,8 @@ class EnhancedMiningDetector:
 
     def build_attention_fusion(self, input_dim):
         """Attention mechanism for multi-modal fusion"""
+        from tensorflow import keras
+        from tensorflow.keras import layers, Model
         inputs = keras.Input(shape=(input_dim,))
         
         # Feature processing
@@ -61,49 +78,48 @@ class EnhancedMiningDetector:
         equipment_out = layers.Dense(5, activation='softmax', name='equipment')(x)
         
         model = Model(inputs=inputs, outputs=[anomaly_out, severity_out, equipment_out])
+        self._compile_fusion(model)
+        return model
+
+    @staticmethod
+    def _compile_fusion(model, learning_rate=None):
+        from tensorflow import keras
         model.compile(
-            optimizer='adam',
+            optimizer=keras.optimizers.Adam(learning_rate) if learning_rate else 'adam',
             loss={'anomaly': 'binary_crossentropy', 'severity': 'categorical_crossentropy', 'equipment': 'categorical_crossentropy'},
             metrics={'anomaly': 'accuracy', 'severity': 'accuracy', 'equipment': 'accuracy'}
         )
-        return model
 
     def prepare_training_data(self, historical_data):
-        """Extract features and labels from historical records"""
-        X, y_anom, y_sev, y_equ = [], [], [], []
-        
-        for r in historical_data:
-            features = [
-                r.get('ndvi_mean', 0), r.get('ndvi_trend', 0), r.get('ndvi_volatility', 0),
-                r.get('ndvi_min', 0), r.get('ndvi_max', 0),
-                r.get('nightlight_mean', 0), r.get('nightlight_trend', 0),
-                r.get('nightlight_peak', 0), r.get('nightlight_volatility', 0),
-                r.get('acoustic_activity', 0), r.get('drilling_freq', 0),
-                r.get('excavator_freq', 0), r.get('max_confidence', 0)
-            ]
-            X.append(features)
-            y_anom.append(r.get('is_mining', 0))
-            
-            # Severity (0-2)
-            sev = [0, 0, 0]
-            sev[r.get('severity', 0)] = 1
-            y_sev.append(sev)
-            
-            # Equipment (0-4)
-            equ = [0, 0, 0, 0, 0]
-            equ[r.get('equipment_type', 0)] = 1
-            y_equ.append(equ)
-            
-        return np.array(X), np.array(y_anom), np.array(y_sev), np.array(y_equ)
-
-    def train(self, historical_data, epochs=30):
-        """Train the ensemble and neural models"""
-        X, y_anom, y_sev, y_equ = selfPrepare_training_data(historical_data)
+        """
+        Extract features and labels from historical records: a list of dicts or a
+        DataFrame such as FusionFeatureTable.to_frame() with label columns added
+        """
+        frame = historical_data if isinstance(historical_data, pd.DataFrame) else pd.DataFrame(list(historical_data))
+        X = frame.reindex(columns=FEATURE_ORDER).fillna(0).to_numpy(dtype=np.float32)
+
+        def labels(name):
+            if name not in frame:
+                return np.zeros(len(frame), dtype=int)
+            return frame[name].fillna(0).to_numpy(dtype=int)
+
+        y_anom = labels('is_mining')
+        # One-hot severity (0-2) and equipment (0-4)
+        y_sev = np.eye(3, dtype=int)[labels('severity')]
+        y_equ = np.eye(5, dtype=int)[labels('equipment_type')]
+        return X, y_anom, y_sev, y_equ
+
+    def train(self, historical_data, epochs=30, incremental=False, **incremental_options):
+        """Train the ensemble and neural models (incremental=True updates a trained model instead)"""
+        if incremental and self.is_trained:
+            return self.train_incremental(historical_data, **incremental_options)
+
+        X, y_anom, y_sev, y_equ = self.prepare_training_data(historical_data)
         X_scaled = self.scaler.fit_transform(X)
         
         # Train classical models
-        self.isolation_forest.fit(X_scaled)
-        self.rf_classifier.fit(X_scaled, y_anom)
+        self.anomaly_scorer.fit(X_scaled, self.feature_locations(historical_data))
+        self._fit_forest(X_scaled, y_anom)
         
         # Train attention fusion model
         self.fusion_model = self.build_attention_fusion(X.shape[1])
@@ -116,39 +132,364 @@ class EnhancedMiningDetector:
         self.is_trained = True
         print("Model training complete.")
 
+    def train_incremental(self, new_data, new_trees=50, max_trees=400, epochs=3, learning_rate=1e-4):
+        """
+        Update a trained model with new labelled data only: fold the new rows into
+        the scaler statistics, grow the forest with warm_start and fine-tune the
+        fusion network for a few epochs. Needs the sklearn/Keras artifacts
+        (load_models(..., backend='keras')), not the frozen serving ones.
+        """
+        if not isinstance(self.rf_classifier, RandomForestClassifier) or isinstance(self.fusion_model, NumpyFusionModel):
+            raise ValueError("Incremental training needs the sklearn forest and Keras network; load with backend='keras'")
+
+        X, y_anom, y_sev, y_equ = self.prepare_training_data(new_data)
+        old_mean, old_scale = self.scaler.mean_.copy(), self.scaler.scale_.copy()
+        self.scaler.partial_fit(X)
+        self._rescale_inputs(old_mean, old_scale)
+        X_scaled = self.scaler.transform(X)
+        self.anomaly_scorer.score_update(X_scaled, self.feature_locations(new_data))
+
+        # New trees see only the new rows; the forest drops its oldest trees past max_trees
+        if set(np.unique(y_anom)) == set(self.rf_classifier.classes_):
+            forest = self.rf_classifier
+            forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + new_trees)
+            self._fit_forest(X_scaled, y_anom)
+            if len(forest.estimators_) > max_trees:
+                forest.estimators_ = forest.estimators_[-max_trees:]
+                forest.set_params(n_estimators=max_trees)
+        else:
+            print("New data lacks one of the trained classes; keeping the current forest.")
+
+        self._compile_fusion(self.fusion_model, learning_rate)
+        self.fusion_model.fit(
+            X_scaled,
+            {'anomaly': y_anom, 'severity': y_sev, 'equipment': y_equ},
+            epochs=epochs, batch_size=32, verbose=0
+        )
+        print(f"Incremental update complete on {len(X)} rows ({len(self.rf_classifier.estimators_)} trees).")
+
+    def _fit_forest(self, X, y):
+        """Fit on all cores, but keep n_jobs=1 on the estimator that is pickled and served"""
+        self.rf_classifier.set_params(n_jobs=-1)
+        try:
+            self.rf_classifier.fit(X, y)
+        finally:
+            self.rf_classifier.set_params(n_jobs=1)
+
+    @staticmethod
+    def _fold_affine(layer, a, c):
+        """x_old = a * x_new + c folded into a layer's input kernel: W' = diag(a) W, b' = b + c W"""
+        weights = layer.get_weights()
+        kernel, bias = weights[0], weights[-1]
+        layer.set_weights([kernel * a[:, np.newaxis], *weights[1:-1], bias + c @ kernel])
+
+    def _rescale_inputs(self, old_mean, old_scale):
+        """
+        Keep already-trained components exact after the scaler statistics move:
+        shift every tree threshold and fold the change into the first Dense
+        layer of the fusion network and the first LSTM layer of the temporal model.
+        """
+        new_mean, new_scale = self.scaler.mean_, self.scaler.scale_
+        self.anomaly_scorer.rescale(old_mean, old_scale, new_mean, new_scale)
+        for estimator in self.rf_classifier.estimators_:
+            tree = estimator.tree_
+            internal = tree.children_left >= 0
+            f = tree.feature[internal]
+            thresholds = tree.threshold  # writable view of the tree's node array
+            thresholds[internal] = (thresholds[internal] * old_scale[f] + old_mean[f] - new_mean[f]) / new_scale[f]
+
+        a = new_scale / old_scale
+        c = (new_mean - old_mean) / old_scale
+        self._fold_affine(next(layer for layer in self.fusion_model.layers if type(layer).__name__ == 'Dense'), a, c)
+        if self.temporal_model is None and self.temporal_path:
+            # A lazily loaded LSTM would otherwise meet the moved scaler unadjusted
+            self._load_temporal_model()
+        if self.temporal_model is not None:
+            # LSTM weights are [kernel, recurrent_kernel, bias]; only the input kernel sees x
+            self._fold_affine(next(layer for layer in self.temporal_model.layers if type(layer).__name__ == 'LSTM'), a, c)
+
+    def _scale_sequences(self, X):
+        """StandardScaler.transform applied along the feature axis of (N, window, 13) windows"""
+        return ((X - self.scaler.mean_) / self.scaler.scale_).astype(np.float32)
+
+    def train_temporal(self, dataset, epochs=5, batch_size=256, seed=42):
+        """Train the LSTM on a SequenceDataset, streaming one gathered batch at a time"""
+        if not hasattr(self.scaler, 'mean_'):
+            self.scaler.fit(dataset.values.reshape(-1, dataset.values.shape[-1]))
+        if self.temporal_model is None:
+            self.temporal_model = self.build_lstm_model((dataset.window, dataset.values.shape[-1]))
+
+        for epoch in range(epochs):
+            losses = []
+            for X, y in dataset.batches(batch_size, shuffle=True, seed=seed + epoch):
+                loss = self.temporal_model.train_on_batch(self._scale_sequences(X), y.astype(np.float32))
+                losses.append(loss[0] if isinstance(loss, (list, tuple)) else loss)
+            print(f"Temporal epoch {epoch + 1}/{epochs}: loss {np.mean(losses):.4f}")
+
+    def predict_temporal(self, windows):
+        """Mining probability for each (window, 13) sequence, e.g. SequenceDataset.latest()"""
+        if self.temporal_model is None and self.temporal_path:
+            # The LSTM has no TensorFlow-free export; load it on the first temporal request
+            self._load_temporal_model()
+        if self.temporal_model is None:
+            return None
+        X = self._scale_sequences(np.asarray(windows))
+        return self.temporal_model.predict(X, verbose=0, batch_size=max(32, len(X)))[:, 0]
+
     def predict(self, features_dict):
         """Inference using ensemble logic"""
         if not self.is_trained: return None
-        
-        feature_order = [
-            'ndvi_mean', 'ndvi_trend', 'ndvi_volatility', 'ndvi_min', 'ndvi_max',
-            'nightlight_mean', 'nightlight_trend', 'nightlight_peak', 'nightlight_volatility',
-            'acoustic_activity', 'drilling_freq', 'excavator_freq', 'max_confidence'
-        ]
-        X = np.array([[features_dict.get(f, 0) for f in feature_order]])
+        return self.predict_batch([features_dict])[0]
+
+    @staticmethod
+    def to_feature_matrix(features):
+        """(N, 13) float matrix from a DataFrame, an array or a list of feature dicts"""
+        if isinstance(features, pd.DataFrame):
+            return features.reindex(columns=FEATURE_ORDER).fillna(0).to_numpy(dtype=np.float64)
+        if isinstance(features, np.ndarray):
+            X = np.atleast_2d(features).astype(np.float64, copy=False)
+            if X.shape[1] != len(FEATURE_ORDER):
+                raise ValueError(f"Expected {len(FEATURE_ORDER)} feature columns, got {X.shape[1]}")
+            return X
+        return np.array([[row.get(f, 0) for f in FEATURE_ORDER] for row in features], dtype=np.float64)
+
+    @staticmethod
+    def feature_locations(features):
+        """Per-row location_id for the anomaly streams, or None when rows carry none"""
+        if isinstance(features, pd.DataFrame):
+            return features['location_id'].tolist() if 'location_id' in features else None
+        if isinstance(features, np.ndarray):
+            return None
+        return [row.get('location_id') for row in features]
+
+    def anomaly_scores(self, features, locations=None):
+        """Only the O(1) online anomaly update of predict_batch, e.g. for cached predictions"""
+        X = self.to_feature_matrix(features)
+        if len(X) == 0:
+            return np.zeros(0)
+        if locations is None:
+            locations = self.feature_locations(features)
+        return self.anomaly_scorer.score_update(self.scaler.transform(X), locations)
+
+    def predict_batch(self, features, locations=None, score_anomalies=True):
+        """
+        Score N rows with one scaler, one RF and one network call. Rows also
+        update the online anomaly state of their location (locations, or a
+        location_id column/key in features; unlocated rows share one stream).
+        score_anomalies=False leaves the anomaly state alone and the results
+        without 'anomaly_score', for callers that score anomalies elsewhere.
+        """
+        if not self.is_trained: return None
+        X = self.to_feature_matrix(features)
+        if len(X) == 0:
+            return []
         X_scaled = self.scaler.transform(X)
-        
+        anomaly_score = None
+        if score_anomalies:
+            if locations is None:
+                locations = self.feature_locations(features)
+            anomaly_score = self.anomaly_scorer.score_update(X_scaled, locations)
+
         # Predictions
-        rf_prob = self.rf_classifier.predict_proba(X_scaled)[0][1]
-        nn_out = self.fusion_model.predict(X_scaled, verbose=0)
-        
-        is_mining = (rf_prob > 0.5) or (nn_out[0][0][0] > 0.5)
-        
-        return {
-            'is_mining': bool(is_mining),
-            'severity': int(np.argmax(nn_out[1][0])),
-            'equipment': int(np.argmax(nn_out[2][0])),
-            'confidence': float(max(rf_prob, nn_out[0][0][0]))
-        }
-
-    def save_models(self, path='models/ensemble/'):
-        os.makedirs(path, exist_ok=True)
-        joblib.dump(self.rf_classifier, f'{path}rf.pkl')
-        joblib.dump(self.scaler, f'{path}scaler.pkl')
-        self.fusion_model.save(f'{path}fusion.h5')
-
-    def load_models(self, path='models/ensemble/'):
-        self.rf_classifier = joblib.load(f'{path}rf.pkl')
+        rf_prob = self.rf_classifier.predict_proba(X_scaled)[:, 1]
+        if self.fusion_model is None:
+            # RF-only mode: severity bucketed from the forest's probability, no equipment head
+            nn_prob = rf_prob
+            severity = np.digitize(rf_prob, [0.5, 0.8])
+            equipment = None
+        else:
+            nn_out = self.fusion_model.predict(X_scaled, verbose=0, batch_size=max(32, len(X)))
+            nn_prob = np.asarray(nn_out[0])[:, 0]
+            severity = np.argmax(nn_out[1], axis=1)
+            equipment = np.argmax(nn_out[2], axis=1)
+
+        is_mining = (rf_prob > 0.5) | (nn_prob > 0.5)
+        confidence = np.maximum(rf_prob, nn_prob)
+
+        results = [
+            {
+                'is_mining': bool(is_mining[i]),
+                'severity': int(severity[i]),
+                'equipment': int(equipment[i]) if equipment is not None else None,
+                'confidence': float(confidence[i])
+            }
+            for i in range(len(X))
+        ]
+        if anomaly_score is not None:
+            for result, score in zip(results, anomaly_score):
+                result['anomaly_score'] = float(score)
+        return results
+
+    def save_models(self, path='models/ensemble/', keep_versions=None):
+        """
+        Write a new immutable version under path/<version>/, fsync it, and point
+        path/CURRENT at it once every file is durable. Returns the version.
+        keep_versions=N also removes all but the newest N versions (off by default).
+        """
+        version = new_model_version(path)
+        target = os.path.join(path, version, '')
+        os.makedirs(target)
+        if isinstance(self.rf_classifier, RandomForestClassifier):
+            # Single-row serving calls must not fan out over every core
+            self.rf_classifier.set_params(n_jobs=1)
+        joblib.dump(self.rf_classifier, f'{target}rf.pkl')
+        joblib.dump(self.scaler, f'{target}scaler.pkl')
+        self.anomaly_scorer.save(f'{target}anomaly.npz')
+        if hasattr(self.rf_classifier, 'estimators_'):
+            # Flat node arrays for the memory-mapped serving path
+            FlatForest.from_sklearn(self.rf_classifier).save(f'{target}rf_flat')
+        if self.fusion_model is not None and not isinstance(self.fusion_model, NumpyFusionModel):
+            self.fusion_model.save(f'{target}fusion.h5')
+            # Frozen weights for the TensorFlow-free serving path
+            NumpyFusionModel.from_keras(self.fusion_model).save(f'{target}fusion.npz')
+        if self.temporal_model is not None:
+            self.temporal_model.save(f'{target}temporal.h5')
+
+        fsync_tree(target)
+        publish_model_version(path, version)
+        if keep_versions:
+            for removed in prune_model_versions(path, keep_versions):
+                print(f"🗑️ Pruned model version {removed}")
+        return version
+
+    def save_anomaly_state(self, path):
+        """
+        Persist the serving-time anomaly baselines (they change with every
+        request, unlike the immutable version files). Written atomically.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(f'{path}.tmp', 'wb') as f:
+            self.anomaly_scorer.save(f, self.scaler.mean_, self.scaler.scale_)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f'{path}.tmp', path)
+
+    def load_anomaly_state(self, path):
+        """Adopt baselines written by save_anomaly_state, possibly under another model version"""
+        saved = OnlineAnomalyScorer.load(path)
+        self._adopt_anomaly_state(saved, saved.scaler_space)
+
+    def carry_anomaly_state(self, previous):
+        """Adopt the baselines a previously served detector has learned (on hot reload)"""
+        space = (previous.scaler.mean_, previous.scaler.scale_) if hasattr(previous.scaler, 'mean_') else None
+        self._adopt_anomaly_state(previous.anomaly_scorer, space)
+
+    def _adopt_anomaly_state(self, scorer, space):
+        if scorer.n_features != self.anomaly_scorer.n_features:
+            print("Saved anomaly state has a different feature count; starting from the trained baselines.")
+            return
+        if space is None:
+            self.anomaly_scorer.adopt(scorer)
+        else:
+            self.anomaly_scorer.adopt(scorer, space[0], space[1], self.scaler.mean_, self.scaler.scale_)
+
+    def load_models(self, path='models/ensemble/', backend='numpy'):
+        """
+        backend='numpy' serves from rf_flat/ and fusion.npz when they exist,
+        'keras' loads the saved Keras network, 'rf' serves the forest alone.
+        path may be a model root with a CURRENT pointer or a single version directory.
+        """
+        path = os.path.join(resolve_model_path(path), '')
+        if backend in ('numpy', 'rf') and os.path.exists(f'{path}rf_flat'):
+            self.rf_classifier = FlatForest.load(f'{path}rf_flat')
+        else:
+            self.rf_classifier = joblib.load(f'{path}rf.pkl')
         self.scaler = joblib.load(f'{path}scaler.pkl')
-        self.fusion_model = keras.models.load_model(f'{path}fusion.h5')
+        if os.path.exists(f'{path}anomaly.npz'):
+            self.anomaly_scorer = OnlineAnomalyScorer.load(f'{path}anomaly.npz')
+        else:
+            self.anomaly_scorer = OnlineAnomalyScorer(n_features=len(FEATURE_ORDER))
+        if backend == 'numpy' and os.path.exists(f'{path}fusion.npz'):
+            self.fusion_model = NumpyFusionModel.load(f'{path}fusion.npz')
+        elif backend == 'rf':
+            # RF-only serving: no fusion network, TensorFlow never imported
+            self.fusion_model = None
+        else:
+            from tensorflow import keras
+            self.fusion_model = keras.models.load_model(f'{path}fusion.h5')
+        self.temporal_model = None
+        self.temporal_path = f'{path}temporal.h5' if os.path.exists(f'{path}temporal.h5') else None
+        if backend == 'keras' and self.temporal_path:
+            self._load_temporal_model()
         self.is_trained = True
+
+    def _load_temporal_model(self):
+        from tensorflow import keras
+        self.temporal_model = keras.models.load_model(self.temporal_path)
+
+
+# ---------- versioned model artifacts ----------
+
+def current_model_version(root):
+    """Version named by root/CURRENT, or None for an unversioned directory"""
+    try:
+        with open(os.path.join(root, 'CURRENT')) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve_model_path(root):
+    version = current_model_version(root)
+    return os.path.join(root, version) if version else root
+
+
+def new_model_version(root):
+    version = datetime.now().strftime('%Y%m%d-%H%M%S')
+    suffix = 0
+    candidate = version
+    while os.path.exists(os.path.join(root, candidate)):
+        suffix += 1
+        candidate = f'{version}-{suffix}'
+    return candidate
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_tree(path):
+    """fsync every file and directory under path, then path's parent (which holds its entry)"""
+    for directory, _, files in os.walk(path, topdown=False):
+        for name in files:
+            with open(os.path.join(directory, name), 'rb') as f:
+                os.fsync(f.fileno())
+        _fsync_dir(directory)
+    _fsync_dir(os.path.dirname(os.path.normpath(path)) or '.')
+
+
+def publish_model_version(root, version):
+    """Atomically repoint CURRENT; readers see either the old or the new version"""
+    pointer = os.path.join(root, 'CURRENT')
+    with open(f'{pointer}.tmp', 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f'{pointer}.tmp', pointer)
+    # Persist the rename itself
+    _fsync_dir(root)
+
+
+def list_model_versions(root):
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if os.path.isdir(os.path.join(root, name)) and os.path.exists(os.path.join(root, name, 'scaler.pkl'))
+    )
+
+
+def prune_model_versions(root, keep=5):
+    """Remove the oldest versions beyond `keep`, never the current one; returns the removed versions"""
+    if not keep:
+        return []
+    current = current_model_version(root)
+    others = [v for v in list_model_versions(root) if v != current]
+    removed = others[:max(0, len(others) - (keep - 1))]
+    for version in removed:
+        shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+    return removed
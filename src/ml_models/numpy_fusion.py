@@ -0,0 +1,98 @@
+"""
+Pure-NumPy forward pass for the attention fusion network.
+Weights are frozen from the trained Keras model (BatchNorm reduced to a single
+scale/shift) so serving does not need TensorFlow or its per-call dispatch.
+"""
+
+import numpy as np
+
+# Dense layers of build_attention_fusion, in graph order
+HIDDEN_LAYERS = ['dense_in', 'attention', 'dense_mid', 'dense_out']
+HEADS = ['anomaly', 'severity', 'equipment']
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _softmax(x):
+    x = x - x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+    return x
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def export_fusion_weights(model):
+    """
+    Freeze a Keras model built by build_attention_fusion into a dict of float32
+    arrays. BatchNorm (inference mode) becomes x * bn_scale + bn_shift.
+    """
+    dense = [layer for layer in model.layers if type(layer).__name__ == 'Dense']
+    norms = [layer for layer in model.layers if type(layer).__name__ == 'BatchNormalization']
+    heads = {layer.name: layer for layer in dense if layer.name in HEADS}
+    hidden = [layer for layer in dense if layer.name not in HEADS]
+    if len(hidden) != len(HIDDEN_LAYERS) or len(norms) != 1 or set(heads) != set(HEADS):
+        raise ValueError("Model does not match the attention fusion architecture")
+
+    weights = {}
+    for name, layer in list(zip(HIDDEN_LAYERS, hidden)) + [(h, heads[h]) for h in HEADS]:
+        kernel, bias = layer.get_weights()
+        weights[f'{name}_kernel'] = kernel.astype(np.float32)
+        weights[f'{name}_bias'] = bias.astype(np.float32)
+
+    bn = norms[0]
+    gamma, beta, moving_mean, moving_var = bn.get_weights()
+    scale = gamma / np.sqrt(moving_var + bn.epsilon)
+    weights['bn_scale'] = scale.astype(np.float32)
+    weights['bn_shift'] = (beta - moving_mean * scale).astype(np.float32)
+    return weights
+
+
+class NumpyFusionModel:
+    """Drop-in replacement for the Keras fusion model's predict()"""
+
+    def __init__(self, weights):
+        self.weights = {k: np.asarray(v, dtype=np.float32) for k, v in weights.items()}
+        self.input_dim = self.weights['dense_in_kernel'].shape[0]
+
+    @classmethod
+    def from_keras(cls, model):
+        return cls(export_fusion_weights(model))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({k: data[k] for k in data.files})
+
+    def save(self, path):
+        np.savez(path, **self.weights)
+
+    def _dense(self, name, x):
+        return x @ self.weights[f'{name}_kernel'] + self.weights[f'{name}_bias']
+
+    def forward(self, X):
+        """Returns (anomaly (N, 1), severity (N, 3), equipment (N, 5))"""
+        x = np.asarray(X, dtype=np.float32)
+        if x.ndim == 1:
+            x = x[np.newaxis, :]
+
+        x = _relu(self._dense('dense_in', x))
+        x = x * self.weights['bn_scale'] + self.weights['bn_shift']
+        x = x * _softmax(self._dense('attention', x))
+        x = _relu(self._dense('dense_mid', x))
+        # Dropout is the identity at inference time
+        x = _relu(self._dense('dense_out', x))
+
+        return (
+            _sigmoid(self._dense('anomaly', x)),
+            _softmax(self._dense('severity', x)),
+            _softmax(self._dense('equipment', x))
+        )
+
+    def predict(self, X, verbose=0, batch_size=None):
+        """Same call signature and output layout as keras Model.predict"""
+        return list(self.forward(X))
@@ -0,0 +1,146 @@
+"""
+Streaming anomaly scoring on the scaled fusion features.
+Each location keeps an exponentially weighted mean and mean absolute deviation
+per feature; a row is scored against its location's state and then folded in,
+so every update is O(1) and nothing is refit in batch.
+"""
+
+import threading
+import numpy as np
+
+# Mean absolute deviation of a normal variable is sigma * sqrt(2 / pi)
+MAD_TO_SIGMA = np.sqrt(np.pi / 2)
+GLOBAL_STREAM = '__global__'
+
+
+class OnlineAnomalyScorer:
+    """
+    Robust streaming z-scores. The anomaly score of a row is the RMS of its
+    per-feature z-scores (clipped at clip): about 1 for typical rows, 3+ for
+    rows far from the location's recent history.
+    """
+
+    def __init__(self, n_features=13, half_life=48, clip=10.0):
+        self.n_features = n_features
+        self.half_life = half_life
+        self.alpha = 1.0 - 0.5 ** (1.0 / half_life)
+        self.clip = clip
+        # State new locations start from; fit() sets it from the training rows
+        self.prior_mean = np.zeros(n_features)
+        self.prior_dev = np.full(n_features, 1.0 / MAD_TO_SIGMA)
+
+        self._index = {}
+        self.mean = np.zeros((0, n_features))
+        self.dev = np.zeros((0, n_features))
+        self.count = np.zeros(0, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def locations(self):
+        return list(self._index)
+
+    def fit(self, X, locations=None):
+        """Reset to a robust prior from scaled training rows, then stream them in order"""
+        X = np.asarray(X, dtype=np.float64)
+        median = np.median(X, axis=0)
+        self.prior_mean = median
+        self.prior_dev = np.maximum(np.mean(np.abs(X - median), axis=0), 1e-6)
+        self._index = {}
+        self.mean = np.zeros((0, self.n_features))
+        self.dev = np.zeros((0, self.n_features))
+        self.count = np.zeros(0, dtype=np.int64)
+        if locations is not None:
+            self.score_update(X, locations)
+        return self
+
+    def _slot(self, location):
+        i = self._index.get(location)
+        if i is None:
+            i = len(self._index)
+            if i == len(self.count):
+                # Grow the state arrays geometrically so adding locations stays amortised O(1)
+                grow = max(8, len(self.count))
+                self.mean = np.concatenate([self.mean, np.zeros((grow, self.n_features))])
+                self.dev = np.concatenate([self.dev, np.zeros((grow, self.n_features))])
+                self.count = np.concatenate([self.count, np.zeros(grow, dtype=np.int64)])
+            self.mean[i] = self.prior_mean
+            self.dev[i] = self.prior_dev
+            self._index[location] = i
+        return i
+
+    def score_update(self, X, locations=None):
+        """Score each scaled row against its location's state, then update that state"""
+        X = np.asarray(X, dtype=np.float64)
+        if locations is None:
+            locations = [GLOBAL_STREAM] * len(X)
+        scores = np.empty(len(X))
+        with self._lock:
+            for row, (x, location) in enumerate(zip(X, locations)):
+                i = self._slot(GLOBAL_STREAM if location is None else location)
+                sigma = self.dev[i] * MAD_TO_SIGMA
+                z = np.clip((x - self.mean[i]) / sigma, -self.clip, self.clip)
+                scores[row] = np.sqrt(np.mean(z * z))
+                # Huber-style update: a single outlier moves the state by at most clip * sigma
+                residual = z * sigma
+                self.mean[i] += self.alpha * residual
+                self.dev[i] += self.alpha * (np.abs(residual) - self.dev[i])
+                self.count[i] += 1
+        return scores
+
+    def rescale(self, old_mean, old_scale, new_mean, new_scale):
+        """Map the state into a new StandardScaler space (see EnhancedMiningDetector._rescale_inputs)"""
+        with self._lock:
+            self.mean = (self.mean * old_scale + old_mean - new_mean) / new_scale
+            self.dev = self.dev * old_scale / new_scale
+            self.prior_mean = (self.prior_mean * old_scale + old_mean - new_mean) / new_scale
+            self.prior_dev = self.prior_dev * old_scale / new_scale
+
+    def adopt(self, other, old_mean=None, old_scale=None, new_mean=None, new_scale=None):
+        """
+        Take over the per-location state of another scorer (e.g. the one a
+        previous model version served with), mapped from its scaler space into
+        ours when the scaler statistics are given. Priors stay our own.
+        """
+        with other._lock:
+            n = len(other._index)
+            locations = list(other._index)
+            mean, dev, count = other.mean[:n].copy(), other.dev[:n].copy(), other.count[:n].copy()
+        if old_mean is not None:
+            mean = (mean * old_scale + old_mean - new_mean) / new_scale
+            dev = dev * old_scale / new_scale
+        with self._lock:
+            for j, location in enumerate(locations):
+                i = self._slot(location)
+                self.mean[i], self.dev[i], self.count[i] = mean[j], dev[j], count[j]
+        return self
+
+    def save(self, path, scaler_mean=None, scaler_scale=None):
+        """scaler_mean/scaler_scale record the space the state lives in, so it can be adopted later"""
+        with self._lock:
+            n = len(self._index)
+            arrays = dict(
+                locations=np.array([str(loc) for loc in self._index], dtype=str),
+                mean=self.mean[:n].astype(np.float32), dev=self.dev[:n].astype(np.float32),
+                count=self.count[:n].copy(), prior_mean=self.prior_mean, prior_dev=self.prior_dev,
+                params=np.array([self.half_life, self.clip])
+            )
+        if scaler_mean is not None:
+            arrays.update(scaler_mean=scaler_mean, scaler_scale=scaler_scale)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            half_life, clip = data['params']
+            scorer = cls(n_features=len(data['prior_mean']), half_life=float(half_life), clip=float(clip))
+            scorer.prior_mean = data['prior_mean']
+            scorer.prior_dev = data['prior_dev']
+            scorer._index = {loc: i for i, loc in enumerate(data['locations'].tolist())}
+            scorer.mean = data['mean'].astype(np.float64)
+            scorer.dev = data['dev'].astype(np.float64)
+            scorer.count = data['count']
+            scorer.scaler_space = (data['scaler_mean'], data['scaler_scale']) if 'scaler_mean' in data else None
+        return scorer
@@ -0,0 +1,144 @@
+"""
+Serving-side model registry with hot reload.
+A new version is loaded into a fresh detector off to the side and swapped in
+with a single reference assignment; callers that already hold the previous
+detector finish on it. The online anomaly baselines learned while serving are
+carried into each new version and saved to state_path periodically.
+"""
+
+import os
+import time
+import threading
+
+from src.ml_models.fusion_model import EnhancedMiningDetector, current_model_version, resolve_model_path
+
+
+class ModelRegistry:
+    """Holds the active (version, detector) pair for a model root directory"""
+
+    def __init__(self, root='models/ensemble/', backend='numpy', state_path=None):
+        self.root = root
+        self.backend = backend
+        self.state_path = state_path
+        self._active = (None, EnhancedMiningDetector())
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self._last_check = 0.0
+        self._persister = None
+        self._persist_stop = threading.Event()
+        self._listeners = []
+        self.loaded_at = None
+
+    @property
+    def current(self):
+        """Active detector; take one reference per request and use it throughout"""
+        return self._active[1]
+
+    @property
+    def version(self):
+        return self._active[0]
+
+    def subscribe(self, callback):
+        """Call callback(version, previous) after every swap, e.g. to drop cached results"""
+        self._listeners.append(callback)
+
+    def install(self, detector, version):
+        """Swap in an already-loaded detector, handing it the served anomaly baselines"""
+        current = self.current
+        try:
+            if current.is_trained:
+                detector.carry_anomaly_state(current)
+            elif self.state_path and os.path.exists(self.state_path):
+                detector.load_anomaly_state(self.state_path)
+        except Exception as e:
+            print(f"Could not restore anomaly state: {e}")
+        previous = self._active[0]
+        self._active = (version, detector)
+        self.loaded_at = time.time()
+        for callback in self._listeners:
+            callback(version, previous)
+        return previous
+
+    def reload(self, force=False):
+        """Load the version CURRENT points at, if it differs from the active one"""
+        with self._reload_lock:
+            version = current_model_version(self.root)
+            if version is None and not os.path.exists(os.path.join(self.root, 'scaler.pkl')):
+                raise FileNotFoundError(f"No saved models under {self.root}")
+            version = version or 'unversioned'
+            if version == self.version and not force:
+                return {'version': version, 'previous': version, 'changed': False}
+
+            detector = EnhancedMiningDetector()
+            detector.load_models(resolve_model_path(self.root), backend=self.backend)
+            previous = self.install(detector, version)
+            print(f"Model version {version} active (was {previous}).")
+            return {'version': version, 'previous': previous, 'changed': True}
+
+    def refresh_if_stale(self, min_interval=1.0):
+        """Cheap per-call check used by worker processes: reload when CURRENT moved"""
+        now = time.monotonic()
+        if now - self._last_check < min_interval:
+            return False
+        self._last_check = now
+        if current_model_version(self.root) in (None, self.version):
+            return False
+        return self.reload()['changed']
+
+    # ---------- anomaly state persistence ----------
+
+    def save_state(self):
+        """Write the active detector's anomaly baselines to state_path"""
+        detector = self.current
+        if self.state_path and detector.is_trained:
+            detector.save_anomaly_state(self.state_path)
+            return True
+        return False
+
+    def start_persisting(self, interval=60.0):
+        if self._persister is not None or not self.state_path:
+            return
+        self._persist_stop.clear()
+        self._persister = threading.Thread(target=self._persist, args=(interval,), daemon=True,
+                                           name='anomaly-state-saver')
+        self._persister.start()
+
+    def _persist(self, interval):
+        while not self._persist_stop.wait(interval):
+            try:
+                self.save_state()
+            except Exception as e:
+                print(f"Saving anomaly state failed: {e}")
+
+    def stop_persisting(self):
+        """Stop the periodic saver and write the state one last time"""
+        self._persist_stop.set()
+        if self._persister is not None:
+            self._persister.join(timeout=5)
+            self._persister = None
+        self.save_state()
+
+    # ---------- file watcher ----------
+
+    def start_watching(self, interval=5.0):
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True, name='model-watcher')
+        self._watcher.start()
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                if current_model_version(self.root) not in (None, self.version):
+                    self.reload()
+            except Exception as e:
+                # Keep serving the active version if the new one fails to load
+                print(f"Model reload failed: {e}")
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
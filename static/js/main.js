@@ -39,19 +39,9 @@ function refreshData() {
 
 // Export data
 function exportData(format) {
-    fetch('/api/acoustic/all?limit=1000')
-        .then(r => r.json())
-        .then(data => {
-            if (data.success && data.data.length > 0) {
-                if (format === 'csv') {
-                    const headers = Object.keys(data.data[0]).join(',');
-                    const rows = data.data.map(d => Object.values(d).join(',')).join('\n');
-                    downloadFile(headers + '\n' + rows, 'auralite_detections.csv', 'text/csv');
-                } else {
-                    downloadFile(JSON.stringify(data.data, null, 2), 'auralite_detections.json', 'application/json');
-                }
-            }
-        });
+    // The server streams the full history; the browser saves it as it arrives
+    const fmt = format === 'csv' ? 'csv' : 'ndjson';
+    window.location.href = `/api/export/acoustic?format=${fmt}`;
 }
 
 function downloadFile(content, filename, type) {
@@ -0,0 +1,29 @@
+import os
+import tempfile
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from src.ml_models.fusion_model import EnhancedMiningDetector
+
+# Keep the Flask app's alert/detection history and the API's anomaly state out of the working tree
+_state_dir = tempfile.mkdtemp()
+os.environ.setdefault('AURALITE_HISTORY_DB', os.path.join(_state_dir, 'history.db'))
+os.environ.setdefault('AURALITE_ANOMALY_STATE_PATH', os.path.join(_state_dir, 'anomaly_state.npz'))
+
+
+@pytest.fixture(scope='session')
+def small_detector():
+    """A quickly fitted detector: real scaler and forest, untrained fusion network"""
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((200, 13))
+    y = (X[:, 0] + X[:, 9] > 0).astype(int)
+
+    detector = EnhancedMiningDetector()
+    detector.scaler.fit(X)
+    detector.rf_classifier = RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0)
+    detector.rf_classifier.fit(detector.scaler.transform(X), y)
+    detector.fusion_model = detector.build_attention_fusion(13)
+    detector.is_trained = True
+    return detector
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from src.data_processing.acoustic_sensor import AdvancedAcousticDetector, NoiseProfile
+
+SR = 16000
+
+
+def _noisy_tone(seconds=6, seed=0):
+    """White noise with a 150 Hz machinery tone in the middle third"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(SR * seconds) / SR
+    noise = 0.05 * rng.standard_normal(len(t))
+    tone = np.where((t > seconds / 3) & (t < 2 * seconds / 3), 0.5 * np.sin(2 * np.pi * 150 * t), 0)
+    return t, (noise + tone).astype(np.float32)
+
+
+def test_denoise_suppresses_stationary_noise(tmp_path):
+    detector = AdvancedAcousticDetector(sampling_rate=SR, noise_profile_dir=str(tmp_path))
+    t, audio = _noisy_tone()
+    denoised = detector.denoise_audio(audio)
+
+    assert denoised.shape == audio.shape
+    quiet = t < 1.5
+    loud = (t > 2.5) & (t < 3.5)
+    assert np.std(denoised[quiet]) < 0.5 * np.std(audio[quiet])
+    assert np.std(denoised[loud]) > 0.8 * np.std(audio[loud])
+
+
+def test_noise_profile_persists_between_restarts(tmp_path):
+    detector = AdvancedAcousticDetector(sensor_id="s1", sampling_rate=SR, noise_profile_dir=str(tmp_path))
+    detector.denoise_audio(_noisy_tone()[1])
+    detector.save_noise_profile()
+
+    restarted = AdvancedAcousticDetector(sensor_id="s1", sampling_rate=SR, noise_profile_dir=str(tmp_path))
+    assert restarted.noise_profile.is_ready
+    np.testing.assert_allclose(restarted.noise_profile.mean, detector.noise_profile.mean)
+    assert restarted.noise_profile.frames_seen == detector.noise_profile.frames_seen
+
+    # A profile learned at another sampling rate is not reused
+    other = NoiseProfile.load(restarted.noise_profile_path, n_fft=2048, sampling_rate=44100)
+    assert not other.is_ready
+
+
+def test_batch_service_matches_single_sensor_pipeline(tmp_path):
+    from src.data_processing.acoustic_batch import AcousticBatchService
+
+    chunks = {f"s{i}": [_noisy_tone(seed=i)[1], _noisy_tone(seed=10 + i)[1]] for i in range(3)}
+    service = AcousticBatchService(sampling_rate=SR, max_workers=2, noise_profile_dir=str(tmp_path / "batch"))
+    try:
+        results = service.process(chunks)
+    finally:
+        service.shutdown()
+
+    assert sorted(results) == ["s0", "s1", "s2"]
+    for sensor_id, sensor_chunks in chunks.items():
+        single = AdvancedAcousticDetector(sensor_id=sensor_id, sampling_rate=SR, noise_profile_dir=None)
+        for chunk, result in zip(sensor_chunks, results[sensor_id]):
+            denoised = single.denoise_audio(chunk)
+            np.testing.assert_allclose(result['features'], single.extract_mfcc_features(denoised), rtol=1e-4, atol=1e-3)
+            expected = single.detect_equipment(denoised, len(chunk) / SR)
+            assert [e['equipment'] for e in result['equipment']] == [e['equipment'] for e in expected]
+        assert service.detectors[sensor_id].noise_profile.frames_seen == single.noise_profile.frames_seen
+
+
+def test_forward_stream_decodes_with_bounded_buffer():
+    import io
+    import soundfile as sf
+    from src.data_processing.audio_stream import ForwardStream, open_audio_stream
+
+    audio = _noisy_tone(seconds=30)[1]
+    buf = io.BytesIO()
+    sf.write(buf, np.stack([audio, audio], axis=1), SR, format='WAV', subtype='PCM_24')
+    data = buf.getvalue()
+    pieces = iter([data[i:i + 4096] for i in range(0, len(data), 4096)])
+
+    stream = ForwardStream(lambda: next(pieces, b''), window=8192)
+    decoder = open_audio_stream(stream, block_frames=2048)
+    peak_buffer = 0
+    decoded = []
+    for block in decoder.blocks():
+        decoded.append(block.copy())
+        peak_buffer = max(peak_buffer, len(stream._buffer))
+
+    np.testing.assert_allclose(np.concatenate(decoded), audio, atol=1e-6)
+    assert peak_buffer < 8192 + 2048 * decoder.block_align + 4096
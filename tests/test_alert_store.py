@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from utils.alert_store import AlertStore
+from utils.pagination import decode_cursor
+
+
+def _alert(i, location='raj_001', severity='high'):
+    return {'id': f'alert_{i}', 'location_id': location, 'severity': severity,
+            'timestamp': f'2024-06-01T00:{i // 60:02d}:{i % 60:02d}'}
+
+
+def test_ring_evicts_oldest_and_keeps_indexes_consistent():
+    store = AlertStore(retention=5)
+    for i in range(8):
+        store.add(_alert(i, location='raj_001' if i % 2 else 'hr_001', severity='critical' if i < 4 else 'high'))
+
+    assert len(store) == 5 and store.evicted == 3
+    assert [a['seq'] for a in store.recent()] == [3, 4, 5, 6, 7]
+    assert store.get('alert_0') is None and 'alert_3' in store
+    assert [a['id'] for a in store.query(severity='critical')] == ['alert_3']
+    assert [a['id'] for a in store.query(location_id='raj_001', severity='high')] == ['alert_5', 'alert_7']
+    assert store.counts()['by_severity'] == {'critical': 1, 'high': 4}
+
+
+def test_acknowledge_moves_alert_between_indexes():
+    store = AlertStore(retention=10)
+    for i in range(4):
+        store.add(_alert(i))
+    assert store.acknowledge('alert_2')['acknowledged'] is True
+    assert store.acknowledge('missing') is None
+    assert [a['id'] for a in store.query(acknowledged=True)] == ['alert_2']
+    assert [a['id'] for a in store.query(acknowledged=False, limit=2)] == ['alert_1', 'alert_3']
+    assert store.counts()['unacknowledged'] == 3
+
+
+def test_page_follows_cursor_across_eviction():
+    store = AlertStore(retention=4)
+    for i in range(3):
+        store.add(_alert(i))
+    latest, cursor, has_more = store.page(2)
+    assert [a['seq'] for a in latest] == [1, 2] and not has_more
+    for i in range(3, 10):
+        store.add(_alert(i))
+    # Alerts 3..5 were evicted before the client polled again
+    page, cursor, has_more = store.page(3, cursor)
+    assert [a['seq'] for a in page] == [6, 7, 8] and has_more
+    page, cursor, has_more = store.page(3, cursor)
+    assert [a['seq'] for a in page] == [9] and not has_more
+    assert store.page(3, cursor)[0] == [] and decode_cursor(cursor) == 9
+    assert [a['seq'] for a in store.page(10, since='2024-06-01T00:00:07')[0]] == [8, 9]
+
+
+def test_concurrent_adds_get_unique_sequences():
+    store = AlertStore(retention=1000)
+
+    def worker(offset):
+        for i in range(250):
+            store.add(_alert(offset + i))
+
+    threads = [threading.Thread(target=worker, args=(n * 250,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seqs = [a['seq'] for a in store.recent()]
+    assert len(store) == 1000 and seqs == list(range(1000, 2000))
+    assert sum(store.counts()['by_severity'].values()) == 1000
+
+
+def test_ids_come_from_the_store_and_reads_are_copies():
+    store = AlertStore(retention=10)
+    # Callers' ids (e.g. timestamp-based) may collide; the store assigns its own
+    first = store.add({'id': 'bg_1', 'severity': 'high'}, prefix='bg')
+    second = store.add({'id': 'bg_1', 'severity': 'high'}, prefix='bg')
+    assert (first['id'], second['id']) == ('bg_0', 'bg_1') and len(store) == 2
+
+    held = store.recent()[0]
+    store.acknowledge('bg_0')
+    assert 'acknowledged_at' not in held and 'acknowledged_at' not in first
+    assert store.get('bg_0')['acknowledged'] is True
+    store.get('bg_0')['severity'] = 'low'
+    assert store.query(severity='high', limit=5)[0]['id'] == 'bg_0'
+    with pytest.raises(ValueError):
+        store.query(severity='high', limit=0)
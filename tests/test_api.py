@@ -0,0 +1,347 @@
+import io
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi.testclient import TestClient
+
+from config import Config
+from src.api import main
+from src.data_processing.feature_store import AcousticFeatureStore
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'NOISE_PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(main, 'feature_store', AcousticFeatureStore(str(tmp_path / 'features')))
+    main.acoustic_detectors.clear()
+    if main.prediction_cache is not None:
+        main.prediction_cache.clear()
+    return TestClient(main.app)
+
+
+def _serve(monkeypatch, detector, version='test'):
+    monkeypatch.setattr(main.model_registry, '_active', (version, detector))
+
+
+def _recording(seconds, sr=16000, fmt='WAV', subtype='PCM_16'):
+    rng = np.random.default_rng(0)
+    audio = (0.1 * rng.standard_normal(sr * seconds)).astype(np.float32)
+    buf = io.BytesIO()
+    sf.write(buf, audio, sr, format=fmt, subtype=subtype)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize('fmt,subtype', [('WAV', 'PCM_16'), ('WAV', 'FLOAT'), ('FLAC', 'PCM_16')])
+def test_sensor_upload_is_streamed_through_detector(client, fmt, subtype):
+    body = _recording(25, fmt=fmt, subtype=subtype)
+    resp = client.post('/api/sensor/data', params={'sensor_id': 'raj_001'}, content=body,
+                       headers={'content-type': 'application/octet-stream'})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data['size'] == len(body)
+    assert data['sampling_rate'] == 16000
+    assert data['duration_seconds'] == 25.0
+    assert [c['duration_seconds'] for c in data['chunks']] == [10.0, 10.0, 5.0]
+    assert main.acoustic_detectors['raj_001'].noise_profile.is_ready
+
+
+def test_sensor_upload_accepts_multipart_and_rejects_unknown_audio(client):
+    resp = client.post('/api/sensor/data', params={'sensor_id': 'raj_002'},
+                       files={'file': ('clip.wav', _recording(3), 'audio/wav')})
+    assert resp.status_code == 200
+    assert resp.json()['chunks_processed'] == 1
+
+    resp = client.post('/api/sensor/data', params={'sensor_id': 'raj_002'}, content=b'ID3\x00not audio')
+    assert resp.status_code == 415
+
+    # Non-positive, oversized, or shorter than one STFT frame (2048 samples at 16 kHz)
+    for chunk_seconds in (0, -5, 10_000, 1e-5, 0.05):
+        resp = client.post('/api/sensor/data', params={'sensor_id': 'raj_002', 'chunk_seconds': chunk_seconds},
+                           content=_recording(1))
+        assert resp.status_code == 422
+
+    # Headers claiming zero sampling rate or block alignment are rejected, not decoded
+    wav = _recording(1)
+    for offset in (24, 32):  # sampling rate (4 bytes), block_align (2 bytes) in the fmt chunk
+        size = 4 if offset == 24 else 2
+        broken = wav[:offset] + bytes(size) + wav[offset + size:]
+        resp = client.post('/api/sensor/data', params={'sensor_id': 'raj_002'}, content=broken)
+        assert resp.status_code == 415
+
+
+def test_sensor_chunks_are_processed_under_the_sensor_lock():
+    import threading
+    from src.data_processing.audio_stream import ForwardStream, process_audio_stream
+
+    lock = threading.Lock()
+
+    class Detector:
+        stft_size = 2048
+
+        def process_chunk(self, chunk, duration):
+            assert lock.locked()
+            return {'equipment': []}
+
+    stream = io.BytesIO(_recording(3))
+    result = process_audio_stream(ForwardStream(lambda: stream.read(4096)), lambda sr: Detector(),
+                                  chunk_seconds=1.0, lock=lock)
+    assert result['chunks_processed'] == 3 and not lock.locked()
+
+
+def test_edge_payload_ingest(client):
+    from src.data_processing.acoustic_sensor import AdvancedAcousticDetector
+
+    sr = 16000
+    t = np.arange(sr * 10) / sr
+    rng = np.random.default_rng(1)
+    edge = AdvancedAcousticDetector(sensor_id='raj_001', sampling_rate=sr, noise_profile_dir=None, edge_mode=True)
+    edge.use_deep_audio = False
+
+    quiet = (0.05 * rng.standard_normal(len(t))).astype(np.float32)
+    assert edge.process_chunk(quiet) is None
+
+    machinery = (quiet + 0.3 * np.sin(2 * np.pi * 150 * t) * (t > 2)).astype(np.float32)
+    payload = edge.process_chunk(machinery)
+    assert payload is not None
+    assert len(str(payload)) < 2000
+
+    resp = client.post('/api/sensor/features', json=payload)
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data['feature_dim'] == 13
+    assert 'excavator' in [e['equipment'] for e in data['equipment']]
+
+    for field, value in (('sensor_id', '../../etc'), ('feature_type', '../x')):
+        resp = client.post('/api/sensor/features', json=dict(payload, **{field: value}))
+        assert resp.status_code == 400
+    resp = client.post('/api/sensor/data', params={'sensor_id': '../raj_001'}, content=_recording(1))
+    assert resp.status_code == 400
+
+
+def test_similar_sounds_searches_stored_features(client):
+    rng = np.random.default_rng(2)
+    base = rng.standard_normal(13)
+    for hour in range(24):
+        vector = base + 0.01 * rng.standard_normal(13) if hour in (3, 9, 15) else rng.standard_normal(13)
+        main.feature_store.append('raj_001', vector, f'2026-02-01T{hour:02d}:00:00')
+
+    resp = client.get('/api/sensor/raj_001/similar', params={'at': '2026-02-01T03:05:00', 'k': 2})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data['reference']['timestamp'] == '2026-02-01T03:00:00'
+    assert sorted(m['timestamp'][11:13] for m in data['matches']) == ['09', '15']
+
+    assert client.get('/api/sensor/unknown/similar', params={'at': '2026-02-01T03:00:00'}).status_code == 404
+    for params in ({'at': 'yesterday'}, {'at': '2026-02-01T03:00:00', 'start': '02/01/2026'},
+                   {'at': '2026-02-01T03:00:00', 'end': 'soon'}):
+        assert client.get('/api/sensor/raj_001/similar', params=params).status_code == 400
+    for k in (-1, 0, 10_000):
+        assert client.get('/api/sensor/raj_001/similar', params={'at': '2026-02-01T03:00:00', 'k': k}).status_code == 422
+
+
+def test_detect_batch_scores_every_location(client, small_detector, monkeypatch):
+    _serve(monkeypatch, small_detector)
+    items = [
+        {'location': {'lat': 27.0 + i * 0.1, 'lon': 76.0}, 'features': {'ndvi_mean': 0.1 * i, 'acoustic_activity': i}}
+        for i in range(5)
+    ]
+    items.append({'location': {'lat': 28.0, 'lon': 77.0}})
+    items.append({'location': {'lat': 27.32, 'lon': 76.44}})
+    resp = client.post('/api/detect/batch', json={'items': items})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data['count'] == 7
+    assert [r['location']['lat'] for r in data['results']] == [i['location']['lat'] for i in items]
+    assert [r['scored'] for r in data['results']] == [True] * 5 + [False, True]
+    # Nothing in range: no verdict is made up for the point
+    assert data['results'][5]['location_id'] is None and 'confidence' not in data['results'][5]
+    expected = main.get_feature_table().latest('raj_001')
+    assert data['results'][-1]['location_id'] == 'raj_001'
+    assert data['results'][-1]['confidence'] == pytest.approx(small_detector.predict(expected)['confidence'], abs=1e-6)
+
+    monkeypatch.setattr(main.Config, 'DETECT_BATCH_MAX_ITEMS', 3)
+    assert client.post('/api/detect/batch', json={'items': items}).status_code == 413
+
+
+def test_micro_batcher_coalesces_concurrent_rows():
+    import asyncio
+    from src.api.batching import MicroBatcher
+
+    calls = []
+
+    def predict_batch(rows):
+        calls.append(len(rows))
+        return [{'value': row['value'] * 2} for row in rows]
+
+    batcher = MicroBatcher(predict_batch, max_batch_size=8, max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(*[batcher.submit({'value': i}) for i in range(20)])
+
+    results = asyncio.run(run())
+    assert [r['value'] for r in results] == [2 * i for i in range(20)]
+    assert max(calls) <= 8 and len(calls) < 20
+    metrics = batcher.metrics()
+    assert metrics['requests'] == 20 and metrics['batches'] == len(calls)
+
+
+def test_detect_goes_through_batcher(client, small_detector, monkeypatch):
+    _serve(monkeypatch, small_detector)
+    # Sariska Tiger Reserve monitoring location
+    resp = client.post('/api/detect', json={'location': {'lat': 27.32, 'lon': 76.44}})
+    assert resp.status_code == 200
+    assert resp.json()['location_id'] == 'raj_001'
+    expected = main.get_feature_table().latest('raj_001')
+    assert resp.json()['confidence'] == pytest.approx(small_detector.predict(expected)['confidence'], abs=1e-6)
+    assert client.get('/api/metrics').json()['batching']['requests'] >= 1
+
+    # Outside every monitoring radius there is nothing to score
+    resp = client.post('/api/detect', json={'location': {'lat': 28.0, 'lon': 77.0}})
+    assert resp.status_code == 404 and 'No monitoring location' in resp.json()['detail']
+
+
+def test_repeat_detections_are_served_from_cache(client, small_detector, monkeypatch):
+    _serve(monkeypatch, small_detector)
+    body = {'location': {'lat': 27.32, 'lon': 76.44}}
+    stream = small_detector.anomaly_scorer
+    before = stream.count[stream._index['raj_001']] if 'raj_001' in stream._index else 0
+    first = client.post('/api/detect', json=body).json()
+    requests = client.get('/api/metrics').json()['batching']['requests']
+
+    # A miss updates the stream exactly once, from the API process
+    seen = stream.count[stream._index['raj_001']]
+    assert seen == before + 1 and 'anomaly_score' in first
+    second = client.post('/api/detect', json=body).json()
+    assert second['confidence'] == first['confidence']
+    metrics = client.get('/api/metrics').json()
+    assert metrics['batching']['requests'] == requests
+    assert metrics['cache']['hits'] >= 1
+    # The anomaly score is per location and stateful: recomputed (and updated) on every hit
+    assert stream.count[stream._index['raj_001']] == seen + 1
+    assert 'anomaly_score' in second
+    assert all('anomaly_score' not in entry for _, entry in main.prediction_cache._entries.values())
+
+    # A new model version never sees the old entries
+    main.model_registry.install(small_detector, 'next')
+    assert main.prediction_cache.metrics()['entries'] == 0
+
+
+def test_prediction_cache_buckets_and_expiry():
+    from src.api.prediction_cache import PredictionCache, parse_buckets
+
+    cache = PredictionCache(max_entries=2, ttl_s=60, buckets=parse_buckets('ndvi_mean=0.1'))
+    cache.put('v1', {'ndvi_mean': 0.31}, {'confidence': 0.9})
+    assert cache.get('v1', {'ndvi_mean': 0.33}) == {'confidence': 0.9}
+    assert cache.get('v1', {'ndvi_mean': 0.5}) is None
+    assert cache.get('v2', {'ndvi_mean': 0.31}) is None
+
+    cache.put('v1', {'ndvi_mean': 0.5}, {})
+    cache.put('v1', {'ndvi_mean': 0.7}, {})
+    assert cache.get('v1', {'ndvi_mean': 0.31}) is None
+    assert cache.metrics()['evictions'] == 1
+
+    cache.ttl_s = -1
+    cache.put('v1', {'ndvi_mean': 0.9}, {})
+    assert cache.get('v1', {'ndvi_mean': 0.9}) is None
+    assert cache.metrics()['expired'] == 1
+    for spec in ('not_a_feature=1', 'ndvi_mean=0', 'drilling_freq=-5'):
+        with pytest.raises(ValueError):
+            parse_buckets(spec)
+
+
+def test_inference_executor_rejects_when_full():
+    import asyncio
+    import threading
+    from src.api.inference import InferenceExecutor, InferenceQueueFull
+
+    release = threading.Event()
+    executor = InferenceExecutor('thread', max_workers=1, max_queue=1)
+
+    async def run():
+        first = asyncio.ensure_future(executor.run(release.wait))
+        second = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(InferenceQueueFull):
+            await executor.run(release.wait)
+        release.set()
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(run()) == [True, True]
+    metrics = executor.metrics()
+    assert metrics['rejected'] == 1 and metrics['completed'] == 2 and metrics['in_flight'] == 0
+    executor.shutdown()
+
+
+def test_detect_returns_429_when_inference_is_saturated(client, small_detector, monkeypatch):
+    from src.api.inference import InferenceQueueFull
+
+    async def saturated(fn, *args):
+        raise InferenceQueueFull("full")
+
+    _serve(monkeypatch, small_detector)
+    monkeypatch.setattr(main.inference_executor, 'run', saturated)
+    resp = client.post('/api/detect/batch', json={'items': [{'location': {'lat': 27.32, 'lon': 76.44}}]})
+    assert resp.status_code == 429
+    assert resp.headers['retry-after'] == '1'
+    assert client.get('/health').status_code == 200
+
+
+def test_model_reload_swaps_versions_atomically(client, small_detector, tmp_path, monkeypatch):
+    import time
+    from src.ml_models.fusion_model import list_model_versions
+
+    root = f'{tmp_path}/ensemble/'
+    monkeypatch.setattr(main.model_registry, 'root', root)
+    _serve(monkeypatch, main.model_registry.current, version=None)
+    assert client.post('/api/models/reload').status_code == 404
+
+    first = small_detector.save_models(root)
+    time.sleep(1.1)
+    # Pruning is opt-in
+    kept = small_detector.save_models(root)
+    assert list_model_versions(root) == [first, kept]
+    resp = client.post('/api/models/reload')
+    assert resp.json() == {'version': kept, 'previous': None, 'changed': True}
+    old = main.model_registry.current
+    assert client.post('/api/models/reload').json()['changed'] is False
+
+    time.sleep(1.1)
+    second = small_detector.save_models(root, keep_versions=1)
+    assert list_model_versions(root) == [second]
+    assert client.post('/api/models/reload').json()['version'] == second
+    assert main.model_registry.current is not old
+    # A request holding the previous detector can still finish on it
+    features = main.get_feature_table().latest('raj_001')
+    assert old.predict(features) == main.model_registry.current.predict(features)
+    assert client.get('/health').json()['model_version'] == second
+
+
+def test_temporal_scores_newest_window_per_location(client, small_detector, monkeypatch):
+    import copy
+    from src.data_processing.sequences import SequenceDataset
+
+    _serve(monkeypatch, small_detector)
+    assert client.get('/api/detect/temporal').status_code == 404
+
+    detector = copy.copy(small_detector)
+    table = main.get_feature_table()
+    labels = np.zeros(table.values.shape[:2], dtype=int)
+    detector.train_temporal(SequenceDataset.from_table(table, labels, stride=60), epochs=1, batch_size=64)
+    _serve(monkeypatch, detector)
+
+    data = client.get('/api/detect/temporal').json()
+    assert [r['location_id'] for r in data['results']] == table.locations
+    assert data['window_end'] == table.dates[-1].strftime('%Y-%m-%d')
+
+
+def test_process_workers_leave_anomaly_state_to_the_api(small_detector, monkeypatch):
+    from types import SimpleNamespace
+    from src.api import inference
+
+    registry = SimpleNamespace(refresh_if_stale=lambda: None, current=small_detector)
+    monkeypatch.setattr(inference, '_worker_registry', registry)
+    rows = [{**main.get_feature_table().latest('raj_002'), 'location_id': 'raj_002'}]
+    counts = small_detector.anomaly_scorer.count.copy()
+    result = inference.predict_in_worker(rows)[0]
+    assert 'anomaly_score' not in result
+    assert np.array_equal(small_detector.anomaly_scorer.count, counts)
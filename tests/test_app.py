@@ -0,0 +1,290 @@
+import json
+import math
+
+import pandas as pd
+import pytest
+
+import app as flask_app
+from utils.alert_store import AlertStore
+from utils.export import export_stream, filtered_chunks, time_bounds
+from utils.serialization import dumps, frame_to_columns, frame_to_records
+
+
+@pytest.fixture
+def client():
+    return flask_app.app.test_client()
+
+
+def _legacy(frame):
+    """What to_dict('records') + jsonify used to send, with NaN read back as None"""
+    return [{k: None if isinstance(v, float) and math.isnan(v) else v for k, v in row.items()}
+            for row in frame.to_dict('records')]
+
+
+def test_gps_tracks_records_and_columns_match_to_dict(client):
+    frame = flask_app.data_loader.gps_tracks.tail(100)
+    frame = frame.assign(seq=frame.index)
+    records = client.get('/api/gps_tracks?limit=100')
+    assert records.status_code == 200 and records.mimetype == 'application/json'
+    assert json.loads(records.data)['data'] == _legacy(frame)
+
+    columns = json.loads(client.get('/api/gps_tracks?limit=100&format=columns').data)
+    assert columns['format'] == 'columns'
+    assert list(columns['data']) == list(frame.columns)
+    assert [dict(zip(columns['data'], row)) for row in zip(*columns['data'].values())] == _legacy(frame)
+
+    assert client.get('/api/gps_tracks?format=xml').status_code == 400
+
+
+def test_location_detail_uses_requested_format(client):
+    resp = json.loads(client.get('/api/location/raj_001?format=columns').data)
+    assert set(resp['data']) == {'ndvi', 'nightlight', 'acoustic', 'camera'}
+    assert isinstance(resp['data']['ndvi']['ndvi_value'], list)
+
+
+def test_frame_encoding_handles_numpy_and_datetimes():
+    frame = pd.DataFrame({
+        'when': pd.to_datetime(['2024-01-01 05:00', None]),
+        'count': pd.array([1, None], dtype='Int64'),
+        'value': [0.5, float('nan')]
+    })
+    assert frame_to_records(frame) == [
+        {'when': '2024-01-01T05:00:00', 'count': 1, 'value': 0.5},
+        {'when': None, 'count': None, 'value': None}
+    ]
+    assert json.loads(dumps({'data': frame_to_columns(frame)}))['data']['value'] == [0.5, None]
+
+
+def test_bulk_time_series_matches_per_location_endpoints(client):
+    resp = client.get('/api/timeseries?locations=raj_001,raj_002&metrics=ndvi,nightlight&days=12')
+    assert resp.status_code == 200
+    series = json.loads(resp.data)['series']
+    for loc in ('raj_001', 'raj_002'):
+        assert series[loc]['ndvi'] == json.loads(client.get(f'/api/ndvi/{loc}?days=12').data)['data']
+        assert series[loc]['nightlight'] == json.loads(client.get(f'/api/nightlight/{loc}?days=12').data)['data']
+
+    ranged = json.loads(client.post('/api/timeseries', json={
+        'locations': ['raj_001'], 'metrics': ['ndvi'], 'days': 0, 'start': '2025-01-01', 'end': '2025-01-31'
+    }).data)['series']['raj_001']['ndvi']
+    assert ranged and all('2025-01-01' <= row['date'] <= '2025-01-31' for row in ranged)
+
+    # fields= trims each metric's frames to the columns a chart needs
+    narrow = json.loads(client.get('/api/timeseries?locations=raj_001&metrics=ndvi,nightlight'
+                                   '&fields=date,ndvi_value,intensity&format=columns').data)['series']['raj_001']
+    assert set(narrow['ndvi']) == {'date', 'ndvi_value'} and set(narrow['nightlight']) == {'date', 'intensity'}
+    assert narrow['ndvi']['ndvi_value'][-12:] == [row['ndvi_value'] for row in series['raj_001']['ndvi']]
+    assert client.get('/api/timeseries?metrics=ndvi&fields=intensity').status_code == 400
+
+    assert client.get('/api/timeseries?metrics=rainfall').status_code == 400
+    assert client.get('/api/timeseries?locations=nowhere').status_code == 400
+    for body in ({'locations': 5}, {'locations': [{'id': 'raj_001'}]}, {'metrics': {'ndvi': 1}},
+                 {'days': None}, ['raj_001']):
+        assert client.post('/api/timeseries', json=body).status_code == 400
+
+
+def test_acoustic_cursor_polling_returns_only_new_rows(client):
+    feed = flask_app.data_loader.acoustic_detections
+    latest = json.loads(client.get('/api/acoustic/all?limit=10').data)
+    assert [r['seq'] for r in latest['data']] == feed.index[-10:].tolist()
+    assert latest['has_more'] is False
+
+    # Nothing new after the latest window
+    empty = json.loads(client.get(f"/api/acoustic/all?cursor={latest['next_cursor']}").data)
+    assert empty['data'] == [] and empty['next_cursor'] == latest['next_cursor']
+
+    # Walk the feed from the start in pages of 100
+    seen, cursor = [], None
+    resp = json.loads(client.get('/api/acoustic/all?since=seq:0&limit=100').data)
+    while True:
+        seen += [r['seq'] for r in resp['data']]
+        if not resp['has_more']:
+            break
+        resp = json.loads(client.get(f"/api/acoustic/all?limit=100&cursor={resp['next_cursor']}").data)
+    assert seen == feed.index[1:].tolist()
+
+    stamp = sorted(feed['timestamp'])[-5]
+    recent = json.loads(client.get(f'/api/acoustic/all?since={stamp}&limit=500').data)['data']
+    assert len(recent) == (feed['timestamp'] > stamp).sum()
+    epoch = pd.Timestamp(stamp).timestamp()
+    assert len(json.loads(client.get(f'/api/acoustic/all?since=epoch:{epoch}&limit=500').data)['data']) == len(recent)
+    # A bare number could be a sequence or an epoch: rejected rather than guessed
+    assert client.get(f'/api/acoustic/all?since={int(epoch)}').status_code == 400
+    assert client.get('/api/gps_tracks?cursor=garbage').status_code == 400
+    for limit in ('abc', '0', '-3'):
+        assert client.get(f'/api/acoustic/all?since=seq:0&limit={limit}').status_code == 400
+        assert client.get(f'/api/gps_tracks?limit={limit}').status_code == 400
+
+
+def test_active_alerts_since_cursor(client):
+    first = json.loads(client.get('/api/active_alerts').data)
+    client.get('/api/simulate/detection')
+    client.get('/api/simulate/detection')
+    new = json.loads(client.get(f"/api/active_alerts?cursor={first['next_cursor']}").data)
+    assert len(new['alerts']) >= 2
+    assert [a['seq'] for a in new['alerts']] == sorted(a['seq'] for a in new['alerts'])
+    again = json.loads(client.get(f"/api/active_alerts?cursor={new['next_cursor']}").data)
+    assert all(a['seq'] > new['alerts'][-1]['seq'] for a in again['alerts'])
+
+    assert client.get('/api/active_alerts?limit=0&severity=HIGH').status_code == 400
+    assert client.get('/api/active_alerts?limit=-3').status_code == 400
+    assert client.get('/api/active_alerts?limit=many').status_code == 400
+
+    # Acknowledgements of alerts a poller already has are reported once
+    client.post(f"/api/acknowledge_alert/{new['alerts'][0]['id']}")
+    polled = json.loads(client.get(f"/api/active_alerts?cursor={again['next_cursor']}&ack_cursor={again['ack_cursor']}").data)
+    assert polled['acknowledged'] == [new['alerts'][0]['id']]
+    polled = json.loads(client.get(f"/api/active_alerts?cursor={polled['next_cursor']}&ack_cursor={polled['ack_cursor']}").data)
+    assert polled['acknowledged'] == []
+
+
+def test_export_streams_full_history_in_chunks(client):
+    import io
+
+    feed = flask_app.data_loader.acoustic_detections
+    resp = client.get('/api/export/acoustic?format=csv')
+    assert resp.status_code == 200 and resp.is_streamed
+    assert 'attachment' in resp.headers['Content-Disposition']
+    exported = pd.read_csv(io.BytesIO(resp.data))
+    assert len(exported) == len(feed)
+    assert exported['timestamp'].tolist() == feed['timestamp'].tolist()
+
+    chunks = list(filtered_chunks(feed, {'location_id': ['raj_001']}, chunk_rows=10))
+    assert len(chunks) > 1
+    assert pd.concat(chunks).equals(feed[feed['location_id'] == 'raj_001'])
+
+    lines = client.get('/api/export/ndvi?format=ndjson&locations=raj_001&start=2025-01-01&end=2025-01-31').data.splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert rows and all(r['location_id'] == 'raj_001' and '2025-01-01' <= r['date'] <= '2025-01-31' for r in rows)
+
+    assert client.get('/api/export/gps?locations=raj_001').status_code == 400
+    assert client.get('/api/export/ndvi?start=yesterday-ish').status_code == 400
+    assert client.get('/api/export/rainfall').status_code == 404
+    # Stored timestamps and the bounds are validated before the 200 and the first byte
+    with pytest.raises(ValueError):
+        filtered_chunks(pd.DataFrame({'timestamp': ['2025-01-01', 'garbage']}), bounds=time_bounds('2025-01-01'))
+    aware = pd.DataFrame({'timestamp': pd.date_range('2025-01-01', periods=3, tz='Asia/Kolkata')})
+    with pytest.raises(ValueError):
+        export_stream(aware, 'csv', start='2025-01-02')
+    assert len(pd.concat(filtered_chunks(aware, bounds=time_bounds('2025-01-02T00:00+05:30')))) == 2
+
+
+def test_alert_export_reads_the_full_history(client, monkeypatch, tmp_path):
+    import io
+    from utils.history_store import HistoryStore
+
+    history = HistoryStore(str(tmp_path / 'history.db'), flush_interval=0.01)
+    monkeypatch.setattr(flask_app, 'history_store', history)
+    resp = client.get('/api/export/alerts?format=csv&locations=raj_001')
+    assert resp.status_code == 200
+    assert resp.data.decode().strip() == ','.join(flask_app.ALERT_COLUMNS)
+
+    # More alerts than the in-memory ring keeps; a restarted store only holds the newest 5
+    store = AlertStore(retention=5)
+    for i in range(12):
+        history.record_alert(store.add({'location_id': 'raj_001' if i % 3 else 'hr_001', 'severity': 'HIGH',
+                                        'timestamp': f'2024-06-01T00:00:{i:02d}', 'confidence': 0.9}))
+    history.record_acknowledgement('alert_4')
+    monkeypatch.setattr(flask_app, 'alert_store', AlertStore(retention=5))
+    monkeypatch.setattr(flask_app, 'CHUNK_ROWS', 4)
+
+    lines = client.get('/api/export/alerts?format=ndjson&locations=raj_001').data.decode().splitlines()
+    exported = [json.loads(line) for line in lines]
+    assert [a['seq'] for a in exported] == [i for i in range(12) if i % 3]
+    assert [a['seq'] for a in exported if a['acknowledged']] == [4]
+    resp = client.get('/api/export/alerts?format=csv&start=2024-06-01T00:00:03&end=2024-06-01T00:00:05')
+    assert pd.read_csv(io.StringIO(resp.data.decode()))['seq'].tolist() == [3, 4, 5]
+    assert client.get('/api/export/alerts?start=2024-06-01T00:00%2B05:30').status_code == 400
+
+    pq = pytest.importorskip('pyarrow.parquet')
+    table = pq.read_table(io.BytesIO(client.get('/api/export/alerts?format=parquet').data))
+    assert table.num_rows == 12 and str(table.schema.field('acknowledged').type) == 'bool'
+    history.close()
+
+
+def test_parquet_export_round_trips():
+    import io
+    pq = pytest.importorskip('pyarrow.parquet')
+    from utils.export import parquet_stream
+
+    feed = flask_app.data_loader.acoustic_detections
+    chunks = list(filtered_chunks(feed, {'location_id': ['raj_001', 'raj_002']}, chunk_rows=10))
+    parquet = pq.ParquetFile(io.BytesIO(b''.join(parquet_stream(iter(chunks), feed.iloc[:0]))))
+    assert parquet.num_row_groups == len(chunks)
+    table = parquet.read()
+    expected = pd.concat(chunks).reset_index(drop=True)
+    pd.testing.assert_frame_equal(table.to_pandas(), expected, check_dtype=False)
+
+    empty = pq.read_table(io.BytesIO(b''.join(parquet_stream(iter([]), feed.iloc[:0]))))
+    assert empty.num_rows == 0 and empty.column_names == list(feed.columns)
+
+
+def test_reference_routes_revalidate_and_compress(client, monkeypatch):
+    import gzip
+
+    first = client.get('/api/locations', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert first.headers['Cache-Control'] == 'public, max-age=300'
+    assert json.loads(gzip.decompress(first.data))['locations'] == flask_app.MONITORING_LOCATIONS
+
+    etag = first.headers['ETag']
+    assert client.get('/api/locations', headers={'If-None-Match': etag}).status_code == 304
+
+    # New data version -> new validator
+    monkeypatch.setattr(flask_app.data_loader, 'version', 'next')
+    fresh = client.get('/api/locations', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200 and fresh.headers['ETag'] != etag
+
+
+def test_cached_route_keys_on_read_args_and_stays_bounded():
+    from flask import Flask, jsonify, request
+    from utils.http_cache import cached_route
+
+    app, calls = Flask(__name__), []
+
+    @app.route('/ref')
+    @cached_route(lambda: 'v1', query_args=('region',), max_entries=2)
+    def ref():
+        calls.append(request.full_path)
+        return jsonify({'region': request.args.get('region')})
+
+    client = app.test_client()
+    # Unread parameters (cache busters) share the entry and its validator
+    etags = {client.get(f'/ref?_={i}').headers['ETag'] for i in range(50)}
+    assert len(calls) == 1 and len(etags) == 1
+    assert client.get('/ref?region=north').get_json() == {'region': 'north'}
+    assert len(calls) == 2
+
+    client.get('/ref?region=south')  # evicts the least recently used entry ('/ref')
+    client.get('/ref?region=north')
+    assert len(calls) == 3
+    client.get('/ref')
+    assert len(calls) == 4
+
+
+def test_dynamic_json_gets_weak_etag_but_streams_are_untouched(client):
+    stats = client.get('/api/stats')
+    assert stats.headers['ETag'].startswith('W/')
+    assert client.get('/api/stats', headers={'If-None-Match': stats.headers['ETag']}).status_code == 304
+
+    export = client.get('/api/export/gps', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in export.headers and 'ETag' not in export.headers
+    small = client.get('/api/location/nowhere', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+
+def test_alert_history_is_persisted_and_paged(client):
+    alert = json.loads(client.get('/api/simulate/detection').data)['alert']
+    assert client.post(f"/api/acknowledge_alert/{alert['id']}").status_code == 200
+    client.get('/api/detect_all')
+    flask_app.history_store.flush()
+
+    history = json.loads(client.get(f"/api/alerts/history?location_id={alert['location_id']}&limit=1").data)
+    assert history['alerts'][0]['id'] == alert['id'] and history['alerts'][0]['acknowledged'] is True
+    detections = json.loads(client.get('/api/detections/history?limit=5').data)
+    assert len(detections['detections']) == 5 and detections['has_more']
+    older = json.loads(client.get(f"/api/detections/history?limit=5&cursor={detections['next_cursor']}").data)
+    assert older['detections'][0]['id'] < detections['detections'][-1]['id']
+    assert client.get('/api/alerts/history?cursor=garbage').status_code == 400
+    for limit in ('0', '-1', '5000', 'ten'):
+        assert client.get(f'/api/alerts/history?limit={limit}').status_code == 400
+    assert client.get('/alerts').status_code == 200
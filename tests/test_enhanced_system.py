@@ -47,3 +47,205 @@ def test_save_load_path():
     # Cleanup
     import shutil
     shutil.rmtree(path)
+
+def test_predict_batch_matches_single_predictions(small_detector):
+    """Batch scoring returns the same results as row-by-row predict"""
+    import pandas as pd
+    from src.ml_models.fusion_model import FEATURE_ORDER
+
+    rows = [dict(zip(FEATURE_ORDER, np.random.default_rng(i).standard_normal(13))) for i in range(8)]
+    batch = small_detector.predict_batch(rows)
+    assert len(batch) == 8
+    for row, result in zip(rows, batch):
+        single = small_detector.predict(row)
+        assert result['is_mining'] == single['is_mining']
+        assert result['severity'] == single['severity']
+        assert result['equipment'] == single['equipment']
+        assert result['confidence'] == pytest.approx(single['confidence'], abs=1e-6)
+
+    # DataFrame and array inputs score identically (anomaly_score is stateful, so left out)
+    frame = pd.DataFrame(rows)[FEATURE_ORDER[::-1]]
+    model_keys = ('is_mining', 'severity', 'equipment', 'confidence')
+    from_frame = small_detector.predict_batch(frame)
+    from_array = small_detector.predict_batch(frame[FEATURE_ORDER].to_numpy())
+    assert [[r[k] for k in model_keys] for r in from_frame] == [[r[k] for k in model_keys] for r in from_array]
+
+def test_numpy_fusion_matches_keras(tmp_path):
+    """The frozen NumPy forward pass reproduces the Keras network"""
+    from src.ml_models.numpy_fusion import NumpyFusionModel
+
+    detector = EnhancedMiningDetector()
+    model = detector.build_attention_fusion(13)
+    # Non-trivial BatchNorm statistics so the folding is exercised
+    bn = [l for l in model.layers if type(l).__name__ == 'BatchNormalization'][0]
+    rng = np.random.default_rng(0)
+    bn.set_weights([rng.uniform(0.5, 2, 128), rng.normal(0, 0.5, 128), rng.normal(0, 1, 128), rng.uniform(0.5, 3, 128)])
+
+    X = rng.standard_normal((64, 13)).astype(np.float32)
+    expected = model.predict(X, verbose=0)
+    frozen = NumpyFusionModel.from_keras(model)
+    frozen.save(tmp_path / 'fusion.npz')
+    actual = NumpyFusionModel.load(tmp_path / 'fusion.npz').predict(X, verbose=0)
+    for e, a in zip(expected, actual):
+        np.testing.assert_allclose(a, e, rtol=1e-4, atol=1e-5)
+
+def test_flat_forest_is_bit_compatible_with_sklearn(small_detector, tmp_path):
+    from src.ml_models.flat_forest import FlatForest
+
+    forest = small_detector.rf_classifier
+    FlatForest.from_sklearn(forest).save(str(tmp_path / 'rf_flat'))
+    flat = FlatForest.load(str(tmp_path / 'rf_flat'))
+
+    X = np.random.default_rng(3).standard_normal((500, 13))
+    np.testing.assert_array_equal(flat.predict_proba(X), forest.predict_proba(X))
+    np.testing.assert_array_equal(flat.predict(X), forest.predict(X))
+    assert isinstance(flat.threshold, np.memmap)
+
+
+def test_saved_models_reload_on_numpy_backend(small_detector, tmp_path):
+    path = f'{tmp_path}/ensemble/'
+    small_detector.save_models(path)
+    served = EnhancedMiningDetector()
+    served.load_models(path)
+    assert type(served.rf_classifier).__name__ == 'FlatForest'
+    assert type(served.fusion_model).__name__ == 'NumpyFusionModel'
+
+    X = np.random.default_rng(4).standard_normal((16, 13))
+    for a, b in zip(served.predict_batch(X), small_detector.predict_batch(X)):
+        assert a['is_mining'] == b['is_mining']
+        assert a['confidence'] == pytest.approx(b['confidence'], abs=1e-5)
+
+
+def test_incremental_training_keeps_old_components_consistent():
+    """New scaler statistics are folded into the trees and first layer, then the forest grows"""
+    from sklearn.ensemble import RandomForestClassifier
+    from src.ml_models.fusion_model import FEATURE_ORDER
+
+    rng = np.random.default_rng(5)
+    X = rng.standard_normal((200, 13))
+    detector = EnhancedMiningDetector()
+    detector.scaler.fit(X)
+    detector.rf_classifier = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0)
+    detector.rf_classifier.fit(detector.scaler.transform(X), (X[:, 0] > 0).astype(int))
+    detector.fusion_model = detector.build_attention_fusion(13)
+    detector.temporal_model = detector.build_lstm_model((5, 13))
+    detector.is_trained = True
+
+    probe = rng.standard_normal((100, 13))
+    windows = rng.standard_normal((8, 5, 13))
+    before_rf = detector.rf_classifier.predict_proba(detector.scaler.transform(probe))
+    before_nn = detector.fusion_model.predict(detector.scaler.transform(probe).astype(np.float32), verbose=0)
+    before_lstm = detector.predict_temporal(windows)
+
+    X_new = rng.normal(1.0, 2.0, (50, 13))
+    old_mean, old_scale = detector.scaler.mean_.copy(), detector.scaler.scale_.copy()
+    detector.scaler.partial_fit(X_new)
+    detector._rescale_inputs(old_mean, old_scale)
+
+    probe_scaled = detector.scaler.transform(probe)
+    np.testing.assert_array_equal(detector.rf_classifier.predict_proba(probe_scaled), before_rf)
+    after_nn = detector.fusion_model.predict(probe_scaled.astype(np.float32), verbose=0)
+    for b, a in zip(before_nn, after_nn):
+        np.testing.assert_allclose(a, b, rtol=1e-4, atol=1e-5)
+    np.testing.assert_allclose(detector.predict_temporal(windows), before_lstm, rtol=1e-4, atol=1e-5)
+
+    new_rows = [dict(zip(FEATURE_ORDER, row), is_mining=int(row[0] > 0), severity=0, equipment_type=0)
+                for row in X_new]
+    detector.train(new_rows, incremental=True, new_trees=5, max_trees=12, epochs=1)
+    assert len(detector.rf_classifier.estimators_) == 12
+    assert detector.scaler.n_samples_seen_ == 300
+    assert detector.rf_classifier.n_jobs == 1
+
+
+def test_online_anomaly_scorer_flags_location_outliers(tmp_path):
+    from src.ml_models.online_anomaly import OnlineAnomalyScorer
+
+    rng = np.random.default_rng(6)
+    scorer = OnlineAnomalyScorer(n_features=13).fit(rng.standard_normal((500, 13)))
+    quiet = rng.normal(0, 0.1, (200, 13))
+    scorer.score_update(quiet, ['a'] * 200)
+    typical, outlier = scorer.score_update(np.array([quiet[0], quiet[0] + 3.0]), ['a', 'a'])
+    assert typical < 2
+    assert outlier > 5 * typical
+    # Another location is still judged against the population prior
+    assert scorer.score_update(quiet[:1] + 3.0, ['b'])[0] < outlier
+
+    scorer.save(tmp_path / 'anomaly.npz')
+    restored = OnlineAnomalyScorer.load(tmp_path / 'anomaly.npz')
+    assert restored.locations == ['a', 'b']
+    np.testing.assert_allclose(restored.score_update(quiet[:5], ['a'] * 5),
+                               scorer.score_update(quiet[:5], ['a'] * 5), rtol=1e-5)
+
+
+def test_served_anomaly_baselines_survive_restart_and_reload(small_detector, tmp_path):
+    import copy
+    from src.ml_models.fusion_model import FEATURE_ORDER
+    from src.ml_models.online_anomaly import OnlineAnomalyScorer
+    from src.ml_models.registry import ModelRegistry
+
+    rng = np.random.default_rng(8)
+
+    def version(scaler_rows):
+        """Forest-only detector whose scaler (and so anomaly space) differs per version"""
+        detector = EnhancedMiningDetector()
+        detector.scaler = copy.deepcopy(small_detector.scaler).fit(scaler_rows)
+        detector.rf_classifier = small_detector.rf_classifier
+        detector.anomaly_scorer.fit(detector.scaler.transform(scaler_rows))
+        detector.is_trained = True
+        return detector
+
+    serving = version(rng.standard_normal((200, 13)))
+    rows = [dict(zip(FEATURE_ORDER, r), location_id='hr_009') for r in rng.normal(2.0, 0.1, (300, 13))]
+    serving.predict_batch(rows)
+    probe = rows[:1]
+
+    state = str(tmp_path / 'anomaly_state.npz')
+    registry = ModelRegistry(str(tmp_path), state_path=state)
+    registry.install(serving, 'v1')
+    assert registry.save_state()
+    expected = OnlineAnomalyScorer.load(state).score_update(
+        serving.scaler.transform(serving.to_feature_matrix(probe)), ['hr_009'])
+
+    # A retrained version with other scaler statistics takes over the baselines on hot reload
+    retrained = version(rng.normal(0.5, 3.0, (200, 13)))
+    registry.install(retrained, 'v2')
+    assert retrained.predict_batch(probe)[0]['anomaly_score'] == pytest.approx(expected[0], rel=1e-4)
+
+    # A fresh process restores the saved baselines into whatever version it loads
+    restarted = ModelRegistry(str(tmp_path), state_path=state)
+    fresh = version(rng.normal(-1.0, 0.5, (200, 13)))
+    restarted.install(fresh, 'v3')
+    assert fresh.predict_batch(probe)[0]['anomaly_score'] == pytest.approx(expected[0], rel=1e-4)
+
+
+def test_predictions_carry_anomaly_score(small_detector):
+    from src.ml_models.fusion_model import FEATURE_ORDER
+
+    row = dict(zip(FEATURE_ORDER, np.zeros(13)), location_id='raj_001')
+    result = small_detector.predict(row)
+    assert result['anomaly_score'] >= 0
+    assert 'raj_001' in small_detector.anomaly_scorer.locations
+
+
+def test_synthetic_data_and_benchmark_regression_check():
+    import json
+    import importlib.util
+    from src.data_processing.synthetic_data import generate_synthetic_training_data
+
+    data = generate_synthetic_training_data(500, seed=1)
+    assert len(data) == 500 and 0.2 < data['is_mining'].mean() < 0.4
+    assert (data.loc[data['is_mining'] == 0, 'drilling_freq'] == 0).all()
+
+    spec = importlib.util.spec_from_file_location(
+        'benchmark_inference', os.path.join(os.path.dirname(__file__), '..', 'scripts', 'benchmark_inference.py'))
+    bench = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bench)
+    with open(bench.DEFAULT_THRESHOLDS) as f:
+        thresholds = json.load(f)['numpy']
+    results = {
+        'predict': {'p99_ms': 1.0},
+        'batch': {'1': {'p99_ms': 1.0, 'rows_per_s': 1000.0}, '4096': {'p99_ms': 5000.0, 'rows_per_s': 800.0}},
+        'worker': {'cold_load_s': 1.0, 'rss_mb': 100.0}
+    }
+    failures = bench.check_thresholds(results, thresholds)
+    assert len(failures) == 2 and all('4096' in f for f in failures)
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_processing.feature_builder import build_fusion_features, label_from_locations
+from src.ml_models.fusion_model import EnhancedMiningDetector, FEATURE_ORDER
+
+
+def _frames(seed=0):
+    rng = np.random.default_rng(seed)
+    ndvi = pd.DataFrame([
+        {'location_id': loc, 'date': d.strftime('%Y-%m-%d'), 'ndvi_value': 0.5 - 0.002 * i + rng.normal(0, 0.02)}
+        for loc in ('a', 'b') for i, d in enumerate(pd.date_range('2025-01-01', periods=40, freq='5D'))
+    ])
+    light = pd.DataFrame([
+        {'location_id': loc, 'date': d.strftime('%Y-%m-%d'), 'intensity': rng.uniform(0, 30)}
+        for loc in ('a', 'b') for d in pd.date_range('2025-01-01', periods=60, freq='3D')
+    ])
+    acoustic = pd.DataFrame([
+        {'location_id': 'a', 'timestamp': (pd.Timestamp('2025-02-01') + pd.Timedelta(hours=int(h))).strftime('%Y-%m-%d %H:%M:%S'),
+         'detection_type': kind, 'confidence': rng.uniform(0.6, 0.99), 'frequency_hz': rng.uniform(50, 2000)}
+        for h, kind in zip(rng.integers(0, 24 * 90, 50), rng.choice(['drill', 'excavator', 'truck'], 50))
+    ])
+    return ndvi, light, acoustic
+
+
+def test_features_match_a_per_location_window_loop():
+    ndvi, light, acoustic = _frames()
+    table = build_fusion_features(ndvi, light, acoustic, locations=['a', 'b'], window_days=30)
+    assert table.values.dtype == np.float32
+    assert table.values.shape == (2, len(table.dates), len(FEATURE_ORDER))
+
+    for loc in ('a', 'b'):
+        for day in (pd.Timestamp('2025-03-15'), table.dates[-1]):
+            lo = day - pd.Timedelta(days=30)
+            n = ndvi[(ndvi.location_id == loc) & (pd.to_datetime(ndvi.date) > lo) & (pd.to_datetime(ndvi.date) <= day)]
+            t = (pd.to_datetime(n.date) - table.dates[0]).dt.days.to_numpy()
+            l = light[(light.location_id == loc) & (pd.to_datetime(light.date) > lo) & (pd.to_datetime(light.date) <= day)]
+            stamps = pd.to_datetime(acoustic.timestamp).dt.normalize()
+            a = acoustic[(acoustic.location_id == loc) & (stamps > lo) & (stamps <= day)]
+            drills = a[a.detection_type == 'drill']
+
+            row = dict(zip(FEATURE_ORDER, table.values[table.locations.index(loc), table.dates.get_loc(day)]))
+            assert row['ndvi_mean'] == pytest.approx(n.ndvi_value.mean(), abs=1e-5)
+            assert row['ndvi_trend'] == pytest.approx(np.polyfit(t, n.ndvi_value, 1)[0] * 30, abs=1e-5)
+            assert row['ndvi_volatility'] == pytest.approx(n.ndvi_value.std(), abs=1e-5)
+            assert row['nightlight_peak'] == pytest.approx(l.intensity.max(), abs=1e-4)
+            assert row['acoustic_activity'] == len(a)
+            assert row['drilling_freq'] == pytest.approx(drills.frequency_hz.mean() if len(drills) else 0, abs=1e-2)
+            assert row['max_confidence'] == pytest.approx(a.confidence.max() if len(a) else 0, abs=1e-6)
+
+
+def test_feature_table_feeds_training_data():
+    ndvi, light, acoustic = _frames()
+    table = build_fusion_features(ndvi, light, acoustic, locations=['a', 'b'])
+    locations = [{'id': 'a', 'mining_activity': 'active', 'risk_level': 'high'},
+                 {'id': 'b', 'mining_activity': 'none', 'risk_level': 'low'}]
+    frame = label_from_locations(table.to_frame(), locations)
+
+    X, y_anom, y_sev, y_equ = EnhancedMiningDetector().prepare_training_data(frame)
+    np.testing.assert_array_equal(X, table.matrix())
+    assert X.dtype == np.float32
+    assert y_anom.sum() == len(table.dates)
+    assert y_sev.shape == (len(frame), 3) and y_equ.shape == (len(frame), 5)
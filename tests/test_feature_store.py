@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from src.data_processing.feature_store import AcousticFeatureStore
+
+
+def _fill(store, n=2000, dim=13, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    stamps = [1_767_225_600_000 + i * 10_000 for i in range(n)]
+    store.append_many('raj_001', vectors, stamps)
+    return vectors, stamps
+
+
+def test_append_is_memory_mapped_and_time_indexed(tmp_path):
+    store = AcousticFeatureStore(str(tmp_path))
+    vectors, stamps = _fill(store)
+    store.append('raj_001', np.ones(13), stamps[-1] + 10_000)
+
+    reopened = AcousticFeatureStore(str(tmp_path))
+    stored = reopened.vectors('raj_001')
+    assert isinstance(stored, np.memmap)
+    assert stored.shape == (2001, 13)
+    np.testing.assert_array_equal(stored[:2000], vectors)
+
+    rows = reopened.rows_between('raj_001', stamps[100], stamps[199])
+    assert rows[0] == 100 and rows[-1] == 199
+
+
+def test_brute_force_and_ivf_search_find_the_same_neighbour(tmp_path):
+    store = AcousticFeatureStore(str(tmp_path), search_chunk_rows=256)
+    vectors, _ = _fill(store)
+    query = vectors[1234] + 0.001
+
+    brute = store.search('raj_001', query, k=5)
+    assert brute[0]['index'] == 1234
+
+    store.build_ivf('raj_001', n_lists=16)
+    # Rows appended after the build are assigned to lists too
+    store.append('raj_001', vectors[1234], None)
+    ivf = store.search('raj_001', query, k=2, nprobe=4)
+    assert {m['index'] for m in ivf} == {1234, 2000}
+
+
+def test_sensor_id_and_kind_cannot_escape_the_root(tmp_path):
+    store = AcousticFeatureStore(str(tmp_path / 'store'))
+    for sensor_id, kind in (('../outside', 'mfcc'), ('raj/001', 'mfcc'), ('raj_001', '../../x'), ('raj_001', 'other')):
+        with pytest.raises(ValueError):
+            store.append(sensor_id, np.zeros(13), kind=kind)
+    assert not (tmp_path / 'outside').exists()
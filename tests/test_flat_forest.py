@@ -0,0 +1,25 @@
+import numpy as np
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+
+from src.ml_models.flat_forest import FlatForest
+
+
+def test_flat_forest_matches_predict_proba_with_bootstrap_and_weights(tmp_path):
+    # scikit-learn < 1.4 (the pinned 1.3.0) keeps weighted counts in tree_.value,
+    # later versions class fractions; the exported forest must match either way
+    rng = np.random.default_rng(5)
+    X = rng.standard_normal((400, 6))
+    y = (X[:, 0] + 0.5 * X[:, 3] > 0).astype(int)
+    weights = rng.uniform(0.5, 3.0, len(X))
+    forest = RandomForestClassifier(n_estimators=15, max_depth=5, random_state=0)
+    forest.fit(X, y, sample_weight=weights)
+
+    FlatForest.from_sklearn(forest).save(str(tmp_path / 'rf_flat'))
+    flat = FlatForest.load(str(tmp_path / 'rf_flat'))
+    X_test = rng.standard_normal((200, 6))
+    proba = flat.predict_proba(X_test)
+    np.testing.assert_allclose(proba, forest.predict_proba(X_test), rtol=0, atol=1e-12,
+                               err_msg=f"scikit-learn {sklearn.__version__}")
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0)
+    np.testing.assert_array_equal(flat.predict(X_test), forest.predict(X_test))
@@ -0,0 +1,71 @@
+import logging
+
+import pytest
+
+from utils.alert_store import AlertStore
+from utils.history_store import HistoryStore
+
+
+def _alert(i, location='raj_001', severity='HIGH'):
+    return {'id': f'alert_{i}', 'location_id': location, 'severity': severity,
+            'timestamp': f'2024-06-01T00:{i // 60:02d}:{i % 60:02d}', 'confidence': 0.9}
+
+
+def test_history_pages_by_index_and_survives_restart(tmp_path):
+    path = str(tmp_path / 'history.db')
+    history = HistoryStore(path, batch_size=64, flush_interval=0.01)
+    store = AlertStore(retention=10)
+    for i in range(200):
+        alert = store.add(_alert(i, location='raj_001' if i % 4 else 'hr_001', severity='CRITICAL' if i % 10 == 0 else 'HIGH'))
+        history.record_alert(alert)
+    history.record_acknowledgement('alert_199')
+    history.record_detection({'timestamp': '2024-06-01T01:00:00', 'location_id': 'raj_001',
+                              'severity': 'HIGH', 'alert_count': 2, 'overall_confidence': 0.8, 'alerts': []})
+    history.flush()
+    assert history.written == 202
+    history.close()
+
+    history = HistoryStore(path)
+    assert history._reader().execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    seqs, cursor = [], None
+    while True:
+        page, cursor, has_more = history.alerts(limit=7, cursor=cursor, location_id='hr_001')
+        seqs += [a['seq'] for a in page]
+        if not has_more:
+            break
+    assert seqs == list(range(196, -1, -4))
+    critical, _, _ = history.alerts(limit=100, severity='CRITICAL', start='2024-06-01T00:01:00')
+    assert [a['seq'] for a in critical] == list(range(190, 50, -10))
+    acked, _, _ = history.alerts(acknowledged=True)
+    assert [a['id'] for a in acked] == ['alert_199'] and acked[0]['acknowledged_at']
+    detections, _, _ = history.detections(location_id='raj_001')
+    assert detections[0]['alert_count'] == 2
+
+    # A restarted process resumes the sequence where the history left off
+    restored = AlertStore(retention=10)
+    restored.restore(history.latest_alerts(10))
+    assert [a['seq'] for a in restored.recent()] == list(range(190, 200))
+    assert restored.get('alert_199')['acknowledged'] is True
+    assert restored.add(_alert(200))['seq'] == 200
+    history.close()
+
+
+def test_conflicting_alerts_are_rejected_not_replaced(tmp_path, caplog):
+    history = HistoryStore(str(tmp_path / 'history.db'), flush_interval=0.01)
+    original = {**_alert(0), 'seq': 0}
+    history.record_alert(original)
+    history.flush()
+    with caplog.at_level(logging.ERROR, logger='utils.history_store'):
+        # Same seq under a new id, and the same id under a new seq, share a batch with a valid alert
+        history.record_alert({**_alert(1), 'seq': 0, 'message': 'clobber'})
+        history.record_alert({**_alert(0), 'seq': 5})
+        history.record_alert({**_alert(2), 'seq': 2})
+        history.flush()
+    assert history.failed == 2 and 'rejected alert' in caplog.text
+    stored, _, _ = history.alerts()
+    assert [(a['seq'], a['id']) for a in stored] == [(2, 'alert_2'), (0, 'alert_0')]
+    assert 'message' not in stored[1]
+    with pytest.raises(ValueError):
+        history.alerts(limit=0)
+    history.close()
+
@@ -0,0 +1,52 @@
+import copy
+import numpy as np
+import pytest
+
+from src.data_processing.sequences import SequenceDataset, location_windows, latest_windows
+
+
+def _cube(n_locations=3, n_days=50, n_features=13, seed=0):
+    return np.random.default_rng(seed).standard_normal((n_locations, n_days, n_features)).astype(np.float32)
+
+
+def test_windows_are_views_over_the_feature_cube():
+    values = _cube()
+    windows = location_windows(values, window=30)
+    assert windows.shape == (3, 21, 30, 13)
+    assert np.shares_memory(windows, values)
+    np.testing.assert_array_equal(windows[1, 7], values[1, 7:37])
+    latest = latest_windows(values, 30)
+    assert np.shares_memory(latest, values)
+    np.testing.assert_array_equal(latest, windows[:, -1])
+    # Too few days for one window is an error, not a short window handed to the LSTM
+    for short in (location_windows, latest_windows):
+        with pytest.raises(ValueError):
+            short(values[:, :20], 30)
+
+
+def test_batches_cover_every_window_once_with_end_day_labels():
+    values = _cube()
+    labels = np.arange(3 * 50).reshape(3, 50)
+    dataset = SequenceDataset(values, labels=labels, window=30)
+    assert len(dataset) == 3 * 21
+
+    seen = []
+    for X, y in dataset.batches(batch_size=16, seed=1):
+        assert X.flags['C_CONTIGUOUS'] and X.shape[1:] == (30, 13)
+        for window, label in zip(X, y):
+            loc, end_day = divmod(int(label), 50)
+            np.testing.assert_array_equal(window, values[loc, end_day - 29:end_day + 1])
+            seen.append(int(label))
+    assert sorted(seen) == sorted(labels[:, 29:].ravel().tolist())
+
+
+def test_temporal_model_trains_and_scores_latest_windows(small_detector):
+    detector = copy.copy(small_detector)
+    values = _cube(n_days=40)
+    labels = (values[:, :, 0] > 0).astype(int)
+    dataset = SequenceDataset(values, labels=labels, window=30, stride=5)
+    detector.train_temporal(dataset, epochs=1, batch_size=8)
+
+    scores = detector.predict_temporal(dataset.latest())
+    assert scores.shape == (3,)
+    assert np.all((scores >= 0) & (scores <= 1))
@@ -0,0 +1,50 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['tensorflow', 'keras', 'ee', 'librosa', 'noisereduce', 'rasterio', 'geopandas', 'sentinelhub']
+
+# Cold import of the API took ~11 s with eager imports and ~2 s after deferring them
+IMPORT_BUDGET_S = float(os.environ.get('AURALITE_IMPORT_BUDGET_S', 6))
+
+
+def _run(code, **env):
+    out = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, 'PYTHONPATH': ROOT, **env}, timeout=300
+    )
+    assert out.returncode == 0, out.stderr
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_api_cold_import_is_fast_and_light():
+    result = _run(
+        "import sys, time, json\n"
+        "t = time.perf_counter()\n"
+        "import src.api.main\n"
+        "elapsed = time.perf_counter() - t\n"
+        f"print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))"
+    )
+    assert result['loaded'] == []
+    assert result['seconds'] < IMPORT_BUDGET_S
+
+
+@pytest.mark.parametrize('backend', ['numpy', 'rf'])
+def test_serving_backends_never_import_tensorflow(small_detector, tmp_path, backend):
+    path = f'{tmp_path}/ensemble/'
+    small_detector.save_models(path)
+    result = _run(
+        "import sys, json\n"
+        "from src.ml_models.fusion_model import EnhancedMiningDetector\n"
+        "d = EnhancedMiningDetector()\n"
+        f"d.load_models({path!r}, backend={backend!r})\n"
+        "r = d.predict({'ndvi_mean': 0.2, 'acoustic_activity': 6})\n"
+        "print(json.dumps({'result': r, 'tf': 'tensorflow' in sys.modules}))"
+    )
+    assert result['tf'] is False
+    assert set(result['result']) == {'is_mining', 'severity', 'equipment', 'confidence', 'anomaly_score'}
+    if backend == 'rf':
+        assert result['result']['equipment'] is None
@@ -0,0 +1,204 @@
+"""
+Bounded, indexed, thread-safe in-memory alert store.
+Alerts live in a fixed-size ring addressed by sequence number; an id index
+and secondary indexes by location, severity and acknowledged state make
+lookups, acknowledgements and filtered queries independent of history size.
+The oldest alert is evicted once the ring is full. Alert ids are derived
+from the sequence number, and readers get shallow copies, so a returned
+alert never changes under a caller that is serializing it.
+"""
+
+import threading
+from datetime import datetime
+
+from utils.pagination import encode_cursor, page_items, resolve_position
+
+
+class AlertStore:
+    """Alerts keyed by id with monotonic 'seq' numbers; keeps the newest `retention`"""
+
+    def __init__(self, retention=10000):
+        if retention < 1:
+            raise ValueError("retention must be at least 1")
+        self.retention = retention
+        self._ring = [None] * retention
+        self._next_seq = 0
+        self._first_seq = 0
+        self._by_id = {}
+        # Ordered sets (dict keys) of alert ids, oldest first
+        self._by_location = {}
+        self._by_severity = {}
+        self._by_acknowledged = {False: {}, True: {}}
+        # alert id -> acknowledgement number, in acknowledgement order (for pollers)
+        self._acks = {}
+        self._ack_seq = 0
+        self._lock = threading.RLock()
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, alert_id):
+        return alert_id in self._by_id
+
+    @property
+    def last_seq(self):
+        return self._next_seq - 1
+
+    def _index(self, alert):
+        alert_id = alert['id']
+        self._by_location.setdefault(alert.get('location_id'), {})[alert_id] = None
+        self._by_severity.setdefault(alert.get('severity'), {})[alert_id] = None
+        self._by_acknowledged[bool(alert.get('acknowledged'))][alert_id] = None
+
+    def _unindex(self, alert):
+        alert_id = alert['id']
+        for index, key in ((self._by_location, alert.get('location_id')), (self._by_severity, alert.get('severity'))):
+            ids = index.get(key)
+            if ids is not None:
+                ids.pop(alert_id, None)
+                if not ids:
+                    del index[key]
+        self._by_acknowledged[bool(alert.get('acknowledged'))].pop(alert_id, None)
+        self._acks.pop(alert_id, None)
+
+    def _insert(self, alert, seq):
+        if alert['id'] in self._by_id:
+            raise ValueError(f"Duplicate alert id: {alert['id']}")
+        if not self._by_id:
+            self._first_seq = seq
+        slot = seq % self.retention
+        oldest = self._ring[slot]
+        if oldest is not None:
+            # The slot holds an alert at least `retention` sequence numbers older
+            self._unindex(oldest)
+            del self._by_id[oldest['id']]
+            self.evicted += 1
+        self._first_seq = max(self._first_seq, seq - self.retention + 1)
+        alert['seq'] = seq
+        self._ring[slot] = alert
+        self._by_id[alert['id']] = alert
+        self._index(alert)
+        self._next_seq = seq + 1
+        return alert
+
+    def add(self, alert, prefix='alert'):
+        """Store a copy of `alert` under the next 'seq' and the id '<prefix>_<seq>'; returns that copy"""
+        with self._lock:
+            seq = self._next_seq
+            return dict(self._insert({**alert, 'id': f'{prefix}_{seq}'}, seq))
+
+    def restore(self, alerts):
+        """Reload persisted alerts (oldest first) keeping their 'seq'; new alerts continue after them"""
+        with self._lock:
+            for alert in alerts:
+                if alert['seq'] < self._next_seq:
+                    raise ValueError("Restored alerts must follow the store's current sequence")
+                self._insert(dict(alert), alert['seq'])
+
+    def get(self, alert_id):
+        with self._lock:
+            alert = self._by_id.get(alert_id)
+            return None if alert is None else dict(alert)
+
+    def acknowledge(self, alert_id):
+        """Mark an alert acknowledged; returns it, or None if unknown (or already evicted)"""
+        with self._lock:
+            alert = self._by_id.get(alert_id)
+            if alert is None:
+                return None
+            if not alert.get('acknowledged'):
+                self._by_acknowledged[False].pop(alert_id, None)
+                alert['acknowledged'] = True
+                alert['acknowledged_at'] = datetime.now().isoformat()
+                self._by_acknowledged[True][alert_id] = None
+                self._ack_seq += 1
+                self._acks[alert_id] = self._ack_seq
+            return dict(alert)
+
+    def acknowledged_after(self, ack_seq):
+        """(ids acknowledged after acknowledgement number ack_seq, latest number); O(changes)"""
+        with self._lock:
+            ids = []
+            for alert_id, seq in reversed(self._acks.items()):
+                if seq <= ack_seq:
+                    break
+                ids.append(alert_id)
+            return ids[::-1], self._ack_seq
+
+    def _range(self, start_seq, stop_seq):
+        start_seq = max(start_seq, self._first_seq)
+        stop_seq = min(stop_seq, self._next_seq)
+        alerts = (self._ring[seq % self.retention] for seq in range(start_seq, stop_seq))
+        # Restored history may have gaps, leaving empty or stale slots
+        return [dict(a) for a in alerts if a is not None and start_seq <= a['seq'] < stop_seq]
+
+    def recent(self, limit=None):
+        """Newest `limit` alerts (all retained when None), oldest first"""
+        with self._lock:
+            start = self._first_seq if limit is None else self._next_seq - limit
+            return self._range(start, self._next_seq)
+
+    def after(self, seq, limit):
+        """Up to `limit` alerts with seq > `seq`, oldest first, and whether more follow"""
+        with self._lock:
+            # A cursor older than the ring resumes at the oldest retained alert
+            start = max(seq + 1, self._first_seq)
+            page = self._range(start, start + limit)
+            has_more = bool(page) and page[-1]['seq'] < self.last_seq
+            return page, has_more
+
+    def query(self, location_id=None, severity=None, acknowledged=None, limit=50):
+        """Newest `limit` alerts matching every given filter, oldest first"""
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        with self._lock:
+            candidates = []
+            if location_id is not None:
+                candidates.append(self._by_location.get(location_id, {}))
+            if severity is not None:
+                candidates.append(self._by_severity.get(severity, {}))
+            if acknowledged is not None:
+                candidates.append(self._by_acknowledged[bool(acknowledged)])
+            if not candidates:
+                return self.recent(limit)
+            # Walk the smallest index newest-first and check the others by membership
+            candidates.sort(key=len)
+            smallest, others = candidates[0], candidates[1:]
+            matched = []
+            for alert_id in reversed(smallest):
+                if all(alert_id in other for other in others):
+                    matched.append(dict(self._by_id[alert_id]))
+                    if len(matched) == limit:
+                        break
+            return matched[::-1]
+
+    def counts(self):
+        with self._lock:
+            return {
+                'total': len(self._by_id),
+                'unacknowledged': len(self._by_acknowledged[False]),
+                'by_severity': {severity: len(ids) for severity, ids in self._by_severity.items()},
+                'evicted': self.evicted
+            }
+
+    def page(self, limit, cursor=None, since=None, time_key='timestamp'):
+        """(alerts, next_cursor, has_more) with the semantics of pagination.page_items"""
+        if limit < 1:
+            raise ValueError(f"Invalid limit: {limit} (must be a positive integer)")
+        after, after_time = resolve_position(cursor, since)
+        if after_time is not None:
+            # Time filters are rare (the dashboard polls by cursor): scan the ring
+            return page_items(self.recent(), limit, cursor, since, time_key)
+        with self._lock:
+            if after is None:
+                alerts, has_more = self.recent(limit), False
+            else:
+                alerts, has_more = self.after(after, limit)
+            if alerts:
+                last = alerts[-1]['seq']
+            elif after is not None:
+                last = after
+            else:
+                last = self.last_seq
+            return alerts, encode_cursor(last), has_more
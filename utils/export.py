@@ -0,0 +1,172 @@
+"""
+Streaming exports of feed frames as CSV, NDJSON or Parquet.
+Frames are walked in fixed-size row chunks and each chunk is filtered and
+encoded on its own, so memory stays flat however much history is exported.
+Sources that are not frames (e.g. the SQLite alert history) hand their own
+chunks to encode_stream.
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from utils.serialization import dumps, frame_to_records
+
+CHUNK_ROWS = 5000
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def time_bounds(start=None, end=None):
+    """Inclusive (start, end) Timestamps; a bare end date covers that whole day"""
+    lo = pd.Timestamp(start) if start else None
+    hi = None
+    if end:
+        hi = pd.Timestamp(end)
+        if len(str(end)) <= 10:
+            hi += pd.Timedelta(days=1) - pd.Timedelta(1, unit='ns')
+    return lo, hi
+
+
+def parse_timestamps(column, bounds=(None, None)):
+    """
+    The whole time column as datetimes, checked against the bounds up front:
+    bad stored values or a tz-aware/naive mismatch raise ValueError before any
+    bytes of the export are sent.
+    """
+    try:
+        # ISO8601 accepts mixed precision (datetime.isoformat() drops zero microseconds)
+        stamps = pd.to_datetime(column, format='ISO8601')
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Unreadable timestamps in '{column.name}': {str(e).splitlines()[0]}")
+    aware = getattr(stamps.dt, 'tz', None) is not None
+    for bound in bounds:
+        if bound is not None and (bound.tzinfo is not None) != aware:
+            kind = 'timezone-aware' if aware else 'naive'
+            raise ValueError(f"'{column.name}' holds {kind} timestamps; give start/end the same way")
+    return stamps
+
+
+def filtered_chunks(frame, filters=None, bounds=(None, None), time_col='timestamp', chunk_rows=CHUNK_ROWS):
+    """Iterator over the rows matching {column: allowed values} and the (lo, hi) time bounds, chunk by chunk"""
+    lo, hi = bounds
+    stamps = None
+    if lo is not None or hi is not None:
+        stamps = parse_timestamps(frame[time_col], bounds)
+        if stamps.dt.tz is not None:
+            # Compare aware values as naive UTC so each chunk is a plain datetime64 comparison
+            stamps = stamps.dt.tz_convert('UTC').dt.tz_localize(None)
+            lo, hi = (None if b is None else b.tz_convert('UTC').tz_localize(None) for b in (lo, hi))
+        stamps = stamps.to_numpy()
+    return _chunks(frame, filters or {}, lo, hi, stamps, chunk_rows)
+
+
+def _chunks(frame, filters, lo, hi, stamps, chunk_rows):
+    for offset in range(0, len(frame), chunk_rows):
+        chunk = frame.iloc[offset:offset + chunk_rows]
+        keep = np.ones(len(chunk), dtype=bool)
+        for column, values in filters.items():
+            keep &= chunk[column].isin(values).to_numpy()
+        if stamps is not None:
+            window = stamps[offset:offset + chunk_rows]
+            if lo is not None:
+                keep &= window >= lo.to_datetime64()
+            if hi is not None:
+                keep &= window <= hi.to_datetime64()
+        if keep.any():
+            yield chunk[keep]
+
+
+def csv_stream(chunks, columns):
+    yield (','.join(map(str, columns)) + '\n').encode()
+    for chunk in chunks:
+        yield chunk.to_csv(header=False, index=False).encode()
+
+
+def ndjson_stream(chunks):
+    for chunk in chunks:
+        yield b''.join(dumps(record) + b'\n' for record in frame_to_records(chunk))
+
+
+class _DrainableSink:
+    """Write-only file object whose buffered bytes are handed out after each row group"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+
+def parquet_stream(chunks, template, column_types=None):
+    """
+    One Parquet row group per chunk. The schema comes from column_types
+    ({column: pyarrow type alias}) when given, else the first chunk (object
+    columns of an empty frame would infer as null), else the template.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if column_types:
+        schema = pa.schema([(column, pa.type_for_alias(alias)) for column, alias in column_types.items()])
+    else:
+        schema = pa.Schema.from_pandas(template if first is None else first, preserve_index=False)
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in itertools.chain([] if first is None else [first], chunks):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def encode_stream(chunks, fmt, template, column_types=None):
+    """Byte-chunk generator for frame chunks shaped like `template` (an empty frame with the columns)"""
+    if fmt == 'csv':
+        return csv_stream(chunks, template.columns)
+    if fmt == 'ndjson':
+        return ndjson_stream(chunks)
+    if fmt == 'parquet':
+        return parquet_stream(chunks, template, column_types)
+    raise ValueError(f"Unknown export format '{fmt}'")
+
+
+def export_stream(frame, fmt, filters=None, start=None, end=None, time_col='timestamp'):
+    """Byte-chunk generator; bad formats, dates or stored timestamps raise ValueError here, before anything is sent"""
+    chunks = filtered_chunks(frame, filters, time_bounds(start, end), time_col)
+    return encode_stream(chunks, fmt, frame.iloc[:0])
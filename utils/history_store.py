@@ -0,0 +1,288 @@
+"""
+Durable alert and detection history in SQLite (WAL mode).
+Request threads only enqueue writes; one background writer commits them in
+batches, so a burst of alerts costs one transaction instead of one fsync
+each. Readers use their own connections and, under WAL, never wait on the
+writer. Queries page newest-first by keyset over indexed columns, so their
+cost does not grow with the size of the table. Alerts are only ever
+inserted: a repeated seq or id is rejected and logged, never overwritten.
+"""
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+
+from utils.pagination import decode_cursor, encode_cursor
+from utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    row_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    seq INTEGER NOT NULL UNIQUE,
+    id TEXT NOT NULL UNIQUE,
+    location_id TEXT,
+    severity TEXT,
+    timestamp TEXT NOT NULL,
+    acknowledged INTEGER NOT NULL DEFAULT 0,
+    acknowledged_at TEXT,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_location_time ON alerts (location_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_severity_time ON alerts (severity, timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_time ON alerts (timestamp);
+
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    location_id TEXT,
+    severity TEXT,
+    timestamp TEXT NOT NULL,
+    alert_count INTEGER,
+    overall_confidence REAL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_detections_location_time ON detections (location_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_detections_severity_time ON detections (severity, timestamp);
+CREATE INDEX IF NOT EXISTS idx_detections_time ON detections (timestamp);
+"""
+
+# table -> (key column, filterable columns)
+TABLES = {
+    'alerts': ('seq', ('location_id', 'severity', 'acknowledged')),
+    'detections': ('id', ('location_id', 'severity'))
+}
+
+
+class HistoryStore:
+    """Append-mostly alert/detection history with a batching writer thread"""
+
+    def __init__(self, path, batch_size=500, flush_interval=0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._closed = False
+        self.written = 0
+        self.failed = 0
+
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        conn.commit()
+        conn.close()
+        self._writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # WAL is durable across application crashes with NORMAL; only power loss can drop the last commits
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # ---------- writes (queued) ----------
+
+    def record_alert(self, alert):
+        """Queue an alert that already carries its 'seq' (see AlertStore.add)"""
+        self._queue.put(('alert', (
+            alert['seq'], alert['id'], alert.get('location_id'), alert.get('severity'),
+            alert['timestamp'], int(bool(alert.get('acknowledged'))), alert.get('acknowledged_at'),
+            dumps(alert).decode()
+        )))
+
+    def record_acknowledgement(self, alert_id, acknowledged_at=None):
+        self._queue.put(('ack', (acknowledged_at or datetime.now().isoformat(), alert_id)))
+
+    def record_detection(self, result):
+        """Queue one detect_from_all_sources result"""
+        self._queue.put(('detection', (
+            result.get('location_id'), result.get('severity'), result['timestamp'],
+            result.get('alert_count'), result.get('overall_confidence'), dumps(result).decode()
+        )))
+
+    ALERT_INSERT = ('INSERT INTO alerts (seq, id, location_id, severity, timestamp, '
+                    'acknowledged, acknowledged_at, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
+
+    def _write_batch(self, conn, batch):
+        alerts = [row for kind, row in batch if kind == 'alert']
+        detections = [row for kind, row in batch if kind == 'detection']
+        acks = [row for kind, row in batch if kind == 'ack']
+        with conn:
+            if alerts:
+                conn.executemany(self.ALERT_INSERT, alerts)
+            if detections:
+                conn.executemany(
+                    'INSERT INTO detections (location_id, severity, timestamp, alert_count, '
+                    'overall_confidence, payload) VALUES (?, ?, ?, ?, ?, ?)', detections)
+            # Acks go last: an alert and its acknowledgement may share a batch
+            if acks:
+                conn.executemany(
+                    'UPDATE alerts SET acknowledged = 1, acknowledged_at = ? WHERE id = ?', acks)
+        self.written += len(batch)
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval if len(batch) == 1 else 0)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._write_batch(conn, batch)
+            except sqlite3.Error:
+                logger.exception("History batch of %d records failed; retrying one by one", len(batch))
+                self._write_each(conn, batch)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                break
+        conn.close()
+
+    def _write_each(self, conn, batch):
+        """Commit what can be committed of a failed batch; log each record that still fails"""
+        for item in batch:
+            try:
+                self._write_batch(conn, [item])
+            except sqlite3.Error as e:
+                self.failed += 1
+                logger.error("History write rejected %s %r: %s", item[0], item[1][:2], e)
+
+    def flush(self):
+        """Block until everything queued so far is committed"""
+        self._queue.join()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._writer.join()
+
+    # ---------- reads ----------
+
+    def _page(self, table, limit, cursor=None, filters=None, start=None, end=None):
+        """Newest-first page by (timestamp, key) keyset; next_cursor resumes with older rows"""
+        key, filterable = TABLES[table]
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        clauses, params = [], []
+        for column, value in (filters or {}).items():
+            if column not in filterable:
+                raise ValueError(f"Cannot filter {table} by '{column}'")
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(int(value) if column == 'acknowledged' else value)
+        if start:
+            clauses.append('timestamp >= ?')
+            params.append(start)
+        if end:
+            clauses.append('timestamp <= ?')
+            params.append(end)
+        conn = self._reader()
+        if cursor:
+            after = decode_cursor(cursor)
+            last = conn.execute(f'SELECT timestamp FROM {table} WHERE {key} = ?', (after,)).fetchone()
+            if last is None:
+                raise ValueError(f"Invalid cursor: {cursor}")
+            clauses.append(f'(timestamp, {key}) < (?, ?)')
+            params.extend([last['timestamp'], after])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = conn.execute(
+            f'SELECT {key}, payload, {"acknowledged, acknowledged_at" if table == "alerts" else "NULL AS acknowledged, NULL AS acknowledged_at"} '
+            f'FROM {table} {where} ORDER BY timestamp DESC, {key} DESC LIMIT ?',
+            (*params, limit + 1)
+        ).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        items = []
+        for row in rows:
+            if table == 'alerts':
+                item = self._alert_from_row(row)
+            else:
+                item = json.loads(row['payload'])
+                item['id'] = row[key]
+            items.append(item)
+        next_cursor = encode_cursor(rows[-1][key]) if has_more else None
+        return items, next_cursor, has_more
+
+    @staticmethod
+    def _alert_from_row(row):
+        """The payload is the alert as first stored; acknowledgement lives in its columns"""
+        alert = json.loads(row['payload'])
+        alert['acknowledged'] = bool(row['acknowledged'])
+        if row['acknowledged_at']:
+            alert['acknowledged_at'] = row['acknowledged_at']
+        return alert
+
+    def alerts(self, limit=50, cursor=None, location_id=None, severity=None, acknowledged=None, start=None, end=None):
+        """(alerts, next_cursor, has_more), newest first"""
+        filters = {'location_id': location_id, 'severity': severity, 'acknowledged': acknowledged}
+        return self._page('alerts', limit, cursor, filters, start, end)
+
+    def detections(self, limit=50, cursor=None, location_id=None, severity=None, start=None, end=None):
+        """(detection results, next_cursor, has_more), newest first"""
+        return self._page('detections', limit, cursor, {'location_id': location_id, 'severity': severity}, start, end)
+
+    def iter_alerts(self, location_ids=None, start=None, end=None, page_size=5000):
+        """
+        Every matching alert, oldest first, in lists of up to `page_size`.
+        Walks the seq index in keyset pages, so memory stays at one page however
+        long the history is (used by exports).
+        """
+        clauses, params = [], []
+        if location_ids:
+            clauses.append(f"location_id IN ({', '.join('?' * len(location_ids))})")
+            params.extend(location_ids)
+        if start:
+            clauses.append('timestamp >= ?')
+            params.append(start)
+        if end:
+            clauses.append('timestamp <= ?')
+            params.append(end)
+        conn = self._reader()
+        last = -1
+        while True:
+            rows = conn.execute(
+                f"SELECT seq, payload, acknowledged, acknowledged_at FROM alerts "
+                f"WHERE {' AND '.join(['seq > ?', *clauses])} ORDER BY seq LIMIT ?",
+                (last, *params, page_size)
+            ).fetchall()
+            if not rows:
+                return
+            yield [self._alert_from_row(row) for row in rows]
+            last = rows[-1]['seq']
+
+    def get_alert(self, alert_id):
+        row = self._reader().execute('SELECT seq FROM alerts WHERE id = ?', (alert_id,)).fetchone()
+        return None if row is None else dict(row)
+
+    def latest_alerts(self, limit):
+        """The newest `limit` alerts in seq order (oldest first), to warm the in-memory store"""
+        rows = self._reader().execute(
+            'SELECT payload, acknowledged, acknowledged_at FROM alerts ORDER BY seq DESC LIMIT ?', (limit,)
+        ).fetchall()
+        return [self._alert_from_row(row) for row in reversed(rows)]
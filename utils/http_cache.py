@@ -0,0 +1,136 @@
+"""
+HTTP caching and compression for the Flask API.
+Reference-data routes are rendered once per data version and served with an
+ETag derived from that version, so a matching If-None-Match is answered with
+304 before the view runs. Other JSON GETs get a weak ETag from their body.
+Large JSON responses are gzip (or brotli, when installed) compressed.
+"""
+
+import gzip
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/css', 'text/csv', 'application/javascript')
+
+
+def accepted_encoding(header):
+    """'br' or 'gzip' from an Accept-Encoding header (q=0 excluded), or None"""
+    accepted = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0 or accepted.get('*', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def _set_encoded(response, body, encoding):
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+
+
+def cached_route(version, max_age=300, policy='public', query_args=(), max_entries=256):
+    """
+    Serve a GET view from a per-version cache. version() names the data the
+    view renders (e.g. the loader's data version); the view body, its ETag and
+    its compressed variants are computed once per version, path and value of
+    the `query_args` the view reads. Other query parameters (cache busters)
+    share the entry, and at most `max_entries` are kept, least recently used
+    evicted first.
+    """
+    def decorator(view):
+        state = {'version': None, 'entries': OrderedDict()}
+        lock = threading.Lock()
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            current = version()
+            key = repr((request.path, [(name, request.args.getlist(name)) for name in query_args]))
+            digest = hashlib.sha1(f'{current}|{key}'.encode()).hexdigest()[:20]
+            cache_control = f'{policy}, max-age={max_age}'
+
+            if request.if_none_match.contains(digest):
+                response = current_app.response_class(status=304)
+                response.set_etag(digest)
+                response.headers['Cache-Control'] = cache_control
+                return response
+
+            with lock:
+                if state['version'] != current:
+                    state['version'], state['entries'] = current, OrderedDict()
+                entry = state['entries'].get(key)
+                if entry is not None:
+                    state['entries'].move_to_end(key)
+            if entry is None:
+                rendered = current_app.make_response(view(*args, **kwargs))
+                if rendered.status_code != 200:
+                    return rendered
+                entry = {'body': rendered.get_data(), 'mimetype': rendered.mimetype, 'encoded': {}}
+                with lock:
+                    if state['version'] == current:
+                        state['entries'][key] = entry
+                        while len(state['entries']) > max_entries:
+                            state['entries'].popitem(last=False)
+
+            response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+            response.set_etag(digest)
+            response.headers['Cache-Control'] = cache_control
+            response.vary.add('Accept-Encoding')
+            encoding = accepted_encoding(request.headers.get('Accept-Encoding'))
+            min_bytes = current_app.config.get('COMPRESS_MIN_BYTES', 1024)
+            if encoding and len(entry['body']) >= min_bytes:
+                if encoding not in entry['encoded']:
+                    entry['encoded'][encoding] = compress(entry['body'], encoding)
+                _set_encoded(response, entry['encoded'][encoding], encoding)
+            return response
+        return wrapper
+    return decorator
+
+
+def init_http_cache(app):
+    """Weak ETags + 304 for other JSON GETs, and compression of large bodies"""
+
+    @app.after_request
+    def conditional_and_compressed(response):
+        if response.is_streamed or response.direct_passthrough or response.status_code != 200:
+            return response
+        if 'Content-Encoding' in response.headers:
+            return response
+        if request.method == 'GET' and response.mimetype == 'application/json' and not response.get_etag()[0]:
+            response.add_etag(weak=True)
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        encoding = accepted_encoding(request.headers.get('Accept-Encoding'))
+        if (encoding and response.mimetype in COMPRESSIBLE_TYPES
+                and response.content_length and response.content_length >= app.config.get('COMPRESS_MIN_BYTES', 1024)):
+            _set_encoded(response, compress(response.get_data(), encoding), encoding)
+        return response
+
+    return app
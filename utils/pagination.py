@@ -0,0 +1,132 @@
+"""
+Cursor pagination for append-only feeds (acoustic detections, GPS points, alerts).
+Every row has a monotonic sequence number: the loader frame index, or the
+'seq' key of an alert. A cursor is an opaque token for the last sequence a
+client has received; since= is the same filter spelled out: seq:<n>, an ISO
+timestamp, or epoch:<seconds>.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+import pandas as pd
+
+CURSOR_VERSION = 'v1'
+
+
+def encode_cursor(seq):
+    raw = f'{CURSOR_VERSION}:{int(seq)}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        version, _, seq = raw.partition(':')
+        if version != CURSOR_VERSION:
+            raise ValueError(version)
+        return int(seq)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def parse_limit(value, default):
+    """?limit= as a positive int (default when absent); ValueError for anything else"""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        limit = 0
+    if limit < 1:
+        raise ValueError(f"Invalid limit: {value} (must be a positive integer)")
+    return limit
+
+
+def parse_since(value):
+    """
+    ('seq', int) for since=seq:<n>, ('time', Timestamp) for an ISO timestamp or
+    epoch:<seconds>, or None. A bare number is ambiguous (sequence or epoch) and rejected.
+    """
+    if value is None or value == '':
+        return None
+    kind, sep, rest = value.partition(':')
+    try:
+        if sep and kind == 'seq':
+            return 'seq', int(rest)
+        if sep and kind == 'epoch':
+            # Feed timestamps are naive local time (datetime.now()), so convert the same way
+            return 'time', pd.Timestamp(datetime.fromtimestamp(float(rest)))
+        if value.lstrip('+-').replace('.', '', 1).isdigit():
+            raise ValueError(value)
+        return 'time', pd.Timestamp(value)
+    except ValueError:
+        raise ValueError(f"Invalid since: {value} (use seq:<n>, an ISO timestamp or epoch:<seconds>)")
+
+
+def resolve_position(cursor, since):
+    """(after_seq, after_time) from the request; both None means 'latest window'"""
+    after = decode_cursor(cursor) if cursor else None
+    spec = parse_since(since)
+    after_time = None
+    if spec is not None and spec[0] == 'seq':
+        after = spec[1] if after is None else max(after, spec[1])
+    elif spec is not None:
+        after_time = spec[1]
+    return after, after_time
+
+
+def page_frame(frame, limit, cursor=None, since=None, time_col='timestamp'):
+    """
+    (page, next_cursor, has_more) for a frame indexed by sequence number.
+    Without cursor/since this is the latest `limit` rows, as tail(limit) was;
+    otherwise the oldest `limit` rows after the cursor. Rows gain a seq column.
+    """
+    if limit < 1:
+        raise ValueError(f"Invalid limit: {limit} (must be a positive integer)")
+    after, after_time = resolve_position(cursor, since)
+    rows = frame
+    if after_time is not None:
+        rows = rows[pd.to_datetime(rows[time_col]) > after_time]
+    if after is not None:
+        rows = rows[rows.index > after]
+
+    if after is None and after_time is None:
+        page, has_more = rows.tail(limit), False
+    else:
+        page, has_more = rows.head(limit), len(rows) > limit
+
+    if len(page):
+        last = page.index[-1]
+    elif after is not None:
+        last = after
+    else:
+        # Nothing new: point at the end of the feed so the next poll only sees later rows
+        last = frame.index.max() if len(frame) else -1
+    return page.assign(seq=page.index), encode_cursor(last), has_more
+
+
+def page_items(items, limit, cursor=None, since=None, time_key='timestamp'):
+    """page_frame for a list of dicts ordered by their 'seq' key"""
+    if limit < 1:
+        raise ValueError(f"Invalid limit: {limit} (must be a positive integer)")
+    after, after_time = resolve_position(cursor, since)
+    rows = items
+    if after_time is not None:
+        rows = [item for item in rows if pd.Timestamp(item[time_key]) > after_time]
+    if after is not None:
+        rows = [item for item in rows if item['seq'] > after]
+
+    if after is None and after_time is None:
+        page, has_more = rows[-limit:], False
+    else:
+        page, has_more = rows[:limit], len(rows) > limit
+
+    if page:
+        last = page[-1]['seq']
+    elif after is not None:
+        last = after
+    else:
+        last = items[-1]['seq'] if items else -1
+    return page, encode_cursor(last), has_more